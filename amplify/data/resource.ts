@@ -164,6 +164,21 @@ const schema = a.schema({
     index('status')
   ]),
 
+  // Precomputed cohort statistics maintained by scripts/computeCohortStats.py
+  CohortStats: a.model({
+    cohortId: a.string().required(),
+    totals: a.json(), // Submitted, graded, passing, pending and needs-revision counts, pass rate
+    weekly: a.json().array(), // The same counts per week
+    gradeDistribution: a.json().array(),
+    technologies: a.json().array(), // Technology histogram across the cohort's submissions
+    studentCount: a.integer(),
+    computedAt: a.datetime()
+  })
+  .authorization(allow => [
+    allow.authenticated().to(['read']),
+    allow.publicApiKey().to(['read', 'create', 'update', 'delete'])
+  ]),
+
   // Student project submission
   Submission: a.model({
     studentProfileId: a.string().required(),
@@ -191,7 +206,8 @@ const schema = a.schema({
     showcasePriority: a.integer(),
     submittedAt: a.datetime(),
     lastStudentEdit: a.datetime(),
-    editHistory: a.json().array()
+    editHistory: a.json().array(),
+    linkStatus: a.json() // Last link health check per link field, written by scripts/checkLinks.py
   })
   .authorization(allow => [
     allow.owner(),
@@ -264,6 +280,27 @@ const schema = a.schema({
   .secondaryIndexes(index => [
     index('showcaseId'),
     index('date')
+  ]),
+
+  // Pre-aggregated analytics maintained by scripts/rollupAnalytics.py
+  AnalyticsRollup: a.model({
+    scope: a.string().required(), // 'showcase' or 'cohort'
+    scopeId: a.string().required(), // Showcase ID or Cohort ID
+    period: a.string().required(), // 'day', 'week' or 'total'
+    periodStart: a.date(), // First day of the period (empty for totals)
+    views: a.json(),
+    projectViews: a.json().array(),
+    referrers: a.json().array(),
+    locations: a.json().array(),
+    devices: a.json().array(),
+    sourceRows: a.integer() // Number of Analytics rows merged into this rollup
+  })
+  .authorization(allow => [
+    allow.authenticated().to(['read']),
+    allow.publicApiKey().to(['read', 'create', 'update', 'delete'])
+  ])
+  .secondaryIndexes(index => [
+    index('scopeId')
   ])
 });
 
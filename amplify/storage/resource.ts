@@ -36,6 +36,11 @@ export const showcaseBucket = defineStorage({
       allow.guest.to(['read']),
       allow.authenticated.to(['read'])
     ],
+    // Showcase directory files, such as the search index of published showcases
+    'directory/*': [
+      allow.guest.to(['read']),
+      allow.authenticated.to(['read'])
+    ],
   })
 });
 
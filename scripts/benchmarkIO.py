@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+import json
+import threading
+import time
+
+from common.aio import AsyncGraphQLClient, gather_limited
+from common.amplify import load_amplify_outputs, get_graphql_settings, get_results_path
+from common.concurrency import run_concurrently
+from common.graphql import GraphQLClient
+from common.profiling import run
+
+# The first line of the HTTP/2 connection preface, which ends like an HTTP/1.1 head
+HTTP2_PREFACE = b'PRI * HTTP/2.0\r\n\r\n'
+
+class StubGraphQLServer:
+    """Local server answering every GraphQL request after a fixed latency.
+
+    It speaks HTTP/1.1, and HTTP/2 to clients that start with the HTTP/2
+    preface, the way AsyncGraphQLClient talks to AppSync. It runs its own
+    event loop on a background thread, so thousands of concurrent
+    connections cost no extra threads and the measured difference comes
+    from the clients.
+    """
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.port = None
+        self._writers = set()
+        self._loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    async def _shutdown(self):
+        # Closing the connections ends each handler at its next read
+        self._server.close()
+        for writer in list(self._writers):
+            writer.close()
+        handlers = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        await asyncio.gather(*handlers, return_exceptions=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}/graphql"
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        self._server = self._loop.run_until_complete(
+            asyncio.start_server(self._handle, '127.0.0.1', 0, backlog=4096))
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+
+    async def _respond(self, body):
+        await asyncio.sleep(self.latency)
+        item_id = ((json.loads(body) if body else {}).get('variables') or {}).get('id', 'stub')
+        return json.dumps({'data': {'getUser': {'id': item_id}}}).encode('utf-8')
+
+    async def _handle(self, reader, writer):
+        self._writers.add(writer)
+        try:
+            while True:
+                head = await reader.readuntil(b'\r\n\r\n')
+                if head == HTTP2_PREFACE:
+                    await self._handle_http2(reader, writer, head)
+                    break
+                length = 0
+                for line in head.split(b'\r\n'):
+                    if line.lower().startswith(b'content-length:'):
+                        length = int(line.split(b':', 1)[1])
+                payload = await self._respond(await reader.readexactly(length) if length else b'')
+                writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                             + f"Content-Length: {len(payload)}\r\n\r\n".encode('ascii') + payload)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _handle_http2(self, reader, writer, data):
+        import h2.config
+        import h2.connection
+        import h2.events
+
+        connection = h2.connection.H2Connection(config=h2.config.H2Configuration(client_side=False))
+        connection.initiate_connection()
+        bodies = {}
+
+        async def respond(stream_id, body):
+            payload = await self._respond(body)
+            connection.send_headers(stream_id, [(':status', '200'), ('content-type', 'application/json'),
+                                                ('content-length', str(len(payload)))])
+            connection.send_data(stream_id, payload, end_stream=True)
+            writer.write(connection.data_to_send())
+
+        while data:
+            for event in connection.receive_data(data):
+                if isinstance(event, h2.events.DataReceived):
+                    bodies.setdefault(event.stream_id, bytearray()).extend(event.data)
+                    connection.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+                elif isinstance(event, h2.events.StreamEnded):
+                    asyncio.ensure_future(respond(event.stream_id, bytes(bodies.pop(event.stream_id, b''))))
+            writer.write(connection.data_to_send())
+            await writer.drain()
+            data = await reader.read(65536)
+
+def run_threads(endpoint, api_key, ids, workers):
+    # Hedging would add duplicate requests and skew the transport comparison
+    with GraphQLClient(endpoint, api_key, hedge=False) as client:
+        started = time.perf_counter()
+        results, failures = run_concurrently(lambda item_id: client.get_item('User', item_id, ['id']),
+                                             ids, max_workers=workers, batch_size=workers * 4)
+        return time.perf_counter() - started, len(results), failures
+
+async def run_asyncio(endpoint, api_key, ids, concurrency, http1):
+    async with AsyncGraphQLClient(endpoint, api_key, max_connections=concurrency, hedge=False,
+                                  http1=http1) as client:
+        started = time.perf_counter()
+        results, failures = await gather_limited(lambda item_id: client.get_item('User', item_id, ['id']),
+                                                 ids, concurrency)
+        return time.perf_counter() - started, len(results), failures
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare thread-pool and asyncio GraphQL throughput.")
+    parser.add_argument('--requests', type=int, default=2000, help="getUser requests per run (default: 2000)")
+    parser.add_argument('--latency-ms', type=float, default=50.0,
+                        help="Latency of the local stub server (default: 50)")
+    parser.add_argument('--workers', type=int, nargs='+', default=[8, 32, 128],
+                        help="Thread pool sizes to try (default: 8 32 128)")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[100, 500, 1000],
+                        help="asyncio in-flight limits to try (default: 100 500 1000)")
+    parser.add_argument('--live', action='store_true',
+                        help="Send read-only getUser requests to the real API instead of the local stub")
+    return parser.parse_args()
+
+def benchmark(endpoint, api_key, ids, args, http1=True):
+    rows = []
+    for workers in args.workers:
+        elapsed, ok, failures = run_threads(endpoint, api_key, ids, workers)
+        rows.append({'backend': 'threads', 'inFlight': workers, 'seconds': round(elapsed, 3),
+                     'requestsPerSecond': round(ok / elapsed, 1), 'failures': len(failures)})
+    for concurrency in args.concurrency:
+        elapsed, ok, failures = asyncio.run(run_asyncio(endpoint, api_key, ids, concurrency, http1))
+        rows.append({'backend': 'asyncio', 'inFlight': concurrency, 'seconds': round(elapsed, 3),
+                     'requestsPerSecond': round(ok / elapsed, 1), 'failures': len(failures)})
+    return rows
+
+def main():
+    args = parse_args()
+
+    try:
+        import h2  # noqa: F401
+        import httpx  # noqa: F401
+        import requests  # noqa: F401
+    except ImportError:
+        raise SystemExit("The benchmark requires requests and httpx[http2]: pip install requests 'httpx[http2]'")
+
+    ids = [f"user-{n}" for n in range(args.requests)]
+    if args.live:
+        endpoint, api_key = get_graphql_settings(load_amplify_outputs())
+        print(f"Sending {args.requests} getUser requests per run to {endpoint}")
+        rows = benchmark(endpoint, api_key, ids, args)
+    else:
+        with StubGraphQLServer(args.latency_ms / 1000) as server:
+            print(f"Sending {args.requests} getUser requests per run to a local stub "
+                  f"with {args.latency_ms:.0f} ms latency")
+            # Plain http has no ALPN, so the async client is told to use HTTP/2 up front
+            rows = benchmark(server.url, 'stub', ids, args, http1=False)
+
+    print(f"\n{'backend':<10} {'in flight':>10} {'seconds':>9} {'requests/s':>11} {'failures':>9}")
+    for row in rows:
+        print(f"{row['backend']:<10} {row['inFlight']:>10} {row['seconds']:>9.2f} "
+              f"{row['requestsPerSecond']:>11.1f} {row['failures']:>9}")
+
+    # Save results to a file
+    results_file_path = get_results_path('io_benchmark_results.json')
+    with open(results_file_path, 'w') as f:
+        json.dump({
+            'live': args.live,
+            'requests': args.requests,
+            'latencyMs': None if args.live else args.latency_ms,
+            'results': rows
+        }, f, indent=2)
+
+    print(f"Results saved to {results_file_path}")
+
+if __name__ == '__main__':
+    run(main)
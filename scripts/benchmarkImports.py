@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+import argparse
+import glob
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from common.amplify import get_results_path
+from common.profiling import run
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def script_modules():
+    """Return the module names of the Python scripts next to this one."""
+    names = sorted(os.path.splitext(os.path.basename(path))[0]
+                   for path in glob.glob(os.path.join(SCRIPTS_DIR, '*.py')))
+    return [name for name in names if name != 'benchmarkImports']
+
+def time_import(module, runs):
+    """Return the wall-clock times in ms of importing a module in a fresh interpreter."""
+    code = f"import sys; sys.path.insert(0, {SCRIPTS_DIR!r}); import {module}" if module else "pass"
+    timings = []
+    error = None
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+        timings.append((time.perf_counter() - started) * 1000)
+        if result.returncode != 0:
+            error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'import failed'
+            break
+    return timings, error
+
+def slowest_imports(module, count):
+    """Return the slowest top-level imports of a module from `python -X importtime`."""
+    code = f"import sys; sys.path.insert(0, {SCRIPTS_DIR!r}); import {module}"
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True)
+
+    # Lines read "import time: self [us] | cumulative | name", with nested
+    # imports indented two spaces per level and listed before their parent
+    children = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        if depth == 1:
+            children.append((name.strip(), int(cumulative) / 1000))
+        elif depth == 0:
+            if name.strip() == module:
+                return sorted(children, key=lambda pair: -pair[1])[:count]
+            children = []
+    return []
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Measure how long each script takes to import.")
+    parser.add_argument('modules', nargs='*', help="Scripts to measure (default: all)")
+    parser.add_argument('--runs', type=int, default=5, help="Fresh interpreters per script (default: 5)")
+    parser.add_argument('--top', type=int, default=3, help="Slowest imports listed per script (default: 3)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    modules = args.modules or script_modules()
+
+    baseline_timings, _ = time_import(None, args.runs)
+    baseline = statistics.median(baseline_timings)
+    print(f"Interpreter startup: {baseline:.1f} ms (median of {args.runs})\n")
+    print(f"{'script':<32} {'median ms':>10} {'over startup':>13}  slowest imports")
+
+    results = []
+    for module in modules:
+        timings, error = time_import(module, args.runs)
+        if error:
+            print(f"{module:<32} {'-':>10} {'-':>13}  {error}")
+            results.append({'script': module, 'error': error})
+            continue
+
+        median = statistics.median(timings)
+        slowest = slowest_imports(module, args.top)
+        print(f"{module:<32} {median:>10.1f} {median - baseline:>13.1f}  "
+              + ', '.join(f"{name} {ms:.1f}" for name, ms in slowest))
+        results.append({
+            'script': module,
+            'medianMs': round(median, 2),
+            'overStartupMs': round(median - baseline, 2),
+            'slowestImports': [{'module': name, 'cumulativeMs': round(ms, 2)} for name, ms in slowest]
+        })
+
+    # Save results to a file
+    results_file_path = get_results_path('import_benchmark_results.json')
+    with open(results_file_path, 'w') as f:
+        json.dump({
+            'python': sys.version.split()[0],
+            'runs': args.runs,
+            'startupMs': round(baseline, 2),
+            'scripts': results
+        }, f, indent=2)
+
+    print(f"\nResults saved to {results_file_path}")
+
+if __name__ == '__main__':
+    run(main)
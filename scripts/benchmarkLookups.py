@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+import argparse
+import gc
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+from common.amplify import get_results_path
+from common.lookup import build_string_map
+from common.profiling import run
+
+class UserRecord:
+    """Projected user with only the fields createSubmissions reads."""
+    __slots__ = ('email', 'cognitoId')
+
+    def __init__(self, email, cognito_id):
+        self.email = email
+        self.cognitoId = cognito_id
+
+def synthetic_users(count, seed):
+    """Yield User items shaped like the listUsers results, with deterministic values."""
+    rng = random.Random(seed)
+    for number in range(count):
+        cognito_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        yield {
+            'id': str(uuid.UUID(int=rng.getrandbits(128))),
+            'cognitoId': cognito_id,
+            'email': f"student{number}@gauntletai.com",
+            'roles': ['STUDENT'],
+            'linkedProfiles': [f'{{"type":"student","id":"{cognito_id}"}}']
+        }
+
+def build_full_dicts(users):
+    return {user['email']: user for user in users}
+
+def build_plain_dict(users):
+    return {user['email']: user['cognitoId'] for user in users}
+
+def build_slots(users):
+    return {user['email']: UserRecord(user['email'], user['cognitoId']) for user in users}
+
+def build_packed(users):
+    return build_string_map((user['email'], user['cognitoId']) for user in users)
+
+def measure(name, build, count, seed, probes):
+    """Build one lookup and return its retained and peak heap bytes and lookup time."""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    lookup = build(synthetic_users(count, seed))
+    build_seconds = time.perf_counter() - started
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    for email in probes:
+        lookup.get(email)
+    lookup_us = (time.perf_counter() - started) / len(probes) * 1e6
+
+    if hasattr(lookup, 'close'):
+        lookup.close()
+    return {
+        'structure': name,
+        'retainedBytes': retained,
+        'peakBytes': peak,
+        'bytesPerEntry': round(retained / count, 1),
+        'buildSeconds': round(build_seconds, 2),
+        'lookupMicroseconds': round(lookup_us, 2)
+    }
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare the memory used by user lookup structures.")
+    parser.add_argument('--entries', type=int, default=100000, help="Synthetic users (default: 100000)")
+    parser.add_argument('--probes', type=int, default=100000, help="Lookups timed per structure (default: 100000)")
+    parser.add_argument('--seed', type=int, default=7)
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    rng = random.Random(args.seed)
+    probes = [f"student{rng.randrange(args.entries)}@gauntletai.com" for _ in range(args.probes)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'email_to_cognito_id.idx')
+        structures = [
+            ('dict of full items', build_full_dicts),
+            ('dict of str', build_plain_dict),
+            ('dict of __slots__ records', build_slots),
+            ('packed sorted map', build_packed),
+            ('mmap sorted map', lambda users: build_string_map(
+                ((user['email'], user['cognitoId']) for user in users), path=path))
+        ]
+
+        print(f"{args.entries} entries, {args.probes} lookups\n")
+        print(f"{'structure':<28} {'bytes/entry':>12} {'peak MB':>9} {'build s':>8} {'lookup us':>10}")
+        results = []
+        for name, build in structures:
+            result = measure(name, build, args.entries, args.seed, probes)
+            results.append(result)
+            print(f"{name:<28} {result['bytesPerEntry']:>12.1f} {result['peakBytes'] / 1e6:>9.1f} "
+                  f"{result['buildSeconds']:>8.2f} {result['lookupMicroseconds']:>10.2f}")
+
+    print("\nThe mmap map keeps its data in the page cache, outside the Python heap")
+
+    # Save results to a file
+    results_file_path = get_results_path('lookup_benchmark_results.json')
+    with open(results_file_path, 'w') as f:
+        json.dump({'entries': args.entries, 'probes': args.probes, 'results': results}, f, indent=2)
+
+    print(f"Results saved to {results_file_path}")
+
+if __name__ == '__main__':
+    run(main)
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import time
+
+from common.amplify import load_amplify_outputs, get_graphql_settings, get_bucket_name, get_results_path
+from common.aws import get_client
+from common.graphql import GraphQLClient, GraphQLError
+from common.profiling import phase, run
+from common.search import (FILTER_FIELDS, INDEX_FILE, PROFILE_FIELDS, SNAPSHOT_FILE, SUBMISSION_FIELDS,
+                           SearchIndex, build_documents, empty_snapshot, load_snapshot, save_snapshot,
+                           write_index)
+from common.showcases import is_published
+
+# Outside public/{username}/, so it cannot collide with a showcase; readable
+# by guests through the 'directory/*' rule in amplify/storage/resource.ts
+PUBLISH_KEY = 'directory/search_index.bin'
+PUBLISHED_INDEX_FILE = 'search_index_published.bin'
+
+def fetch_changes(client, snapshot):
+    """Merge rows updated since the snapshot watermark into the snapshot.
+
+    Rows stamped with the watermark itself are read again, since more rows
+    can share that timestamp; rows already in the snapshot unchanged are
+    not counted.
+    """
+    watermark = snapshot.get('watermark')
+    row_filter = {'updatedAt': {'ge': watermark}} if watermark else None
+    latest = watermark or ''
+    changed = 0
+
+    for model, fields in (('StudentProfile', PROFILE_FIELDS), ('Submission', SUBMISSION_FIELDS)):
+        for row in client.iter_items(model, fields, filter=row_filter):
+            if snapshot[model].get(row['id']) != row:
+                snapshot[model][row['id']] = row
+                changed += 1
+            latest = max(latest, row.get('updatedAt') or '')
+
+    snapshot['watermark'] = latest or None
+    return changed
+
+def build(args):
+    amplify_outputs = load_amplify_outputs()
+    client = GraphQLClient(*get_graphql_settings(amplify_outputs))
+
+    phase('fetch tables')
+    snapshot_path = get_results_path(SNAPSHOT_FILE)
+    snapshot = empty_snapshot() if args.full else load_snapshot(snapshot_path)
+    print(f"Fetching rows updated since {snapshot.get('watermark') or 'the beginning'}...")
+    try:
+        changed = fetch_changes(client, snapshot)
+    except GraphQLError as e:
+        print(f"Error fetching rows: {e}")
+        client.close()
+        return
+    print(f"Fetched {changed} changed rows")
+    if not args.publish:
+        client.close()
+
+    phase('process loop')
+    docs = build_documents(snapshot)
+    index_path = args.index or get_results_path(INDEX_FILE)
+    phase('write results')
+    stats = write_index(index_path, docs)
+    save_snapshot(snapshot_path, snapshot)
+    print(f"Indexed {stats['documents']} profiles, {stats['terms']} terms, {stats['bytes']} bytes to {index_path}")
+
+    if args.publish:
+        # Guests can read the published index, so it only covers students who published a showcase
+        try:
+            published = {showcase['studentProfileId'] for showcase in
+                         client.iter_items('Showcase', ['id', 'studentProfileId', 'publication'])
+                         if is_published(showcase)}
+        except GraphQLError as e:
+            print(f"Error fetching showcases, index not published: {e}")
+            return
+        finally:
+            client.close()
+        published_path = get_results_path(PUBLISHED_INDEX_FILE)
+        stats = write_index(published_path, [doc for doc in docs if doc['id'] in published])
+
+        bucket = get_bucket_name(amplify_outputs, 'showcase-bucket')
+        s3_client = get_client('s3', amplify_outputs['storage']['aws_region'])
+        s3_client.upload_file(published_path, bucket, PUBLISH_KEY, ExtraArgs={
+            'ContentType': 'application/octet-stream',
+            'CacheControl': 'public, max-age=300'
+        })
+        print(f"Published an index of the {stats['documents']} profiles with a published showcase "
+              f"to s3://{bucket}/{PUBLISH_KEY}")
+
+def query(args):
+    filters = {field: getattr(args, field) for field in FILTER_FIELDS if getattr(args, field)}
+    with SearchIndex(args.index or get_results_path(INDEX_FILE)) as index:
+        started = time.perf_counter()
+        results = index.search(args.text, filters, limit=args.limit,
+                               scoring='none' if args.no_bm25 else 'bm25')
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+    for result in results:
+        print(json.dumps(result))
+    print(f"{len(results)} results in {elapsed_ms:.2f} ms")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Build and query the offline student search index.")
+    parser.add_argument('--index', help=f"Index file (default: {INDEX_FILE} next to the scripts)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = commands.add_parser('build', help="Build or incrementally update the index")
+    build_parser.add_argument('--full', action='store_true',
+                              help="Ignore the snapshot and re-read every row (picks up deletions)")
+    build_parser.add_argument('--publish', action='store_true',
+                              help=f"Upload an index of the profiles with a published showcase to the showcase "
+                                   f"bucket at {PUBLISH_KEY}")
+    build_parser.set_defaults(func=build)
+
+    query_parser = commands.add_parser('query', help="Search the index")
+    query_parser.add_argument('text', nargs='?', help="Free-text query")
+    query_parser.add_argument('--skill')
+    query_parser.add_argument('--tech')
+    query_parser.add_argument('--location')
+    query_parser.add_argument('--cohort')
+    query_parser.add_argument('--limit', type=int, default=20)
+    query_parser.add_argument('--no-bm25', action='store_true', help="Rank by matching tokens instead of BM25")
+    query_parser.set_defaults(func=query)
+
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    args.func(args)
+
+if __name__ == '__main__':
+    run(main)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+import argparse
+import json
+
+from common.amplify import load_amplify_outputs, get_graphql_settings, get_results_path
+from common.audit import open_audit_sink
+from common.graphql import GraphQLClient, GraphQLError
+from common.profiling import phase, run
+from common.showcases import PROFILE_FIELDS, SUBMISSION_FIELDS, SHOWCASE_FIELDS, plan_writes, write_showcases
+
+def load_profiles(client, cohort_id):
+    """Return {profile id: StudentProfile} for the students in scope, skipping staff."""
+    if cohort_id:
+        rows = client.iter_index('StudentProfile', 'cohortId', cohort_id, PROFILE_FIELDS)
+    else:
+        rows = client.iter_items('StudentProfile', PROFILE_FIELDS)
+    return {profile['id']: profile for profile in rows if not profile.get('isStaff')}
+
+def load_included_submissions(client, profile_ids):
+    """Group the submissions marked showcaseIncluded by studentProfileId."""
+    by_profile = {}
+    for submission in client.iter_items('Submission', SUBMISSION_FIELDS,
+                                        filter={'showcaseIncluded': {'eq': True}}):
+        if submission.get('studentProfileId') in profile_ids:
+            by_profile.setdefault(submission['studentProfileId'], []).append(submission)
+    return by_profile
+
+def load_showcases(client, profile_ids):
+    """Return {studentProfileId: Showcase} for the profiles in scope."""
+    showcases = {}
+    for showcase in client.iter_items('Showcase', SHOWCASE_FIELDS):
+        profile_id = showcase.get('studentProfileId')
+        if profile_id in profile_ids and profile_id not in showcases:
+            showcases[profile_id] = showcase
+    return showcases
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Build Showcase.profile and Showcase.projects from StudentProfile and Submission rows.")
+    parser.add_argument('--cohort-id', help="Only build the showcases of this cohort's students")
+    parser.add_argument('--no-create', action='store_true',
+                        help="Only update existing showcases instead of also creating missing ones")
+    parser.add_argument('--dry-run', action='store_true', help="Report what would change without writing")
+    parser.add_argument('--batch-size', type=int, default=10, help="Showcases per GraphQL request (default: 10)")
+    parser.add_argument('--workers', type=int, default=8, help="Concurrent requests (default: 8)")
+    parser.add_argument('--rate', type=float, default=10.0, help="Maximum requests per second (default: 10)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    # Load Amplify outputs
+    amplify_outputs = load_amplify_outputs()
+    client = GraphQLClient(*get_graphql_settings(amplify_outputs))
+
+    phase('fetch tables')
+    try:
+        profiles = load_profiles(client, args.cohort_id)
+        print(f"Fetched {len(profiles)} student profiles")
+        submissions = load_included_submissions(client, profiles.keys())
+        print(f"Fetched {sum(len(s) for s in submissions.values())} showcase submissions "
+              f"for {len(submissions)} students")
+        showcases = load_showcases(client, profiles.keys())
+        print(f"Fetched {len(showcases)} existing showcases")
+    except GraphQLError as e:
+        print(f"Error fetching rows: {e}")
+        client.close()
+        return
+
+    phase('process loop')
+    creates, updates, unchanged = plan_writes(profiles, submissions, showcases, not args.no_create)
+    print(f"{len(creates)} showcases to create, {len(updates)} to update, {unchanged} unchanged")
+
+    written = {'created': 0, 'updated': 0}
+    conflicts = []
+    failures = []
+    if not args.dry_run:
+        with open_audit_sink(client, 'buildShowcases', get_results_path('audit_spool_buildShowcases.jsonl')) as audit:
+            written, conflicts, failures = write_showcases(client, creates, updates, audit,
+                                                          args.batch_size, args.workers, args.rate)
+    client.close()
+
+    phase('write results')
+
+    # Print summary
+    print("\nShowcase build completed!" if not args.dry_run else "\nDry run completed!")
+    print(f"Showcases created: {written['created']}")
+    print(f"Showcases updated: {written['updated']}")
+    print(f"Showcases unchanged: {unchanged}")
+    print(f"Showcases edited during the run (rerun to pick up): {len(conflicts)}")
+    print(f"Failures: {len(failures)}")
+
+    # Save results to a file
+    results_file_path = get_results_path('showcase_build_results.json')
+    with open(results_file_path, 'w') as f:
+        json.dump({
+            'dry_run': args.dry_run,
+            'cohort_id': args.cohort_id,
+            'to_create': len(creates),
+            'to_update': len(updates),
+            'unchanged': unchanged,
+            'created': written['created'],
+            'updated': written['updated'],
+            'conflicts': conflicts,
+            'failures': failures
+        }, f, indent=2)
+
+    print(f"Results saved to {results_file_path}")
+
+if __name__ == '__main__':
+    run(main)
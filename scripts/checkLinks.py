@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+import json
+import sqlite3
+import time
+from urllib.parse import urlsplit
+
+from common.aio import gather_limited
+from common.amplify import load_amplify_outputs, get_graphql_settings, get_results_path
+from common.concurrency import chunked, run_concurrently
+from common.graphql import GraphQLClient, GraphQLError
+from common.profiling import phase, run
+
+LINK_FIELDS = ['demoLink', 'repoLink', 'deployedUrl', 'brainliftLink', 'socialPost']
+SUBMISSION_FIELDS = ['id'] + LINK_FIELDS + ['linkStatus']
+
+CACHE_FILE = 'link_cache.sqlite3'
+
+# Servers that reject HEAD often answer these; the check falls back to a GET
+HEAD_FALLBACK_STATUSES = {403, 405, 501}
+
+class LinkCache:
+    """SQLite store of link check results, reused until they are older than the TTL."""
+
+    def __init__(self, path, ttl):
+        self.ttl = ttl
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS link_cache (
+                url TEXT PRIMARY KEY,
+                ok INTEGER NOT NULL,
+                status INTEGER,
+                error TEXT,
+                checked_at REAL NOT NULL
+            )
+        """)
+
+    def get_fresh(self, urls):
+        """Return cached results for the URLs checked within the TTL."""
+        cutoff = time.time() - self.ttl
+        fresh = {}
+        for batch in chunked(urls, 500):
+            placeholders = ','.join('?' * len(batch))
+            rows = self.connection.execute(
+                f"SELECT url, ok, status, error, checked_at FROM link_cache "
+                f"WHERE checked_at >= ? AND url IN ({placeholders})",
+                [cutoff] + batch
+            )
+            for url, ok, status, error, checked_at in rows:
+                fresh[url] = {'ok': bool(ok), 'status': status, 'error': error, 'checkedAt': checked_at}
+        return fresh
+
+    def put(self, results):
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO link_cache (url, ok, status, error, checked_at) VALUES (?, ?, ?, ?, ?)",
+            [(url, int(r['ok']), r['status'], r['error'], r['checkedAt']) for url, r in results.items()]
+        )
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+async def probe(session, aiohttp, url, timeout):
+    """Check one URL with HEAD, falling back to a one-byte ranged GET."""
+    result = {'ok': False, 'status': None, 'error': None, 'checkedAt': time.time()}
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    try:
+        async with session.head(url, allow_redirects=True, timeout=client_timeout) as response:
+            result['status'] = response.status
+        if result['status'] in HEAD_FALLBACK_STATUSES or result['status'] >= 500:
+            async with session.get(url, allow_redirects=True, timeout=client_timeout,
+                                   headers={'Range': 'bytes=0-0'}) as response:
+                result['status'] = response.status
+        result['ok'] = result['status'] < 400
+    except asyncio.TimeoutError:
+        result['error'] = f"timeout after {timeout}s"
+    except aiohttp.ClientError as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    except ValueError as e:
+        result['error'] = f"invalid URL: {e}"
+    except Exception as e:
+        # Anything else about one malformed link must not abort the whole run
+        result['error'] = f"{type(e).__name__}: {e}"
+    return result
+
+async def check_urls(urls, concurrency=100, per_host=4, timeout=10.0, user_agent='project-showcase-link-checker'):
+    """Probe URLs concurrently and return {url: result}.
+
+    At most `concurrency` requests are in flight overall and `per_host` per
+    host, so a single slow site cannot take all the connections. A probe
+    waits for its host's slot before its timeout starts, so URLs queued
+    behind others on the same host are not reported as timed out.
+    """
+    import aiohttp
+
+    hosts = {}
+
+    async def check(url):
+        host = urlsplit(url).netloc.lower()
+        if host not in hosts:
+            hosts[host] = asyncio.Semaphore(per_host)
+        async with hosts[host]:
+            return url, await probe(session, aiohttp, url, timeout)
+
+    connector = aiohttp.TCPConnector(limit=concurrency, ttl_dns_cache=300)
+    async with aiohttp.ClientSession(connector=connector, headers={'User-Agent': user_agent}) as session:
+        results, failures = await gather_limited(check, urls, concurrency)
+    results = dict(results)
+    for url, e in failures:
+        results[url] = {'ok': False, 'status': None, 'error': f"{type(e).__name__}: {e}", 'checkedAt': time.time()}
+    return results
+
+def is_checkable(url):
+    parts = urlsplit(url)
+    return parts.scheme in ('http', 'https') and bool(parts.netloc)
+
+def link_status(submission, results):
+    """Return the linkStatus JSON for a submission from the check results."""
+    status = {}
+    for field in LINK_FIELDS:
+        url = (submission.get(field) or '').strip()
+        if not url:
+            continue
+        result = results.get(url)
+        if result is None:
+            status[field] = {'url': url, 'ok': False, 'status': None, 'error': 'not an http(s) URL'}
+        else:
+            status[field] = {'url': url, 'ok': result['ok'], 'status': result['status'], 'error': result['error']}
+    return status
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Check the links of every submission and record their status.")
+    parser.add_argument('--concurrency', type=int, default=100, help="Requests in flight (default: 100)")
+    parser.add_argument('--per-host', type=int, default=4, help="Connections per host (default: 4)")
+    parser.add_argument('--timeout', type=float, default=10.0, help="Seconds per request (default: 10)")
+    parser.add_argument('--ttl-hours', type=float, default=24.0,
+                        help="Reuse cached results younger than this (default: 24)")
+    parser.add_argument('--batch-size', type=int, default=10, help="Updates per GraphQL request (default: 10)")
+    parser.add_argument('--no-write', action='store_true', help="Only report; do not update submissions")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    try:
+        import aiohttp  # noqa: F401
+    except ImportError:
+        raise SystemExit("Checking links requires aiohttp: pip install aiohttp")
+
+    # Load Amplify outputs
+    amplify_outputs = load_amplify_outputs()
+    client = GraphQLClient(*get_graphql_settings(amplify_outputs))
+
+    phase('fetch tables')
+    try:
+        submissions = [s for s in client.iter_items('Submission', SUBMISSION_FIELDS)
+                       if any(s.get(field) for field in LINK_FIELDS)]
+    except GraphQLError as e:
+        print(f"Error fetching submissions: {e}")
+        client.close()
+        return
+
+    # De-duplicate URLs across all submissions before probing
+    urls = sorted({
+        submission[field].strip()
+        for submission in submissions for field in LINK_FIELDS
+        if submission.get(field) and is_checkable(submission[field].strip())
+    })
+    print(f"Found {len(urls)} distinct URLs in {len(submissions)} submissions")
+
+    phase('process loop')
+    cache = LinkCache(get_results_path(CACHE_FILE), args.ttl_hours * 3600)
+    results = cache.get_fresh(urls)
+    to_check = [url for url in urls if url not in results]
+    print(f"{len(results)} cached, checking {len(to_check)}...")
+
+    started = time.monotonic()
+    checked = asyncio.run(check_urls(to_check, args.concurrency, args.per_host, args.timeout))
+    elapsed = time.monotonic() - started
+    cache.put(checked)
+    cache.close()
+    results.update(checked)
+    print(f"Checked {len(checked)} URLs in {elapsed:.1f}s")
+
+    phase('write results')
+    # Write back only the submissions whose status changed
+    updates = []
+    for submission in submissions:
+        status = link_status(submission, results)
+        previous = submission.get('linkStatus')
+        if isinstance(previous, str):
+            try:
+                previous = json.loads(previous)
+            except json.JSONDecodeError:
+                previous = None
+        if status != previous:
+            updates.append(({'id': submission['id'], 'linkStatus': json.dumps(status)}, None))
+
+    failures = []
+    if updates and not args.no_write:
+        outcomes, failed = run_concurrently(
+            lambda batch: (batch, client.update_items('Submission', batch)),
+            list(chunked(updates, args.batch_size)), max_workers=4
+        )
+        for batch, batch_results in outcomes:
+            failures.extend({'id': update['id'], 'error': error.get('message')}
+                            for (update, _), (_, error) in zip(batch, batch_results) if error)
+        for batch, e in failed:
+            failures.extend({'id': update['id'], 'error': str(e)} for update, _ in batch)
+    client.close()
+
+    broken = {url: r for url, r in results.items() if not r['ok']}
+
+    # Print summary
+    print("\nLink check completed!")
+    print(f"URLs checked: {len(urls)}")
+    print(f"Broken URLs: {len(broken)}")
+    print(f"Submissions updated: {0 if args.no_write else len(updates) - len(failures)}")
+    print(f"Update failures: {len(failures)}")
+
+    # Save results to a file
+    results_file_path = get_results_path('link_check_results.json')
+    with open(results_file_path, 'w') as f:
+        json.dump({
+            'broken': broken,
+            'failures': failures
+        }, f, indent=2)
+
+    print(f"Results saved to {results_file_path}")
+
+if __name__ == '__main__':
+    run(main)
@@ -0,0 +1 @@
+"""Shared helpers for the Project Showcase maintenance scripts."""
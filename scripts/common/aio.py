@@ -0,0 +1,289 @@
+import asyncio
+import contextlib
+import functools
+import time
+
+from common.graphql import (CONNECT_TIMEOUT, GraphQLClientBase, GraphQLError, batch_create_request,
+                            batch_delete_request, batch_update_request, batch_update_results, index_query,
+                            item_operation, list_query)
+
+# asyncio counterparts of common.graphql, common.aws and common.concurrency.
+# One event loop thread can keep thousands of requests in flight, where the
+# thread pool versions need a thread per request. httpx and aiobotocore
+# are imported on first use.
+
+class AsyncRateLimiter:
+    """Spaces calls to at most `rate` per second across all tasks of one event loop."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next_slot = time.monotonic()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+async def gather_limited(func, items, concurrency=100, rate=None):
+    """Await `func(item)` for every item with at most `concurrency` in flight.
+
+    Items are pulled from the iterable as slots free up, so memory stays
+    bounded for large or streamed inputs. Returns a tuple of (results,
+    failures) like common.concurrency.run_concurrently.
+    """
+    limiter = AsyncRateLimiter(rate)
+    results = []
+    failures = []
+    pending = set()
+
+    async def call(item):
+        await limiter.wait()
+        try:
+            results.append(await func(item))
+        except Exception as e:
+            failures.append((item, e))
+
+    for item in items:
+        if len(pending) >= concurrency:
+            _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        pending.add(asyncio.ensure_future(call(item)))
+    if pending:
+        await asyncio.wait(pending)
+    return results, failures
+
+class ThreadedClient:
+    """Expose a blocking client, e.g. a boto3 client or a GraphQLClient, through coroutines.
+
+    Each method call runs on the event loop's default executor, and
+    get_paginator() returns a paginator that can be async-iterated like an
+    aiobotocore one. Lets the same async code drive the blocking clients
+    when aiobotocore or httpx is not installed.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    def __getattr__(self, name):
+        method = getattr(self.client, name)
+
+        async def call(*args, **kwargs):
+            return await asyncio.get_running_loop().run_in_executor(
+                None, functools.partial(method, *args, **kwargs))
+        return call
+
+    def get_paginator(self, operation):
+        return _ThreadedPaginator(self.client.get_paginator(operation))
+
+class _ThreadedPaginator:
+    def __init__(self, paginator):
+        self._paginator = paginator
+
+    async def paginate(self, **params):
+        loop = asyncio.get_running_loop()
+        pages = iter(self._paginator.paginate(**params))
+        while True:
+            page = await loop.run_in_executor(None, next, pages, None)
+            if page is None:
+                return
+            yield page
+
+class AsyncGraphQLClient(GraphQLClientBase):
+    """asyncio AppSync client using API key authorization, backed by httpx.
+
+    Requests go through one httpx.AsyncClient with HTTP/2 enabled, so
+    against AppSync they are multiplexed over a few connections, at most
+    `max_connections`. Pass http1=False to require HTTP/2 on a plain
+    http:// endpoint, which cannot negotiate it. Timeouts, hedging, the
+    circuit breaker and metrics are the ones of GraphQLClient (see
+    GraphQLClientBase); pass the same `metrics` to both to report a run in
+    one place. Use as an async context manager, or call aclose().
+    """
+
+    def __init__(self, api_endpoint, api_key, max_connections=100, timeouts=None, hedge=True,
+                 breaker=True, metrics=None, http1=True):
+        super().__init__(api_endpoint, api_key, timeouts, hedge, breaker, metrics)
+        self.max_connections = max_connections
+        self.http1 = http1
+        self._http = None
+
+    def _client(self):
+        if self._http is None:
+            import httpx
+            self._http = httpx.AsyncClient(
+                http1=self.http1,
+                http2=True,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+                headers={'Content-Type': 'application/json', 'x-api-key': self.api_key}
+            )
+        return self._http
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def _send(self, operation, timeout, payload):
+        import httpx
+
+        token = await self.breaker.before_call_async() if self.breaker else None
+        self.metrics.count(operation, 'calls')
+        started = time.perf_counter()
+        try:
+            response = await self._client().post(self.api_endpoint, json=payload,
+                                                 timeout=httpx.Timeout(timeout, connect=CONNECT_TIMEOUT))
+        except asyncio.CancelledError:
+            # The losing request of a hedge; neither a success nor a failure
+            if self.breaker:
+                self.breaker.release(token)
+            raise
+        except httpx.TimeoutException:
+            self._record_failure(operation, token, timed_out=True)
+            raise GraphQLError(f"{operation} timed out after {timeout}s")
+        except httpx.HTTPError as e:
+            self._record_failure(operation, token)
+            raise GraphQLError(f"{operation} failed: {e}")
+
+        self._record_response(operation, token, started, response.status_code)
+        return response
+
+    async def _hedged(self, operation, timeout, payload, deadline):
+        primary = asyncio.ensure_future(self._send(operation, timeout, payload))
+        done, _ = await asyncio.wait({primary}, timeout=deadline)
+        if done:
+            return primary.result()
+
+        self.metrics.count(operation, 'hedges')
+        hedge = asyncio.ensure_future(self._send(operation, timeout, payload))
+        pending = {primary, hedge}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    if task is hedge:
+                        self.metrics.count(operation, 'hedgeWins')
+                    return task.result()
+        return primary.result()
+
+    async def post(self, query, variables=None):
+        """Send one request and return the raw httpx.Response.
+
+        Raises GraphQLError when the request times out or cannot be sent,
+        and CircuitOpenError when the breaker refuses it.
+        """
+        operation, timeout, payload, deadline = self._plan(query, variables)
+        if deadline is None:
+            return await self._send(operation, timeout, payload)
+        return await self._hedged(operation, timeout, payload, deadline)
+
+    async def execute_partial(self, query, variables=None):
+        """Run a request and return (data, errors) without raising on GraphQL errors."""
+        response = await self.post(query, variables)
+        if response.status_code != 200:
+            raise GraphQLError(f"{response.status_code} - {response.text}")
+        result = response.json()
+        return result.get('data') or {}, result.get('errors') or []
+
+    async def execute(self, query, variables=None):
+        """Run a query or mutation and return its 'data' payload."""
+        data, errors = await self.execute_partial(query, variables)
+        if errors:
+            raise GraphQLError(str(errors), errors)
+        return data
+
+    async def _paginate(self, query, operation, variables, page_size):
+        next_token = None
+        while True:
+            page_variables = dict(variables, limit=page_size)
+            if next_token:
+                page_variables["nextToken"] = next_token
+
+            page = (await self.execute(query, page_variables))[operation]
+            for item in page['items']:
+                if item is not None:
+                    yield item
+
+            next_token = page.get('nextToken')
+            if not next_token:
+                break
+
+    def iter_items(self, model, fields, page_size=100, filter=None):
+        """Async-iterate every item of a model, following nextToken pagination."""
+        query, operation = list_query(model, fields)
+        return self._paginate(query, operation, {"filter": filter} if filter else {}, page_size)
+
+    def iter_index(self, model, index_field, value, fields, value_type='String', page_size=100, filter=None):
+        """Async-iterate the items of a model whose secondary index field equals `value`."""
+        query, operation = index_query(model, index_field, fields, value_type)
+        variables = {"value": value}
+        if filter:
+            variables["filter"] = filter
+        return self._paginate(query, operation, variables, page_size)
+
+    async def get_item(self, model, item_id, fields):
+        """Run get<Model> and return the item, or None if it does not exist."""
+        return (await self.execute(item_operation('get', model, fields), {"id": item_id}))[f"get{model}"]
+
+    async def create_item(self, model, input, fields=('id',)):
+        """Run create<Model> and return the created item."""
+        return (await self.execute(item_operation('create', model, fields), {"input": input}))[f"create{model}"]
+
+    async def update_item(self, model, input, condition=None, fields=('id',)):
+        """Run update<Model> and return the updated item."""
+        variables = {"input": input}
+        if condition:
+            variables["condition"] = condition
+        return (await self.execute(item_operation('update', model, fields), variables))[f"update{model}"]
+
+    async def delete_item(self, model, item_id):
+        """Run delete<Model> for a single id and return the deleted id."""
+        return (await self.execute(item_operation('delete', model), {"input": {"id": item_id}}))[f"delete{model}"]
+
+    async def update_items(self, model, updates, fields=('id',)):
+        """Run several update<Model> mutations in one request; see GraphQLClient.update_items."""
+        if not updates:
+            return []
+        data, errors = await self.execute_partial(*batch_update_request(model, updates, fields))
+        return batch_update_results(data, errors, len(updates))
+
+    async def create_items(self, model, inputs, fields=('id',)):
+        """Run several create<Model> mutations in one request; see GraphQLClient.create_items."""
+        if not inputs:
+            return []
+        data, errors = await self.execute_partial(*batch_create_request(model, inputs, fields))
+        return batch_update_results(data, errors, len(inputs), alias='c')
+
+    async def delete_items(self, model, item_ids):
+        """Run several delete<Model> mutations in one request; see GraphQLClient.delete_items."""
+        if not item_ids:
+            return []
+        data, errors = await self.execute_partial(*batch_delete_request(model, item_ids))
+        return batch_update_results(data, errors, len(item_ids), alias='d')
+
+@contextlib.asynccontextmanager
+async def aws_client(service, region_name, max_pool_connections=100):
+    """Open an aiobotocore client, e.g. `async with aws_client('cognito-idp', region) as cognito:`."""
+    from aiobotocore.config import AioConfig
+    from aiobotocore.session import get_session
+
+    config = AioConfig(max_pool_connections=max_pool_connections)
+    async with get_session().create_client(service, region_name=region_name, config=config) as client:
+        yield client
+
+async def paginate(client, operation, result_key, **params):
+    """Async-iterate the items under `result_key` across every page of a paginated AWS operation."""
+    async for page in client.get_paginator(operation).paginate(**params):
+        for item in page.get(result_key, []):
+            yield item
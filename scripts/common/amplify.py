@@ -0,0 +1,34 @@
+import functools
+import json
+import os
+
+@functools.lru_cache(maxsize=None)
+def load_amplify_outputs():
+    """Load the Amplify outputs from the JSON file.
+
+    The file is parsed once per process; callers share the returned dict and
+    must not modify it.
+    """
+    scripts_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    project_root = os.path.dirname(scripts_dir)
+    amplify_outputs_path = os.path.join(project_root, 'amplify_outputs.json')
+    
+    with open(amplify_outputs_path, 'r') as f:
+        return json.load(f)
+
+def get_graphql_settings(amplify_outputs):
+    """Return the GraphQL API endpoint and API key from the 'data' section."""
+    return amplify_outputs['data']['url'], amplify_outputs['data']['api_key']
+
+def get_results_path(file_name):
+    """Return the path of a results file written next to the scripts."""
+    scripts_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(scripts_dir, file_name)
+
+def get_bucket_name(amplify_outputs, name):
+    """Return the S3 bucket name of a storage resource, e.g. 'showcase-bucket'."""
+    storage = amplify_outputs['storage']
+    for bucket in storage.get('buckets', []):
+        if bucket.get('name') == name:
+            return bucket['bucket_name']
+    raise KeyError(f"No bucket named {name} in amplify_outputs.json")
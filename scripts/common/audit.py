@@ -0,0 +1,211 @@
+import asyncio
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from common.graphql import batch_update_results, is_conditional_check_failure
+
+# Action and resource types mirror AuditActionType / AuditResourceType in
+# app/utils/security/auditLogger.ts
+ACTION_CREATE = 'create'
+ACTION_UPDATE = 'update'
+ACTION_DELETE = 'delete'
+ACTION_IMPORT = 'import'
+ACTION_GRADE = 'grade'
+
+RESOURCE_TYPES = {
+    'User': 'user',
+    'StudentProfile': 'student_profile',
+    'InstructorProfile': 'instructor_profile',
+    'Submission': 'submission',
+    'Showcase': 'showcase',
+    'Template': 'template',
+    'Cohort': 'cohort',
+    'Session': 'session',
+    'Delegation': 'delegation'
+}
+
+def utc_now():
+    return datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+
+class GraphQLAuditWriter:
+    """Write audit entries as one GraphQL request with an aliased createAuditLog per entry."""
+
+    max_batch_size = 25
+
+    def __init__(self, client):
+        self.client = client
+
+    def write(self, entries):
+        """Write the entries and return (entry, error) for each one that failed.
+
+        AuditSink generates the entry ids, so an entry that already exists
+        was written by an earlier attempt and counts as written.
+        """
+        params = ', '.join(f"$i{n}: CreateAuditLogInput!" for n in range(len(entries)))
+        fields = '\n'.join(f"a{n}: createAuditLog(input: $i{n}) {{ id }}" for n in range(len(entries)))
+        mutation = f"mutation CreateAuditLogs({params}) {{\n{fields}\n}}"
+        data, errors = self.client.execute_partial(mutation, {f"i{n}": entry for n, entry in enumerate(entries)})
+        results = batch_update_results(data, errors, len(entries), alias='a')
+        return [(entry, error) for entry, (item, error) in zip(entries, results)
+                if item is None and not is_conditional_check_failure(error)]
+
+class AuditSink:
+    """Buffer audit entries in memory and write them in batches.
+
+    Entries are flushed when `max_entries` are buffered or every
+    `flush_interval` seconds. Every entry is also appended to a local spool
+    file, followed by a marker once it has been written, so entries buffered
+    when a script crashes are replayed by the next AuditSink opened on the
+    same spool. After a failed write, flushes triggered by `record` wait
+    with an exponential backoff instead of retrying on every call.
+    """
+
+    def __init__(self, writer, spool_path, actor, max_entries=25, flush_interval=5.0, max_backoff=60.0):
+        self.writer = writer
+        self.spool_path = spool_path
+        self.actor = actor
+        self.max_entries = min(max_entries, writer.max_batch_size)
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+        self.written = 0
+        self._failures = 0
+        self._retry_at = 0.0
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._host = socket.gethostname()
+
+        self._buffer.extend(self._read_spool())
+        # Compact the replayed spool once, so it only holds unwritten entries
+        with open(self.spool_path + '.tmp', 'w') as f:
+            for entry in self._buffer:
+                f.write(json.dumps(entry) + '\n')
+        os.replace(self.spool_path + '.tmp', self.spool_path)
+        self._spool = open(self.spool_path, 'a')
+        self._timer = threading.Thread(target=self._flush_periodically, daemon=True)
+        self._timer.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _read_spool(self):
+        if not os.path.exists(self.spool_path):
+            return []
+        entries = {}
+        with open(self.spool_path, 'r') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # A partially written last line from a crash
+                if 'written' in entry:
+                    for entry_id in entry['written']:
+                        entries.pop(entry_id, None)
+                else:
+                    entries[entry['id']] = entry
+        entries = list(entries.values())
+        if entries:
+            print(f"Replaying {len(entries)} audit entries from {self.spool_path}")
+        return entries
+
+    def record(self, action_type, model, resource_id=None, details=None):
+        """Queue one audit entry for a change made by the script."""
+        if self._queue(action_type, model, resource_id, details):
+            self.flush(force=False)
+
+    async def record_async(self, action_type, model, resource_id=None, details=None):
+        """record() for coroutines: a flush it triggers runs on a worker thread, not the event loop."""
+        if self._queue(action_type, model, resource_id, details) and not self._flush_lock.locked():
+            await asyncio.get_running_loop().run_in_executor(None, self.flush, False)
+
+    def _queue(self, action_type, model, resource_id, details):
+        # Returns whether the buffer is full and due to be flushed
+        entry = {
+            'id': str(uuid.uuid4()),
+            'cognitoUserId': self.actor,
+            'actionType': action_type,
+            'resourceType': RESOURCE_TYPES.get(model, model),
+            'resourceId': resource_id,
+            'timestamp': utc_now(),
+            'userAgent': f"scripts/{self.actor}@{self._host}",
+            'details': json.dumps(details) if details is not None else None
+        }
+        entry = {key: value for key, value in entry.items() if value is not None}
+
+        with self._lock:
+            self._buffer.append(entry)
+            self._append_to_spool([entry])
+            return len(self._buffer) >= self.max_entries and time.monotonic() >= self._retry_at
+
+    def _append_to_spool(self, lines):
+        # Called with self._lock held
+        for line in lines:
+            self._spool.write(json.dumps(line) + '\n')
+        self._spool.flush()
+
+    def flush(self, force=True):
+        """Write every buffered entry; entries stay buffered if a write fails.
+
+        Without `force`, nothing is written while backing off from a failure.
+        """
+        with self._flush_lock:
+            if not force and time.monotonic() < self._retry_at:
+                return
+            while True:
+                with self._lock:
+                    batch = self._buffer[:self.max_entries]
+                if not batch:
+                    return
+                try:
+                    failed = self.writer.write(batch)
+                except Exception as e:
+                    self._back_off(len(batch), e)
+                    return
+                failed_ids = {entry['id'] for entry, _ in failed}
+                written = [entry['id'] for entry in batch if entry['id'] not in failed_ids]
+                with self._lock:
+                    # Failed entries stay at the front of the buffer for the next attempt
+                    self._buffer[:len(batch)] = [entry for entry, _ in failed]
+                    self.written += len(written)
+                    if written:
+                        self._append_to_spool([{'written': written}])
+                    if not failed:
+                        self._failures = 0
+                        self._retry_at = 0.0
+                if failed:
+                    self._back_off(len(failed), failed[0][1].get('message'))
+                    return
+
+    def _back_off(self, count, error):
+        self._failures += 1
+        backoff = min(self.flush_interval * 2 ** (self._failures - 1), self.max_backoff)
+        self._retry_at = time.monotonic() + backoff
+        print(f"Error writing {count} audit entries (kept in {self.spool_path}, "
+              f"retrying in {backoff:.0f}s): {error}")
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self.flush_interval):
+            self.flush(force=False)
+
+    def close(self):
+        """Stop the flush timer and write what is left."""
+        self._closed.set()
+        self._timer.join()
+        self.flush()
+        with self._lock:
+            self._spool.close()
+            if not self._buffer and os.path.exists(self.spool_path):
+                os.remove(self.spool_path)
+
+def open_audit_sink(client, actor, spool_path, **kwargs):
+    """Return an AuditSink writing through the GraphQL API."""
+    return AuditSink(GraphQLAuditWriter(client), spool_path, actor, **kwargs)
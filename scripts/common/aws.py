@@ -0,0 +1,19 @@
+import functools
+
+# boto3 takes a few hundred milliseconds to import, so it is only loaded the
+# first time a script actually asks for a client.
+
+@functools.lru_cache(maxsize=None)
+def get_client(service, region_name):
+    """Return a boto3 client, created once per service and region.
+
+    boto3 clients are thread-safe, so the cached client can be shared by a
+    thread pool.
+    """
+    import boto3
+    return boto3.client(service, region_name=region_name)
+
+def get_resource(service, region_name):
+    """Return a boto3 resource. Resources are not thread-safe and are not cached."""
+    import boto3
+    return boto3.resource(service, region_name=region_name)
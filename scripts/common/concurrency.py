@@ -0,0 +1,59 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+class RateLimiter:
+    """Thread-safe limiter that spaces calls to at most `rate` per second."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+def chunked(items, size):
+    """Yield successive lists of at most `size` items from any iterable."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def run_concurrently(func, items, max_workers=8, batch_size=100, rate=None):
+    """Apply `func` to every item using a thread pool.
+
+    Items are submitted one batch at a time so that memory stays bounded for
+    large inputs. Returns a tuple of (results, failures) where failures is a
+    list of (item, exception) pairs.
+    """
+    limiter = RateLimiter(rate)
+    results = []
+    failures = []
+
+    def call(item):
+        limiter.wait()
+        return func(item)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for batch in chunked(items, batch_size):
+            futures = {executor.submit(call, item): item for item in batch}
+            for future in as_completed(futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    failures.append((futures[future], e))
+    
+    return results, failures
@@ -0,0 +1,164 @@
+import queue
+import threading
+import time
+from decimal import Decimal
+
+from common.aws import get_client
+
+# Models declared in amplify/data/resource.ts, used when the outputs file has
+# no model introspection section
+AMPLIFY_MODELS = [
+    'User', 'Session', 'Delegation', 'AuditLog', 'StudentProfile', 'InstructorProfile',
+    'Cohort', 'Submission', 'Template', 'Showcase', 'Analytics'
+]
+
+# Created on first use so importing this module does not import boto3
+_deserializer = None
+
+def get_dynamodb_client(amplify_outputs, client=None):
+    """Return a DynamoDB client for the region of the data API."""
+    if client is not None:
+        return client
+    return get_client('dynamodb', amplify_outputs['data']['aws_region'])
+
+def get_model_names(amplify_outputs):
+    """Return the model names known to the Amplify outputs."""
+    models = amplify_outputs.get('data', {}).get('model_introspection', {}).get('models')
+    if models:
+        return sorted(models.keys())
+    return list(AMPLIFY_MODELS)
+
+def resolve_table_names(amplify_outputs, dynamodb_client, models=None, table_suffix=None):
+    """Map model names to the DynamoDB tables behind them.
+
+    Amplify names model tables '<Model>-<apiId>-<env>'. Names are taken, in
+    order, from a 'custom.dynamodb_tables' mapping in amplify_outputs.json,
+    from an explicit suffix, or by matching the account's table list.
+    """
+    models = models or get_model_names(amplify_outputs)
+    configured = amplify_outputs.get('custom', {}).get('dynamodb_tables', {})
+
+    tables = {}
+    unresolved = []
+    for model in models:
+        if model in configured:
+            tables[model] = configured[model]
+        elif table_suffix:
+            tables[model] = f"{model}-{table_suffix}"
+        else:
+            unresolved.append(model)
+
+    if unresolved:
+        existing = []
+        for page in dynamodb_client.get_paginator('list_tables').paginate():
+            existing.extend(page['TableNames'])
+        for model in unresolved:
+            matches = [name for name in existing if name.startswith(f"{model}-")]
+            if len(matches) == 1:
+                tables[model] = matches[0]
+            elif matches:
+                raise ValueError(f"Several tables match model {model}: {matches}; pass a table suffix")
+            else:
+                raise ValueError(f"No DynamoDB table found for model {model}")
+
+    return tables
+
+def deserialize_item(item):
+    """Convert a low-level DynamoDB item into plain Python values."""
+    global _deserializer
+    if _deserializer is None:
+        from boto3.dynamodb.types import TypeDeserializer
+        _deserializer = TypeDeserializer()
+    return {key: _plain(_deserializer.deserialize(value)) for key, value in item.items()}
+
+def _plain(value):
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    if isinstance(value, (list, set)):
+        return [_plain(v) for v in value]
+    return value
+
+def scan_segment(dynamodb_client, table_name, segment, total_segments, page_size=1000, **scan_kwargs):
+    """Yield pages of deserialized items for one segment of a parallel Scan."""
+    kwargs = dict(scan_kwargs, TableName=table_name, Limit=page_size)
+    if total_segments > 1:
+        kwargs.update(Segment=segment, TotalSegments=total_segments)
+
+    while True:
+        response = dynamodb_client.scan(**kwargs)
+        yield [deserialize_item(item) for item in response.get('Items', [])]
+
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key:
+            break
+        kwargs['ExclusiveStartKey'] = last_key
+
+class SegmentScanError(Exception):
+    """Raised by parallel_scan, once the other segments are done, when some segments failed."""
+
+    def __init__(self, failed):
+        self.failed = failed
+        super().__init__('; '.join(f"segment {segment}: {e}" for segment, e in sorted(failed.items())))
+
+def parallel_scan(dynamodb_client, table_name, total_segments=4, page_size=1000, max_pending_pages=8,
+                  segments=None, **scan_kwargs):
+    """Yield (segment, items) pages from a segmented Scan run on worker threads.
+
+    Pages are handed over through a bounded queue, so at most
+    `max_pending_pages` pages are held in memory regardless of table size.
+    `segments` limits the scan to some of the `total_segments`. A failing
+    segment does not stop the others; SegmentScanError is raised at the end.
+    """
+    segments = list(range(total_segments)) if segments is None else list(segments)
+    pages = queue.Queue(maxsize=max_pending_pages)
+    done = object()
+    errors = {}
+
+    def worker(segment):
+        try:
+            for items in scan_segment(dynamodb_client, table_name, segment, total_segments,
+                                      page_size, **scan_kwargs):
+                pages.put((segment, items))
+        except Exception as e:
+            errors[segment] = e
+        finally:
+            pages.put(done)
+
+    threads = [threading.Thread(target=worker, args=(segment,), daemon=True) for segment in segments]
+    for thread in threads:
+        thread.start()
+
+    finished = 0
+    while finished < len(segments):
+        page = pages.get()
+        if page is done:
+            finished += 1
+            continue
+        yield page
+
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise SegmentScanError(errors)
+
+def batch_delete(dynamodb_client, table_name, ids, max_attempts=8):
+    """Delete up to 25 items by 'id' with BatchWriteItem, retrying unprocessed keys.
+
+    Returns the number of items deleted.
+    """
+    requests = [{'DeleteRequest': {'Key': {'id': {'S': item_id}}}} for item_id in ids]
+    deleted = 0
+    attempt = 0
+    while requests:
+        response = dynamodb_client.batch_write_item(RequestItems={table_name: requests})
+        unprocessed = response.get('UnprocessedItems', {}).get(table_name, [])
+        deleted += len(requests) - len(unprocessed)
+        requests = unprocessed
+        if requests:
+            attempt += 1
+            if attempt >= max_attempts:
+                raise RuntimeError(f"{len(requests)} deletes still unprocessed in {table_name}")
+            time.sleep(min(0.05 * (2 ** attempt), 5.0))
+    return deleted
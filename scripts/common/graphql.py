@@ -0,0 +1,440 @@
+import functools
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from urllib.parse import urlparse
+
+from common.resilience import CircuitBreaker, CircuitOpenError, RunMetrics
+
+# Models whose generated list query is not simply 'list<Model>s'
+PLURAL_NAMES = {
+    'Analytics': 'Analytics',
+    'AnalyticsRollup': 'AnalyticsRollups'
+}
+
+# Seconds to wait for a response by operation type. Keys may also be
+# operation names such as 'CreateSubmission' to override a single operation.
+DEFAULT_TIMEOUTS = {
+    'query': 10.0,
+    'mutation': 30.0
+}
+CONNECT_TIMEOUT = 5.0
+
+OPERATION_PATTERN = re.compile(r'^\s*(query|mutation)\s*(\w*)')
+
+def operation_name(query):
+    """Return (kind, name) of a GraphQL document, e.g. ('query', 'ListUsers')."""
+    match = OPERATION_PATTERN.match(query)
+    if not match:
+        return 'query', 'anonymous'
+    return match.group(1), match.group(2) or match.group(1)
+
+def list_operation(model):
+    """Return the name of the generated list query for a model."""
+    return f"list{PLURAL_NAMES.get(model, model + 's')}"
+
+def list_query(model, fields):
+    """Return the list<Model>s query selecting `fields` and its operation name."""
+    operation = list_operation(model)
+    fields_selection = '\n'.join(fields)
+    query = f"""
+    query List{model}($filter: Model{model}FilterInput, $limit: Int, $nextToken: String) {{
+        {operation}(filter: $filter, limit: $limit, nextToken: $nextToken) {{
+            items {{
+                {fields_selection}
+            }}
+            nextToken
+        }}
+    }}
+    """
+    return query, operation
+
+def index_query(model, index_field, fields, value_type='String'):
+    """Return the query Amplify generates for index('<field>') and its operation name."""
+    operation = f"list{model}By{index_field[0].upper()}{index_field[1:]}"
+    fields_selection = '\n'.join(fields)
+    query = f"""
+    query {operation[0].upper()}{operation[1:]}($value: {value_type}!, $filter: Model{model}FilterInput, $limit: Int, $nextToken: String) {{
+        {operation}({index_field}: $value, filter: $filter, limit: $limit, nextToken: $nextToken) {{
+            items {{
+                {fields_selection}
+            }}
+            nextToken
+        }}
+    }}
+    """
+    return query, operation
+
+def item_operation(action, model, fields=('id',)):
+    """Return the get query or create, update or delete mutation for one item."""
+    fields_selection = '\n'.join(fields)
+    if action == 'get':
+        return f"""
+    query Get{model}($id: ID!) {{
+        get{model}(id: $id) {{
+            {fields_selection}
+        }}
+    }}
+    """
+    condition = f", $condition: Model{model}ConditionInput" if action == 'update' else ''
+    condition_arg = ", condition: $condition" if action == 'update' else ''
+    name = action.capitalize()
+    return f"""
+    mutation {name}{model}($input: {name}{model}Input!{condition}) {{
+        {action}{model}(input: $input{condition_arg}) {{
+            {fields_selection}
+        }}
+    }}
+    """
+
+def batch_update_request(model, updates, fields=('id',)):
+    """Return the mutation and variables for several aliased update<Model> fields."""
+    fields_selection = ' '.join(fields)
+    params = []
+    selections = []
+    variables = {}
+    for n, (input, condition) in enumerate(updates):
+        params.append(f"$i{n}: Update{model}Input!, $c{n}: Model{model}ConditionInput")
+        selections.append(f"u{n}: update{model}(input: $i{n}, condition: $c{n}) {{ {fields_selection} }}")
+        variables[f"i{n}"] = input
+        variables[f"c{n}"] = condition
+    mutation = f"mutation Update{model}Batch({', '.join(params)}) {{\n" + '\n'.join(selections) + "\n}"
+    return mutation, variables
+
+def batch_create_request(model, inputs, fields=('id',)):
+    """Return the mutation and variables for several aliased create<Model> fields."""
+    fields_selection = ' '.join(fields)
+    params = ', '.join(f"$i{n}: Create{model}Input!" for n in range(len(inputs)))
+    selections = '\n'.join(f"c{n}: create{model}(input: $i{n}) {{ {fields_selection} }}" for n in range(len(inputs)))
+    mutation = f"mutation Create{model}Batch({params}) {{\n{selections}\n}}"
+    return mutation, {f"i{n}": input for n, input in enumerate(inputs)}
+
+def batch_delete_request(model, item_ids):
+    """Return the mutation and variables for several aliased delete<Model> fields."""
+    params = ', '.join(f"$i{n}: Delete{model}Input!" for n in range(len(item_ids)))
+    selections = '\n'.join(f"d{n}: delete{model}(input: $i{n}) {{ id }}" for n in range(len(item_ids)))
+    mutation = f"mutation Delete{model}Batch({params}) {{\n{selections}\n}}"
+    return mutation, {f"i{n}": {"id": item_id} for n, item_id in enumerate(item_ids)}
+
+def batch_update_results(data, errors, count, alias='u'):
+    """Split a batch update response into a list of (item, error) pairs.
+
+    Batch creates and deletes use the aliases 'c' and 'd' instead of 'u'.
+    """
+    errors_by_alias = {}
+    for error in errors:
+        path = error.get('path') or []
+        if path:
+            errors_by_alias[path[0]] = error
+    
+    results = []
+    for n in range(count):
+        item = data.get(f"{alias}{n}")
+        error = errors_by_alias.get(f"{alias}{n}")
+        if item is None and error is None:
+            error = {'message': str(errors) if errors else 'No data returned'}
+        results.append((item, error if item is None else None))
+    return results
+
+class GraphQLError(Exception):
+    """Raised when the API returns a non-200 status or a GraphQL error payload."""
+
+    def __init__(self, message, errors=None):
+        super().__init__(message)
+        self.errors = errors or []
+
+class GraphQLClientBase:
+    """Request policy shared by GraphQLClient and common.aio.AsyncGraphQLClient.
+
+    Every request has a timeout taken from `timeouts` (see DEFAULT_TIMEOUTS).
+    Queries are idempotent, so once an operation has enough latency samples
+    a query still running after that operation's p95 is hedged: a duplicate
+    is sent and the first response wins. All requests pass through a
+    CircuitBreaker that pauses the run while the endpoint keeps failing.
+    Call counts, timeouts, hedges and breaker transitions are kept in
+    `metrics`. Subclasses provide the transport.
+    """
+
+    def __init__(self, api_endpoint, api_key, timeouts=None, hedge=True, breaker=True, metrics=None):
+        self.api_endpoint = api_endpoint
+        self.api_key = api_key
+        self.timeouts = dict(DEFAULT_TIMEOUTS, **(timeouts or {}))
+        self.metrics = metrics or RunMetrics()
+        self.breaker = CircuitBreaker(urlparse(api_endpoint).netloc or api_endpoint,
+                                      metrics=self.metrics) if breaker else None
+        self.hedge = hedge
+
+    def _plan(self, query, variables):
+        """Return (operation, timeout, payload, hedge deadline or None) for one request."""
+        kind, operation = operation_name(query)
+        timeout = self.timeouts.get(operation, self.timeouts[kind])
+        payload = {
+            'query': query,
+            'variables': variables or {}
+        }
+        deadline = self.metrics.latency.percentile(operation, 0.95) if self.hedge and kind == 'query' else None
+        return operation, timeout, payload, deadline
+
+    def _record_response(self, operation, token, started, status):
+        # Throttling and server errors count against the endpoint; client errors do not
+        if status >= 500 or status == 429:
+            self._record_failure(operation, token)
+        else:
+            self.metrics.latency.record(operation, time.perf_counter() - started)
+            if self.breaker:
+                self.breaker.record(True, token)
+
+    def _record_failure(self, operation, token, timed_out=False):
+        if timed_out:
+            self.metrics.count(operation, 'timeouts')
+        self.metrics.count(operation, 'failures')
+        if self.breaker:
+            self.breaker.record(False, token)
+
+class GraphQLClient(GraphQLClientBase):
+    """Minimal AppSync client using API key authorization.
+
+    Each thread gets its own requests.Session so that connections are reused
+    when the client is shared across a thread pool. Timeouts, hedging, the
+    circuit breaker and metrics are described on GraphQLClientBase; hedges
+    run on a pool of up to `hedge_workers` threads. Use as a context
+    manager, or call close() when done, to shut that pool down.
+    """
+
+    def __init__(self, api_endpoint, api_key, timeouts=None, hedge=True, breaker=True,
+                 metrics=None, hedge_workers=32):
+        super().__init__(api_endpoint, api_key, timeouts, hedge, breaker, metrics)
+        self.hedge_workers = hedge_workers
+        self._hedge_pool = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            import requests
+            session = requests.Session()
+            session.headers.update({
+                'Content-Type': 'application/json',
+                'x-api-key': self.api_key
+            })
+            self._local.session = session
+        return session
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """Shut down the hedge threads and close this thread's session.
+
+        Hedges still in flight finish on their threads but are not waited
+        for. A later request starts a new pool and session.
+        """
+        with self._lock:
+            pool, self._hedge_pool = self._hedge_pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+        session = getattr(self._local, 'session', None)
+        if session is not None:
+            session.close()
+            self._local.session = None
+
+    def _send(self, operation, timeout, payload):
+        import requests
+
+        token = self.breaker.before_call() if self.breaker else None
+        self.metrics.count(operation, 'calls')
+        started = time.perf_counter()
+        try:
+            response = self._session().post(self.api_endpoint, json=payload,
+                                            timeout=(CONNECT_TIMEOUT, timeout))
+        except requests.Timeout:
+            self._record_failure(operation, token, timed_out=True)
+            raise GraphQLError(f"{operation} timed out after {timeout}s")
+        except requests.RequestException as e:
+            self._record_failure(operation, token)
+            raise GraphQLError(f"{operation} failed: {e}")
+
+        self._record_response(operation, token, started, response.status_code)
+        return response
+
+    def _hedged(self, operation, timeout, payload, deadline):
+        with self._lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = ThreadPoolExecutor(max_workers=self.hedge_workers,
+                                                      thread_name_prefix='graphql-hedge')
+        primary = self._hedge_pool.submit(self._send, operation, timeout, payload)
+        try:
+            return primary.result(timeout=deadline)
+        except FutureTimeoutError:
+            pass
+
+        self.metrics.count(operation, 'hedges')
+        hedge = self._hedge_pool.submit(self._send, operation, timeout, payload)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self.metrics.count(operation, 'hedgeWins')
+                    return future.result()
+        return primary.result()
+
+    def post(self, query, variables=None):
+        """Send one request and return the raw requests.Response.
+
+        Raises GraphQLError when the request times out or cannot be sent.
+        """
+        operation, timeout, payload, deadline = self._plan(query, variables)
+        if deadline is None:
+            return self._send(operation, timeout, payload)
+        return self._hedged(operation, timeout, payload, deadline)
+
+    def execute_partial(self, query, variables=None):
+        """Run a request and return (data, errors) without raising on GraphQL errors.
+
+        Useful for requests with several aliased fields, where some may fail
+        while the others succeed.
+        """
+        response = self.post(query, variables)
+        
+        if response.status_code != 200:
+            raise GraphQLError(f"{response.status_code} - {response.text}")
+        
+        result = response.json()
+        return result.get('data') or {}, result.get('errors') or []
+
+    def execute(self, query, variables=None):
+        """Run a query or mutation and return its 'data' payload."""
+        data, errors = self.execute_partial(query, variables)
+        if errors:
+            raise GraphQLError(str(errors), errors)
+        
+        return data
+
+    def _paginate(self, query, operation, variables, page_size, page_delay):
+        next_token = None
+        while True:
+            page_variables = dict(variables, limit=page_size)
+            if next_token:
+                page_variables["nextToken"] = next_token
+            
+            page = self.execute(query, page_variables)[operation]
+            for item in page['items']:
+                if item is not None:
+                    yield item
+            
+            next_token = page.get('nextToken')
+            if not next_token:
+                break
+            
+            if page_delay:
+                time.sleep(page_delay)
+
+    def iter_items(self, model, fields, page_size=100, filter=None, page_delay=0.0):
+        """Yield every item of a model, following nextToken pagination."""
+        query, operation = list_query(model, fields)
+        variables = {"filter": filter} if filter else {}
+        return self._paginate(query, operation, variables, page_size, page_delay)
+
+    def iter_index(self, model, index_field, value, fields, value_type='String',
+                   page_size=100, filter=None, page_delay=0.0):
+        """Yield the items of a model whose secondary index field equals `value`.
+
+        Uses the query Amplify generates for index('<field>'), e.g.
+        listSubmissionByCohortId for index('cohortId') on Submission.
+        """
+        query, operation = index_query(model, index_field, fields, value_type)
+        variables = {"value": value}
+        if filter:
+            variables["filter"] = filter
+        return self._paginate(query, operation, variables, page_size, page_delay)
+
+    def get_item(self, model, item_id, fields):
+        """Run get<Model> and return the item, or None if it does not exist."""
+        return self.execute(item_operation('get', model, fields), {"id": item_id})[f"get{model}"]
+
+    def create_item(self, model, input, fields=('id',)):
+        """Run create<Model> and return the created item."""
+        return self.execute(item_operation('create', model, fields), {"input": input})[f"create{model}"]
+
+    def update_item(self, model, input, condition=None, fields=('id',)):
+        """Run update<Model> and return the updated item."""
+        variables = {"input": input}
+        if condition:
+            variables["condition"] = condition
+        
+        return self.execute(item_operation('update', model, fields), variables)[f"update{model}"]
+
+    def delete_item(self, model, item_id):
+        """Run delete<Model> for a single id and return the deleted id."""
+        return self.execute(item_operation('delete', model), {"input": {"id": item_id}})[f"delete{model}"]
+
+    def update_items(self, model, updates, fields=('id',)):
+        """Run several update<Model> mutations in a single request.
+
+        `updates` is a list of (input, condition) pairs; condition may be None.
+        Returns a list aligned with `updates` of (item, error) pairs, where
+        exactly one of the two is set.
+        """
+        if not updates:
+            return []
+        data, errors = self.execute_partial(*batch_update_request(model, updates, fields))
+        return batch_update_results(data, errors, len(updates))
+
+    def create_items(self, model, inputs, fields=('id',)):
+        """Run several create<Model> mutations in a single request.
+
+        Returns a list aligned with `inputs` of (item, error) pairs like
+        update_items.
+        """
+        if not inputs:
+            return []
+        data, errors = self.execute_partial(*batch_create_request(model, inputs, fields))
+        return batch_update_results(data, errors, len(inputs), alias='c')
+
+    def delete_items(self, model, item_ids):
+        """Run several delete<Model> mutations in a single request.
+
+        Returns a list aligned with `item_ids` of (item, error) pairs like
+        update_items. Deleting an id that no longer exists fails the
+        mutation's condition, see is_conditional_check_failure.
+        """
+        if not item_ids:
+            return []
+        data, errors = self.execute_partial(*batch_delete_request(model, item_ids))
+        return batch_update_results(data, errors, len(item_ids), alias='d')
+
+def is_conditional_check_failure(error):
+    """Return True for the error AppSync reports when a mutation condition fails."""
+    return 'ConditionalCheckFailed' in (error.get('errorType') or '') or \
+        'conditional request failed' in (error.get('message') or '').lower()
+
+@functools.lru_cache(maxsize=None)
+def shared_client(api_endpoint, api_key):
+    """Return one GraphQLClient per endpoint, so a script shares its breaker and metrics."""
+    return GraphQLClient(api_endpoint, api_key)
+
+def post(api_endpoint, api_key, query, variables=None):
+    """Send a request through the shared client and return the requests.Response.
+
+    For scripts that check the response status themselves: a request that
+    times out or cannot be sent comes back as a 504 response and a refused
+    call as a 503, so their existing error handling covers it.
+    """
+    import requests
+
+    try:
+        return shared_client(api_endpoint, api_key).post(query, variables)
+    except (GraphQLError, CircuitOpenError) as e:
+        response = requests.Response()
+        response.status_code = 503 if isinstance(e, CircuitOpenError) else 504
+        response._content = str(e).encode('utf-8')
+        response.encoding = 'utf-8'
+        return response
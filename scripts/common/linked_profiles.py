@@ -0,0 +1,121 @@
+import json
+
+# User.linkedProfiles is declared as a.json().array(). Over time it has been
+# written as a JSON string of a list, a list holding that string, and a list
+# of JSON objects. The canonical form is a list with one compact JSON object
+# string per link, {"id": ..., "type": ...} plus any extra keys, with no
+# duplicate (type, id) pairs.
+
+def parse_linked_profiles(value):
+    """Return linkedProfiles as a list of dicts, whatever format it was stored in."""
+    if not value:
+        return []
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            return []
+    if isinstance(value, dict):
+        value = [value]
+
+    profiles = []
+    for entry in value:
+        if isinstance(entry, str):
+            try:
+                entry = json.loads(entry)
+            except json.JSONDecodeError:
+                continue
+        if isinstance(entry, dict):
+            profiles.append(entry)
+        elif isinstance(entry, list):
+            profiles.extend(e for e in entry if isinstance(e, dict))
+    return profiles
+
+def encode_link(link):
+    """Encode one link as its canonical compact JSON string."""
+    return json.dumps(link, sort_keys=True, separators=(',', ':'))
+
+class LinkedProfiles:
+    """Ordered set of profile links keyed by (type, id), with O(1) membership checks."""
+
+    def __init__(self, links=()):
+        self._links = {}
+        self._ids = set()
+        for link in links:
+            self.add_link(link)
+
+    @classmethod
+    def decode(cls, value):
+        """Build the set from a stored linkedProfiles value in any historic format."""
+        return cls(parse_linked_profiles(value))
+
+    def add_link(self, link):
+        """Add a link dict; return True if the set changed. Links without an id are dropped."""
+        if not isinstance(link, dict) or not link.get('id'):
+            return False
+        key = (link.get('type'), link['id'])
+        if key in self._links:
+            return False
+        self._links[key] = dict(link)
+        self._ids.add(link['id'])
+        return True
+
+    def add(self, profile_type, profile_id):
+        """Link a profile; return True if it was not linked yet."""
+        return self.add_link({'type': profile_type, 'id': profile_id})
+
+    def merge(self, other):
+        """Add every link of another LinkedProfiles or stored value; return True if any was new."""
+        if not isinstance(other, LinkedProfiles):
+            other = LinkedProfiles.decode(other)
+        changed = False
+        for link in other:
+            changed = self.add_link(link) or changed
+        return changed
+
+    def discard(self, profile_id):
+        """Remove every link to `profile_id`, whatever its type; return True if any was removed."""
+        if profile_id not in self._ids:
+            return False
+        self._links = {key: link for key, link in self._links.items() if link['id'] != profile_id}
+        self._ids.discard(profile_id)
+        return True
+
+    def remap(self, id_map):
+        """Return a copy with ids replaced through `id_map`, dropping links that become duplicates."""
+        return LinkedProfiles(dict(link, id=id_map.get(link['id'], link['id'])) for link in self)
+
+    def __contains__(self, key):
+        """`(type, id) in links` checks a typed link, `id in links` any link to that id."""
+        if isinstance(key, tuple):
+            return key in self._links
+        return key in self._ids
+
+    def __iter__(self):
+        return iter(self._links.values())
+
+    def __len__(self):
+        return len(self._links)
+
+    def __eq__(self, other):
+        return isinstance(other, LinkedProfiles) and self.encode() == other.encode()
+
+    def encode(self):
+        """Return the canonical stored form: a list of compact JSON strings."""
+        return [encode_link(link) for link in self._links.values()]
+
+def is_canonical(value):
+    """Return True if a stored linkedProfiles value is already in canonical form.
+
+    Entries are compared decoded: AppSync may echo the JSON strings with a
+    different key order or whitespace, which does not need a rewrite.
+    """
+    if value is None:
+        return True
+    if not isinstance(value, list) or not all(isinstance(entry, str) for entry in value):
+        return False
+    try:
+        decoded = [json.loads(entry) for entry in value]
+    except json.JSONDecodeError:
+        return False
+    return decoded == list(LinkedProfiles.decode(value))
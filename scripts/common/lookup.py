@@ -0,0 +1,206 @@
+import heapq
+import io
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+
+# Layout (little endian):
+#   magic | count | key offsets (count + 1) | value offsets (count + 1) | key bytes | value bytes
+# Keys are sorted by their UTF-8 bytes, so lookups binary search the offsets
+# without building a dict. Each entry costs 16 bytes of offsets plus its
+# encoded key and value.
+MAGIC = b'PSLKP001'
+HEADER = struct.Struct('<8sQ')
+OFFSET_SIZE = 8
+RECORD_LENGTHS = struct.Struct('<II')
+
+class SortedStringMap:
+    """Read-only str -> str map packed into one buffer of sorted byte columns.
+
+    The buffer is either bytes built in memory or an mmap of a file written by
+    build_string_map, in which case the map only occupies the pages touched by
+    lookups.
+    """
+
+    def __init__(self, buffer, file=None):
+        if bytes(buffer[:len(MAGIC)]) != MAGIC:
+            raise ValueError("Buffer is not a sorted string map")
+        self._buffer = buffer
+        self._file = file
+        _, self._count = HEADER.unpack_from(buffer, 0)
+
+        start = HEADER.size
+        size = (self._count + 1) * OFFSET_SIZE
+        self._key_offsets = self._offsets(start, size)
+        self._value_offsets = self._offsets(start + size, size)
+        self._keys = start + 2 * size
+        self._values = self._keys + self._key_offsets[self._count]
+
+    def _offsets(self, start, size):
+        if sys.byteorder == 'little':
+            # Zero-copy view over the buffer
+            return memoryview(self._buffer)[start:start + size].cast('Q')
+        offsets = array('Q', bytes(self._buffer[start:start + size]))
+        offsets.byteswap()
+        return offsets
+
+    @classmethod
+    def open(cls, path):
+        """Memory-map a file written by build_string_map."""
+        file = open(path, 'rb')
+        return cls(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ), file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        for offsets in (self._key_offsets, self._value_offsets):
+            if isinstance(offsets, memoryview):
+                offsets.release()
+        if self._file is not None:
+            self._buffer.close()
+            self._file.close()
+
+    def __len__(self):
+        return self._count
+
+    def _key_at(self, position):
+        return self._buffer[self._keys + self._key_offsets[position]:self._keys + self._key_offsets[position + 1]]
+
+    def _value_at(self, position):
+        start = self._values + self._value_offsets[position]
+        return bytes(self._buffer[start:self._values + self._value_offsets[position + 1]]).decode('utf-8')
+
+    def _find(self, key):
+        target = key.encode('utf-8')
+        buffer, keys, offsets = self._buffer, self._keys, self._key_offsets
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            value = buffer[keys + offsets[middle]:keys + offsets[middle + 1]]
+            if value < target:
+                low = middle + 1
+            elif value > target:
+                high = middle
+            else:
+                return middle
+        return -1
+
+    def get(self, key, default=None):
+        position = self._find(key)
+        return self._value_at(position) if position >= 0 else default
+
+    def __getitem__(self, key):
+        position = self._find(key)
+        if position < 0:
+            raise KeyError(key)
+        return self._value_at(position)
+
+    def __contains__(self, key):
+        return self._find(key) >= 0
+
+    def items(self):
+        for position in range(self._count):
+            yield bytes(self._key_at(position)).decode('utf-8'), self._value_at(position)
+
+def _unique_last(pairs):
+    """Drop all but the last of each run of equal keys, like repeated dict assignment."""
+    previous = None
+    for pair in pairs:
+        if previous is not None and pair[0] != previous[0]:
+            yield previous
+        previous = pair
+    if previous is not None:
+        yield previous
+
+def _write_run(directory, pairs):
+    run = tempfile.TemporaryFile(dir=directory)
+    for key, value in pairs:
+        run.write(RECORD_LENGTHS.pack(len(key), len(value)))
+        run.write(key)
+        run.write(value)
+    run.seek(0)
+    return run
+
+def _read_run(run):
+    while True:
+        lengths = run.read(RECORD_LENGTHS.size)
+        if not lengths:
+            return
+        key_length, value_length = RECORD_LENGTHS.unpack(lengths)
+        yield run.read(key_length), run.read(value_length)
+
+def _copy(source, out):
+    source.seek(0)
+    while True:
+        chunk = source.read(1 << 20)
+        if not chunk:
+            return
+        out.write(chunk)
+
+def _write_map(out, pairs, spool):
+    """Write sorted, de-duplicated (key bytes, value bytes) pairs in the map layout.
+
+    Keys and values are collected in two spool files (see `spool`) while the
+    offsets are built, then copied after the header and offsets.
+    """
+    key_offsets = array('Q', [0])
+    value_offsets = array('Q', [0])
+    with spool() as keys, spool() as values:
+        for key, value in pairs:
+            keys.write(key)
+            values.write(value)
+            key_offsets.append(key_offsets[-1] + len(key))
+            value_offsets.append(value_offsets[-1] + len(value))
+
+        count = len(key_offsets) - 1
+        if sys.byteorder != 'little':
+            key_offsets.byteswap()
+            value_offsets.byteswap()
+        out.write(HEADER.pack(MAGIC, count))
+        out.write(key_offsets.tobytes())
+        out.write(value_offsets.tobytes())
+        _copy(keys, out)
+        _copy(values, out)
+    return count
+
+def build_string_map(pairs, path=None, run_size=500000):
+    """Build a SortedStringMap from (key, value) string pairs.
+
+    Later pairs win over earlier ones with the same key. Without `path` the
+    map is built in memory. With `path`, pairs are sorted in runs of
+    `run_size` spilled to temporary files and merged into `path`, which is
+    then memory-mapped, so maps larger than RAM can be built and queried.
+    """
+    directory = os.path.dirname(os.path.abspath(path)) if path else None
+    runs = []
+    buffered = []
+    try:
+        for key, value in pairs:
+            buffered.append((key.encode('utf-8'), value.encode('utf-8')))
+            if path and len(buffered) >= run_size:
+                buffered.sort(key=lambda pair: pair[0])
+                runs.append(_write_run(directory, buffered))
+                buffered = []
+        buffered.sort(key=lambda pair: pair[0])
+
+        if not path:
+            out = io.BytesIO()
+            _write_map(out, _unique_last(buffered), io.BytesIO)
+            return SortedStringMap(out.getvalue())
+
+        # heapq.merge keeps equal keys in run order, so the last write still wins
+        sources = [_read_run(run) for run in runs] + [iter(buffered)]
+        with open(path, 'wb') as out:
+            _write_map(out, _unique_last(heapq.merge(*sources, key=lambda pair: pair[0])),
+                       lambda: tempfile.TemporaryFile(dir=directory))
+    finally:
+        for run in runs:
+            run.close()
+    return SortedStringMap.open(path)
@@ -0,0 +1,218 @@
+import io
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+from common.amplify import get_results_path
+
+# Built-in profiling for the scripts. Running any script with --profile
+# times its phases and samples its stacks into a flamegraph-compatible
+# folded file. --profile=cpu adds cProfile, --profile=memory adds
+# tracemalloc, --profile=all adds both. Every file is written next to the
+# other results as <script>_profile.*. cProfile and pstats are imported
+# only when asked for, so scripts run without --profile start as fast as before.
+
+PROFILE_MODES = ('timers', 'cpu', 'memory', 'all')
+
+_active = None
+
+class Profiler:
+    """Per-phase wall/CPU timers plus optional stack sampling, cProfile and tracemalloc."""
+
+    def __init__(self, script, mode='timers', sample_interval=0.005):
+        self.script = script
+        self.mode = mode
+        self.sample_interval = sample_interval
+        self.phases = []
+        self.stacks = Counter()
+        self._current = None
+        self._cprofile = None
+        if mode in ('cpu', 'all'):
+            import cProfile
+            self._cprofile = cProfile.Profile()
+        self._memory = mode in ('memory', 'all')
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, name='profile-sampler', daemon=True)
+
+    def start(self):
+        if self._memory:
+            tracemalloc.start()
+        self._started = time.perf_counter()
+        self._started_cpu = time.process_time()
+        self.phase('setup')
+        self._sampler.start()
+        if self._cprofile:
+            self._cprofile.enable()
+
+    def phase(self, name):
+        """End the current phase and start a new one called `name`."""
+        now = time.perf_counter()
+        cpu = time.process_time()
+        if self._current is not None:
+            current = self._current
+            current['seconds'] += now - current.pop('_started')
+            current['cpuSeconds'] += cpu - current.pop('_started_cpu')
+            if self._memory and tracemalloc.is_tracing():
+                allocated, peak = tracemalloc.get_traced_memory()
+                current['memoryPeakBytes'] = max(current['memoryPeakBytes'], peak)
+                current['memoryDeltaBytes'] += allocated - current.get('_allocated', allocated)
+            current.pop('_allocated', None)
+
+        if name is None:
+            self._current = None
+            return
+
+        # A phase entered again, e.g. once per loop iteration, accumulates into one row
+        phase = next((p for p in self.phases if p['name'] == name), None)
+        if phase is None:
+            phase = {'name': name, 'entries': 0, 'seconds': 0.0, 'cpuSeconds': 0.0,
+                     'memoryPeakBytes': 0, 'memoryDeltaBytes': 0}
+            self.phases.append(phase)
+        phase['entries'] += 1
+        phase['_started'] = now
+        phase['_started_cpu'] = cpu
+        if self._memory and tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+            phase['_allocated'] = tracemalloc.get_traced_memory()[0]
+        self._current = phase
+
+    def _sample(self):
+        # Wall-clock sampling, so time spent waiting on the network shows up too
+        sampler_id = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.sample_interval):
+            current = self._current
+            phase = current['name'] if current else 'finish'
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == sampler_id:
+                    continue
+                if thread_id not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, 'thread'))
+                stack.append(phase)
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def finish(self):
+        """Stop profiling, write the profile files and print the phase table."""
+        if self._cprofile:
+            self._cprofile.disable()
+        self._stop.set()
+        self._sampler.join()
+        self.phase(None)
+        total = time.perf_counter() - self._started
+        total_cpu = time.process_time() - self._started_cpu
+
+        paths = {'summary': get_results_path(f"{self.script}_profile.json"),
+                 'table': get_results_path(f"{self.script}_profile.txt"),
+                 'folded': get_results_path(f"{self.script}_profile.folded")}
+
+        with open(paths['folded'], 'w') as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(f"{stack} {count}\n")
+
+        if self._cprofile:
+            paths['pstats'] = get_results_path(f"{self.script}_profile.pstats")
+            self._cprofile.dump_stats(paths['pstats'])
+
+        top_allocations = []
+        if self._memory and tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            for stat in snapshot.statistics('lineno')[:25]:
+                frame = stat.traceback[0]
+                top_allocations.append({'location': f"{frame.filename}:{frame.lineno}",
+                                        'bytes': stat.size, 'blocks': stat.count})
+
+        table = self.table(total)
+        with open(paths['table'], 'w') as f:
+            f.write(table + '\n')
+            if self._cprofile:
+                import pstats
+                stream = io.StringIO()
+                pstats.Stats(self._cprofile, stream=stream).sort_stats('cumulative').print_stats(30)
+                f.write('\n' + stream.getvalue())
+            if top_allocations:
+                f.write('\nLargest allocations still held at exit:\n')
+                for allocation in top_allocations:
+                    f.write(f"{allocation['bytes']:>12,} B {allocation['blocks']:>8} blocks  "
+                            f"{allocation['location']}\n")
+
+        with open(paths['summary'], 'w') as f:
+            json.dump({
+                'script': self.script,
+                'mode': self.mode,
+                'seconds': round(total, 3),
+                'cpuSeconds': round(total_cpu, 3),
+                'phases': [dict(phase, seconds=round(phase['seconds'], 3), cpuSeconds=round(phase['cpuSeconds'], 3))
+                           for phase in self.phases],
+                'samples': sum(self.stacks.values()),
+                'topAllocations': top_allocations,
+                'files': paths
+            }, f, indent=2)
+
+        print(f"\n{table}")
+        print(f"Profile saved to {paths['table']} (stacks for flamegraph.pl or speedscope: {paths['folded']})")
+
+    def table(self, total):
+        """Return the per-phase summary as a printable table."""
+        lines = [f"{'phase':<24} {'entries':>8} {'seconds':>9} {'cpu s':>8} {'% wall':>7}"
+                 + (f" {'peak MB':>8} {'delta MB':>9}" if self._memory else '')]
+        for phase in self.phases:
+            line = (f"{phase['name'][:24]:<24} {phase['entries']:>8} {phase['seconds']:>9.3f} "
+                    f"{phase['cpuSeconds']:>8.3f} {100 * phase['seconds'] / total if total else 0:>6.1f}%")
+            if self._memory:
+                line += f" {phase['memoryPeakBytes'] / 1e6:>8.1f} {phase['memoryDeltaBytes'] / 1e6:>9.1f}"
+            lines.append(line)
+        lines.append(f"{'total':<24} {'':>8} {total:>9.3f}")
+        return '\n'.join(lines)
+
+def phase(name):
+    """Mark the start of a script phase, e.g. phase('fetch tables'). A no-op unless run with --profile."""
+    if _active is not None:
+        _active.phase(name)
+
+def pop_profile_flag(argv):
+    """Remove --profile[=MODE] from argv and return the mode, or None when absent."""
+    for n, arg in enumerate(argv[1:], start=1):
+        if arg == '--profile':
+            mode = 'timers'
+            if n + 1 < len(argv) and argv[n + 1] in PROFILE_MODES:
+                mode = argv.pop(n + 1)
+            argv.pop(n)
+            return mode
+        if arg.startswith('--profile='):
+            mode = arg.split('=', 1)[1]
+            if mode not in PROFILE_MODES:
+                raise SystemExit(f"--profile must be one of: {', '.join(PROFILE_MODES)}")
+            argv.pop(n)
+            return mode
+    return None
+
+def run(main):
+    """Run a script's main(), profiling it when --profile is on the command line.
+
+    The flag is removed before main() parses its own arguments, so it works
+    for every script whether or not it uses argparse.
+    """
+    global _active
+    mode = pop_profile_flag(sys.argv)
+    if mode is None:
+        return main()
+
+    script = os.path.splitext(os.path.basename(sys.argv[0]))[0]
+    _active = Profiler(script, mode)
+    _active.start()
+    try:
+        return main()
+    finally:
+        profiler, _active = _active, None
+        profiler.finish()
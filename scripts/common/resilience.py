@@ -0,0 +1,200 @@
+import asyncio
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from datetime import datetime, timezone
+
+class CircuitOpenError(Exception):
+    """Raised when a call is refused because its circuit breaker is open."""
+
+class LatencyTracker:
+    """Keeps the most recent successful call durations per operation."""
+
+    def __init__(self, window=200, min_samples=20):
+        self.min_samples = min_samples
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+        self._lock = threading.Lock()
+
+    def record(self, operation, seconds):
+        with self._lock:
+            self._samples[operation].append(seconds)
+
+    def percentile(self, operation, fraction):
+        """Return the given percentile in seconds, or None until there are enough samples."""
+        with self._lock:
+            samples = sorted(self._samples.get(operation, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+class RunMetrics:
+    """Thread-safe counters for calls, timeouts, hedges and breaker transitions."""
+
+    def __init__(self):
+        self.latency = LatencyTracker()
+        self._lock = threading.Lock()
+        self._counters = defaultdict(Counter)
+        self._transitions = []
+
+    def count(self, operation, name, amount=1):
+        with self._lock:
+            self._counters[operation][name] += amount
+
+    def breaker_transition(self, breaker, old_state, new_state, error_rate):
+        with self._lock:
+            self._transitions.append({
+                'breaker': breaker,
+                'from': old_state,
+                'to': new_state,
+                'errorRate': round(error_rate, 3) if error_rate is not None else None,
+                'at': datetime.now(timezone.utc).isoformat(timespec='seconds').replace('+00:00', 'Z')
+            })
+
+    def snapshot(self):
+        """Return the metrics as a JSON-serializable dict for results files."""
+        with self._lock:
+            counters = {operation: dict(counts) for operation, counts in self._counters.items()}
+            transitions = list(self._transitions)
+
+        operations = {}
+        for operation, counts in sorted(counters.items()):
+            p50 = self.latency.percentile(operation, 0.50)
+            p95 = self.latency.percentile(operation, 0.95)
+            hedges = counts.get('hedges', 0)
+            operations[operation] = {
+                'calls': counts.get('calls', 0),
+                'failures': counts.get('failures', 0),
+                'timeouts': counts.get('timeouts', 0),
+                'p50Ms': round(p50 * 1000, 1) if p50 is not None else None,
+                'p95Ms': round(p95 * 1000, 1) if p95 is not None else None,
+                'hedges': hedges,
+                'hedgeWins': counts.get('hedgeWins', 0),
+                'hedgeWinRate': round(counts.get('hedgeWins', 0) / hedges, 3) if hedges else None
+            }
+        return {'operations': operations, 'breakerTransitions': transitions}
+
+    def summary_lines(self):
+        """Return one printable line per operation, plus breaker transitions."""
+        snapshot = self.snapshot()
+        lines = []
+        for operation, stats in snapshot['operations'].items():
+            line = f"{operation}: {stats['calls']} calls, {stats['failures']} failed, {stats['timeouts']} timed out"
+            if stats['p95Ms'] is not None:
+                line += f", p95 {stats['p95Ms']} ms"
+            if stats['hedges']:
+                line += f", {stats['hedges']} hedged ({stats['hedgeWins']} won)"
+            lines.append(line)
+        for transition in snapshot['breakerTransitions']:
+            lines.append(f"Circuit {transition['breaker']} {transition['from']} -> {transition['to']} "
+                         f"at {transition['at']}")
+        return lines
+
+class CircuitBreaker:
+    """Pauses calls to a target whose recent error rate is too high.
+
+    The breaker opens when at least `min_calls` calls finished in the last
+    `window` seconds and the share of failures reaches `error_rate`. While
+    open, callers wait up to `max_wait` seconds (0 fails fast) and then get
+    CircuitOpenError; after `cooldown` seconds one probe call is let
+    through. Only the probe's outcome closes the breaker or opens it again.
+
+    State changes are kept in `metrics`, for the run summary, and passed to
+    `on_transition(name, old_state, new_state)` when it is given.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, error_rate=0.5, min_calls=10, window=30.0, cooldown=15.0,
+                 max_wait=60.0, metrics=None, on_transition=None):
+        self.name = name
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.cooldown = cooldown
+        self.max_wait = max_wait
+        self.metrics = metrics
+        self.on_transition = on_transition
+        self.state = self.CLOSED
+        self._calls = deque()
+        self._opened_at = 0.0
+        self._probe = None
+        self._lock = threading.Lock()
+
+    def _transition(self, state, error_rate=None):
+        if state == self.state:
+            return
+        old_state, self.state = self.state, state
+        if self.metrics is not None:
+            self.metrics.breaker_transition(self.name, old_state, state, error_rate)
+        if self.on_transition is not None:
+            self.on_transition(self.name, old_state, state)
+
+    def _admit(self):
+        """Return (True, token) when a call may start now, else (False, seconds to wait)."""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == self.CLOSED:
+                return True, None
+            if self.state == self.OPEN and now - self._opened_at >= self.cooldown:
+                self._transition(self.HALF_OPEN)
+            if self.state == self.HALF_OPEN and self._probe is None:
+                self._probe = object()
+                return True, self._probe
+            return False, max(0.05, self.cooldown - (now - self._opened_at)) if self.state == self.OPEN else 0.05
+
+    def before_call(self):
+        """Wait until a call is allowed and return the token to pass to record().
+
+        Raises CircuitOpenError after `max_wait` seconds.
+        """
+        started = time.monotonic()
+        while True:
+            admitted, value = self._admit()
+            if admitted:
+                return value
+            if time.monotonic() - started + value > self.max_wait:
+                raise CircuitOpenError(f"Circuit {self.name} is open")
+            time.sleep(min(value, 1.0))
+
+    async def before_call_async(self):
+        """before_call for coroutines: waits with asyncio.sleep instead of blocking the event loop."""
+        started = time.monotonic()
+        while True:
+            admitted, value = self._admit()
+            if admitted:
+                return value
+            if time.monotonic() - started + value > self.max_wait:
+                raise CircuitOpenError(f"Circuit {self.name} is open")
+            await asyncio.sleep(min(value, 1.0))
+
+    def release(self, token):
+        """Give back a probe whose call was abandoned before it finished, e.g. a cancelled hedge."""
+        with self._lock:
+            if token is not None and token is self._probe:
+                self._probe = None
+
+    def record(self, success, token=None):
+        """Record the outcome of a call let through by before_call, with the token it returned."""
+        with self._lock:
+            now = time.monotonic()
+            if token is not None and token is self._probe:
+                self._probe = None
+                self._calls.clear()
+                if success:
+                    self._transition(self.CLOSED)
+                else:
+                    self._opened_at = now
+                    self._transition(self.OPEN, 1.0)
+                return
+
+            self._calls.append((now, success))
+            while self._calls and now - self._calls[0][0] > self.window:
+                self._calls.popleft()
+            if self.state == self.CLOSED and len(self._calls) >= self.min_calls:
+                failures = sum(1 for _, ok in self._calls if not ok)
+                rate = failures / len(self._calls)
+                if rate >= self.error_rate:
+                    self._opened_at = now
+                    self._transition(self.OPEN, rate)
@@ -0,0 +1,281 @@
+import array
+import gzip
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+from collections import Counter, defaultdict
+
+# File layout (little endian):
+#   magic | fixed header | term entries | term strings | postings | doc lengths | doc offsets | doc store
+# Term entries are sorted by term bytes so lookups binary search the mmap
+# without loading the dictionary.
+MAGIC = b'PSIDX001'
+HEADER = struct.Struct('<IIdQQQQQQ')
+TERM_ENTRY = struct.Struct('<QIQI')  # string offset, string length, postings offset, document frequency
+POSTING = struct.Struct('<II')  # doc number, term frequency
+DOC_LENGTH = struct.Struct('<I')
+DOC_OFFSET = struct.Struct('<Q')
+
+FILTER_FIELDS = ('skill', 'tech', 'location', 'cohort')
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#.]*")
+STOPWORDS = frozenset(
+    'a an and are as at be by for from has have i in is it of on or that the this to was were will with'.split()
+)
+
+def tokenize(text):
+    """Lowercase and split text, keeping tokens such as 'c++', 'c#' and 'node.js'."""
+    if not text:
+        return []
+    tokens = []
+    for token in TOKEN_PATTERN.findall(str(text).lower()):
+        token = token.rstrip('.')
+        if token and token not in STOPWORDS:
+            tokens.append(token)
+    return tokens
+
+def filter_term(field, value):
+    """Normalized exact-match term for a filter field, e.g. 'tech:react'."""
+    return f"{field}:{' '.join(tokenize(value)) if field != 'cohort' else value}"
+
+def document_terms(doc):
+    """Return the Counter of indexed terms for one search document.
+
+    Full-text terms come from the title, bio, location, skills, technologies
+    and submission titles; filter terms are prefixed with their field name.
+    """
+    terms = Counter()
+    for field in ('title', 'bio', 'location', 'name'):
+        terms.update(tokenize(doc.get(field)))
+    for value in doc.get('skills', []) + doc.get('technologies', []) + doc.get('projectTitles', []):
+        terms.update(tokenize(value))
+
+    for skill in doc.get('skills', []):
+        terms[filter_term('skill', skill)] += 1
+    for technology in doc.get('technologies', []):
+        terms[filter_term('tech', technology)] += 1
+    for token in tokenize(doc.get('location')):
+        terms[f"location:{token}"] += 1
+    if doc.get('cohortId'):
+        terms[filter_term('cohort', doc['cohortId'])] += 1
+    return terms
+
+# Source rows kept in the snapshot between builds
+PROFILE_FIELDS = ['id', 'firstName', 'lastName', 'title', 'bio', 'location', 'skills', 'cohortId', 'updatedAt']
+SUBMISSION_FIELDS = ['id', 'studentProfileId', 'title', 'technologies', 'cohortId', 'updatedAt']
+
+INDEX_FILE = 'search_index.bin'
+SNAPSHOT_FILE = 'search_index_snapshot.json.gz'
+
+def skill_names(skills):
+    """Return skill names from the StudentProfile.skills JSON array."""
+    names = []
+    for skill in skills or []:
+        if isinstance(skill, str):
+            try:
+                skill = json.loads(skill)
+            except json.JSONDecodeError:
+                pass
+        if isinstance(skill, dict):
+            skill = skill.get('name')
+        if isinstance(skill, str) and skill:
+            names.append(skill)
+    return names
+
+def empty_snapshot():
+    return {'watermark': None, 'StudentProfile': {}, 'Submission': {}}
+
+def load_snapshot(path):
+    """Return the source rows indexed by the last build, keyed by model and id."""
+    if not os.path.exists(path):
+        return empty_snapshot()
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_snapshot(path, snapshot):
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        json.dump(snapshot, f, separators=(',', ':'))
+
+def build_documents(snapshot):
+    """Join profiles with their submissions into one search document per profile."""
+    submissions_by_profile = {}
+    for submission in snapshot['Submission'].values():
+        submissions_by_profile.setdefault(submission.get('studentProfileId'), []).append(submission)
+
+    docs = []
+    for profile in snapshot['StudentProfile'].values():
+        submissions = submissions_by_profile.get(profile['id'], [])
+        technologies = sorted({t for s in submissions for t in (s.get('technologies') or []) if t})
+        docs.append({
+            'id': profile['id'],
+            'name': f"{profile.get('firstName') or ''} {profile.get('lastName') or ''}".strip(),
+            'title': profile.get('title'),
+            'bio': profile.get('bio'),
+            'location': profile.get('location'),
+            'cohortId': profile.get('cohortId'),
+            'skills': skill_names(profile.get('skills')),
+            'technologies': technologies,
+            'projectTitles': [s['title'] for s in submissions if s.get('title')],
+            'updatedAt': max([profile.get('updatedAt') or ''] + [s.get('updatedAt') or '' for s in submissions])
+        })
+    docs.sort(key=lambda doc: doc['id'])
+    return docs
+
+def write_index(path, docs):
+    """Build the inverted index for a list of documents and write it to `path`.
+
+    Each document is a dict with at least an 'id'; the fields listed in
+    document_terms are indexed and 'id', 'name', 'location', 'cohortId' and
+    'updatedAt' are kept in the document store returned by queries.
+    """
+    postings = defaultdict(list)
+    doc_lengths = []
+    for doc_number, doc in enumerate(docs):
+        terms = document_terms(doc)
+        doc_lengths.append(sum(count for term, count in terms.items() if ':' not in term))
+        for term, count in terms.items():
+            postings[term].append((doc_number, count))
+
+    sorted_terms = sorted(postings, key=lambda term: term.encode('utf-8'))
+    avg_doc_length = (sum(doc_lengths) / len(doc_lengths)) if doc_lengths else 0.0
+
+    term_strings = bytearray()
+    postings_blob = bytearray()
+    entries = bytearray()
+    for term in sorted_terms:
+        encoded = term.encode('utf-8')
+        entries += TERM_ENTRY.pack(len(term_strings), len(encoded), len(postings_blob), len(postings[term]))
+        term_strings += encoded
+        for doc_number, count in postings[term]:
+            postings_blob += POSTING.pack(doc_number, count)
+
+    doc_store = bytearray()
+    doc_offsets = bytearray()
+    for doc in docs:
+        doc_offsets += DOC_OFFSET.pack(len(doc_store))
+        stored = {key: doc.get(key) for key in ('id', 'name', 'location', 'cohortId', 'updatedAt')}
+        doc_store += json.dumps(stored, separators=(',', ':')).encode('utf-8')
+    doc_offsets += DOC_OFFSET.pack(len(doc_store))
+
+    lengths_blob = b''.join(DOC_LENGTH.pack(length) for length in doc_lengths)
+
+    offset = len(MAGIC) + HEADER.size
+    sections = []
+    for blob in (entries, term_strings, postings_blob, lengths_blob, doc_offsets):
+        sections.append(offset)
+        offset += len(blob)
+    sections.append(offset)  # doc store
+
+    with open(path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(HEADER.pack(len(docs), len(sorted_terms), avg_doc_length, *sections))
+        for blob in (entries, term_strings, postings_blob, lengths_blob, doc_offsets, doc_store):
+            f.write(blob)
+
+    return {'documents': len(docs), 'terms': len(sorted_terms), 'bytes': offset + len(doc_store)}
+
+class SearchIndex:
+    """Read-only, memory-mapped view of an index written by write_index."""
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a search index")
+        (self.doc_count, self.term_count, self.avg_doc_length, self._entries, self._strings,
+         self._postings, self._lengths, self._doc_offsets, self._doc_store) = \
+            HEADER.unpack_from(self._mm, len(MAGIC))
+        self._doc_lengths = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+    def _term_at(self, position):
+        string_offset, length, postings_offset, df = TERM_ENTRY.unpack_from(
+            self._mm, self._entries + position * TERM_ENTRY.size)
+        start = self._strings + string_offset
+        return self._mm[start:start + length], postings_offset, df
+
+    def postings(self, term):
+        """Return [(doc number, term frequency)] for a term, found by binary search."""
+        target = term.encode('utf-8')
+        low, high = 0, self.term_count
+        while low < high:
+            middle = (low + high) // 2
+            value, postings_offset, df = self._term_at(middle)
+            if value < target:
+                low = middle + 1
+            elif value > target:
+                high = middle
+            else:
+                start = self._postings + postings_offset
+                return list(POSTING.iter_unpack(self._mm[start:start + df * POSTING.size]))
+        return []
+
+    def document(self, doc_number):
+        start, end = struct.unpack_from('<QQ', self._mm, self._doc_offsets + doc_number * DOC_OFFSET.size)
+        return json.loads(self._mm[self._doc_store + start:self._doc_store + end])
+
+    def _doc_length_array(self):
+        # Four bytes per document, decoded once on the first ranked query
+        if self._doc_lengths is None:
+            self._doc_lengths = array.array('I', self._mm[self._lengths:self._doc_offsets])
+            if sys.byteorder != 'little':
+                self._doc_lengths.byteswap()
+        return self._doc_lengths
+
+    def search(self, text=None, filters=None, limit=20, scoring='bm25', k1=1.2, b=0.75):
+        """Return matching documents, best first.
+
+        `filters` maps 'skill', 'tech', 'location' or 'cohort' to a value;
+        every filter must match. Free text matches documents containing any
+        query token; with scoring='bm25' results are ranked by BM25, otherwise
+        by the number of matching query tokens.
+        """
+        candidates = None
+        for field, value in (filters or {}).items():
+            if field not in FILTER_FIELDS:
+                raise ValueError(f"Unknown filter {field}; expected one of {FILTER_FIELDS}")
+            if field == 'location':
+                terms = [f"location:{token}" for token in tokenize(value)]
+            else:
+                terms = [filter_term(field, value)]
+            for term in terms:
+                docs = {doc_number for doc_number, _ in self.postings(term)}
+                candidates = docs if candidates is None else candidates & docs
+            if not candidates:
+                return []
+
+        scores = defaultdict(float)
+        tokens = tokenize(text)
+        if tokens:
+            doc_lengths = self._doc_length_array()
+            for token in set(tokens):
+                postings = self.postings(token)
+                if not postings:
+                    continue
+                idf = math.log(1 + (self.doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_number, tf in postings:
+                    if candidates is not None and doc_number not in candidates:
+                        continue
+                    if scoring == 'bm25':
+                        norm = 1 - b + b * doc_lengths[doc_number] / (self.avg_doc_length or 1)
+                        scores[doc_number] += idf * tf * (k1 + 1) / (tf + k1 * norm)
+                    else:
+                        scores[doc_number] += 1
+        elif candidates is not None:
+            scores = {doc_number: 0.0 for doc_number in candidates}
+
+        ranked = sorted(scores.items(), key=lambda pair: (-pair[1], pair[0]))[:limit]
+        return [dict(self.document(doc_number), score=round(score, 4)) for doc_number, score in ranked]
@@ -0,0 +1,126 @@
+import hashlib
+import json
+
+from common.audit import ACTION_CREATE, ACTION_UPDATE
+from common.concurrency import chunked, run_concurrently
+from common.graphql import is_conditional_check_failure
+
+PROFILE_FIELDS = ['id', 'userId', 'firstName', 'lastName', 'title', 'bio', 'profileImageUrl', 'location',
+                  'education', 'skills', 'socialLinks', 'contactEmail', 'isStaff']
+SUBMISSION_FIELDS = ['id', 'studentProfileId', 'title', 'description', 'technologies', 'featuredImageUrl',
+                     'repoLink', 'demoLink', 'deployedUrl', 'showcasePriority', 'week']
+SHOWCASE_FIELDS = ['id', 'studentProfileId', 'profile', 'projects', 'updatedAt']
+
+def parse_json(value):
+    """Decode an AWSJSON value, or each element of an a.json().array() value."""
+    if isinstance(value, list):
+        return [parse_json(v) for v in value]
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError:
+            return value
+    return value
+
+def is_published(showcase):
+    """Return True for a showcase whose publication status is 'published'."""
+    publication = parse_json(showcase.get('publication'))
+    return isinstance(publication, dict) and publication.get('status') == 'published'
+
+def profile_payload(profile):
+    """Build Showcase.profile from a StudentProfile, in the shape the templates read."""
+    payload = {
+        'firstName': profile.get('firstName'),
+        'lastName': profile.get('lastName'),
+        'title': profile.get('title'),
+        'bio': profile.get('bio'),
+        'avatarUrl': profile.get('profileImageUrl'),
+        'location': profile.get('location'),
+        'contactEmail': profile.get('contactEmail'),
+        'skills': parse_json(profile.get('skills')) or [],
+        'education': parse_json(profile.get('education')) or [],
+        'socialLinks': parse_json(profile.get('socialLinks')) or {}
+    }
+    return {key: value for key, value in payload.items() if value is not None}
+
+def project_order(submission):
+    # Lowest showcasePriority first; submissions without one follow in week order
+    priority = submission.get('showcasePriority')
+    return (priority is None, priority or 0, submission.get('week') or 0, submission['id'])
+
+def projects_payload(submissions):
+    """Build Showcase.projects from a profile's included submissions, like ProjectSelector does."""
+    return [{
+        'id': submission['id'],
+        'title': submission.get('title') or '',
+        'description': submission.get('description') or '',
+        'technologies': submission.get('technologies') or [],
+        'featuredImageUrl': submission.get('featuredImageUrl'),
+        'repoLink': submission.get('repoLink'),
+        'demoLink': submission.get('demoLink'),
+        'deployedUrl': submission.get('deployedUrl'),
+        'isIncluded': True,
+        'displayOrder': order
+    } for order, submission in enumerate(sorted(submissions, key=project_order), start=1)]
+
+def content_hash(profile, projects):
+    """Hash the decoded payloads, so key order and JSON formatting do not count as changes."""
+    content = json.dumps({'profile': profile, 'projects': projects}, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+def plan_writes(profiles, submissions, showcases, create_missing):
+    """Return (creates, updates, unchanged count), comparing content hashes of new and stored payloads."""
+    creates = []
+    updates = []
+    unchanged = 0
+    for profile_id, profile in profiles.items():
+        payload = profile_payload(profile)
+        projects = projects_payload(submissions.get(profile_id, []))
+        encoded = {'profile': json.dumps(payload), 'projects': [json.dumps(project) for project in projects]}
+
+        showcase = showcases.get(profile_id)
+        if showcase is None:
+            if create_missing:
+                creates.append(dict(encoded, studentProfileId=profile_id, cognitoUserId=profile.get('userId')))
+            continue
+
+        stored = content_hash(parse_json(showcase.get('profile')), parse_json(showcase.get('projects') or []))
+        if stored == content_hash(payload, projects):
+            unchanged += 1
+            continue
+        condition = {"updatedAt": {"eq": showcase['updatedAt']}} if showcase.get('updatedAt') else None
+        updates.append((dict(encoded, id=showcase['id']), condition))
+    return creates, updates, unchanged
+
+def write_showcases(client, creates, updates, audit, batch_size=10, workers=8, rate=None):
+    """Send the creates and updates as batched aliased mutations; return (written, conflicts, failures)."""
+    written = {'created': 0, 'updated': 0}
+    conflicts = []
+    failures = []
+
+    def send(job):
+        action, batch = job
+        if action == 'created':
+            return action, batch, client.create_items('Showcase', batch)
+        return action, batch, client.update_items('Showcase', batch)
+
+    jobs = [('created', batch) for batch in chunked(creates, batch_size)] + \
+        [('updated', batch) for batch in chunked(updates, batch_size)]
+    results, failed = run_concurrently(send, jobs, max_workers=workers, rate=rate)
+    for action, batch, outcomes in results:
+        for entry, (item, error) in zip(batch, outcomes):
+            input = entry if action == 'created' else entry[0]
+            key = input.get('id') or input['studentProfileId']
+            if item is not None:
+                written[action] += 1
+                audit.record(ACTION_CREATE if action == 'created' else ACTION_UPDATE, 'Showcase', item['id'],
+                             {"projects": len(input['projects'])})
+            elif is_conditional_check_failure(error):
+                conflicts.append(key)
+            else:
+                failures.append({'id': key, 'action': action, 'error': error.get('message')})
+    for (action, batch), e in failed:
+        for entry in batch:
+            input = entry if action == 'created' else entry[0]
+            failures.append({'id': input.get('id') or input['studentProfileId'], 'action': action, 'error': str(e)})
+    return written, conflicts, failures
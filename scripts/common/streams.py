@@ -0,0 +1,395 @@
+import gzip
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common.concurrency import chunked
+from common.dynamodb import deserialize_item
+
+SHARDS_FILE = 'shards.json'
+
+def sequence_key(sequence_number):
+    """Sort key for stream sequence numbers, which are decimal strings of varying length."""
+    return int(sequence_number)
+
+def change_event(model, shard_id, record):
+    """Convert one DynamoDB Streams record into a change event with plain Python images."""
+    data = record['dynamodb']
+    created = data.get('ApproximateCreationDateTime')
+    return {
+        'model': model,
+        'eventName': record['eventName'],
+        'shardId': shard_id,
+        'sequenceNumber': data['SequenceNumber'],
+        'keys': deserialize_item(data.get('Keys', {})),
+        'newImage': deserialize_item(data['NewImage']) if 'NewImage' in data else None,
+        'oldImage': deserialize_item(data['OldImage']) if 'OldImage' in data else None,
+        'approximateCreationTime': created.timestamp() if hasattr(created, 'timestamp') else created
+    }
+
+def find_stream_arns(dynamodb_client, tables):
+    """Map model names to the latest stream ARN of their table.
+
+    Handlers read both images, so the stream must use NEW_AND_OLD_IMAGES.
+    """
+    arns = {}
+    for model, table_name in tables.items():
+        table = dynamodb_client.describe_table(TableName=table_name)['Table']
+        view_type = table.get('StreamSpecification', {}).get('StreamViewType')
+        if not table.get('LatestStreamArn') or not table.get('StreamSpecification', {}).get('StreamEnabled'):
+            raise ValueError(f"DynamoDB Streams is not enabled on {table_name}")
+        if view_type != 'NEW_AND_OLD_IMAGES':
+            raise ValueError(f"The stream of {table_name} uses {view_type}; NEW_AND_OLD_IMAGES is required")
+        arns[model] = table['LatestStreamArn']
+    return arns
+
+class DynamoDBStreamSource:
+    """Shards and records of one table's DynamoDB stream.
+
+    GetRecords allows 5 calls per second on a shard, so reads pause
+    `empty_read_delay` seconds after an empty page and back off when
+    throttled with LimitExceededException, up to `max_throttle_retries`
+    times in a row.
+    """
+
+    def __init__(self, streams_client, model, stream_arn, page_size=1000, max_empty_reads=10,
+                 empty_read_delay=0.25, max_throttle_retries=8):
+        self.client = streams_client
+        self.model = model
+        self.stream_id = stream_arn
+        self.page_size = page_size
+        self.max_empty_reads = max_empty_reads
+        self.empty_read_delay = empty_read_delay
+        self.max_throttle_retries = max_throttle_retries
+
+    def shards(self):
+        """Return every shard of the stream with its parent and whether it is closed."""
+        shards = []
+        kwargs = {'StreamArn': self.stream_id}
+        while True:
+            description = self.client.describe_stream(**kwargs)['StreamDescription']
+            for shard in description['Shards']:
+                shards.append({
+                    'shardId': shard['ShardId'],
+                    'parentShardId': shard.get('ParentShardId'),
+                    'closed': 'EndingSequenceNumber' in shard['SequenceNumberRange']
+                })
+            last_shard_id = description.get('LastEvaluatedShardId')
+            if not last_shard_id:
+                return shards
+            kwargs['ExclusiveStartShardId'] = last_shard_id
+
+    def _iterator(self, shard_id, after):
+        from botocore.exceptions import ClientError
+
+        kwargs = {'StreamArn': self.stream_id, 'ShardId': shard_id}
+        if after:
+            try:
+                return self.client.get_shard_iterator(ShardIteratorType='AFTER_SEQUENCE_NUMBER',
+                                                      SequenceNumber=after, **kwargs)['ShardIterator']
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'TrimmedDataAccessException':
+                    raise
+                # Records past the checkpoint aged out of the 24 hour retention window
+                print(f"Warning: checkpoint {after} of shard {shard_id} was trimmed; reading from the oldest record")
+        return self.client.get_shard_iterator(ShardIteratorType='TRIM_HORIZON', **kwargs)['ShardIterator']
+
+    def _get_records(self, iterator):
+        from botocore.exceptions import ClientError
+
+        attempt = 0
+        while True:
+            try:
+                return self.client.get_records(ShardIterator=iterator, Limit=self.page_size)
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'LimitExceededException' or attempt >= self.max_throttle_retries:
+                    raise
+            attempt += 1
+            time.sleep(min(0.2 * (2 ** attempt), 5.0))
+
+    def read(self, shard, after=None):
+        """Yield pages of records after a sequence number.
+
+        Closed shards are read to their end; open shards until
+        `max_empty_reads` reads in a row come back empty, so the caller
+        decides when to poll again. A single empty page does not mean the
+        shard is caught up: GetRecords can return one while newer records
+        sit further along the shard.
+        """
+        iterator = self._iterator(shard['shardId'], after)
+        empty_reads = 0
+        while iterator:
+            response = self._get_records(iterator)
+            records = response.get('Records', [])
+            iterator = response.get('NextShardIterator')
+            if records:
+                empty_reads = 0
+                yield records
+                continue
+            if not shard['closed']:
+                empty_reads += 1
+                if empty_reads >= self.max_empty_reads:
+                    return
+            if iterator:
+                time.sleep(self.empty_read_delay)
+
+def shard_file(directory, shard_id):
+    """Return the existing change file of a shard, preferring the gzip one."""
+    for extension in ('jsonl.gz', 'jsonl'):
+        path = os.path.join(directory, f"{shard_id}.{extension}")
+        if os.path.exists(path):
+            return path
+    return None
+
+class ReplaySource:
+    """Shards and records read from exported change files instead of AWS.
+
+    `<directory>/<Model>/<shardId>.jsonl[.gz]` holds one stream record per
+    line, as returned by GetRecords. An optional shards.json next to them
+    lists parent shards and which shards are closed.
+    """
+
+    def __init__(self, directory, model, page_size=1000):
+        self.directory = os.path.join(directory, model)
+        self.model = model
+        self.stream_id = f"replay:{os.path.abspath(self.directory)}"
+        self.page_size = page_size
+
+    def shards(self):
+        listed = {}
+        shards_path = os.path.join(self.directory, SHARDS_FILE)
+        if os.path.exists(shards_path):
+            with open(shards_path, 'r') as f:
+                listed = {shard['shardId']: shard for shard in json.load(f)}
+
+        shard_ids = set(listed)
+        if os.path.isdir(self.directory):
+            for file_name in os.listdir(self.directory):
+                for extension in ('.jsonl.gz', '.jsonl'):
+                    if file_name.endswith(extension):
+                        shard_ids.add(file_name[:-len(extension)])
+        return [{
+            'shardId': shard_id,
+            'parentShardId': listed.get(shard_id, {}).get('parentShardId'),
+            'closed': listed.get(shard_id, {}).get('closed', False)
+        } for shard_id in sorted(shard_ids)]
+
+    def read(self, shard, after=None):
+        path = shard_file(self.directory, shard['shardId'])
+        if path is None:
+            return
+        last_key = sequence_key(after) if after else -1
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt', encoding='utf-8') as f:
+            page = []
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                key = sequence_key(record['dynamodb']['SequenceNumber'])
+                # A recording resumed after a crash repeats the records of the unfinished batch
+                if key <= last_key:
+                    continue
+                last_key = key
+                page.append(record)
+                if len(page) >= self.page_size:
+                    yield page
+                    page = []
+            if page:
+                yield page
+
+class ChangeRecorder:
+    """Append the records read from a stream to change files a ReplaySource can read back."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    def write(self, model, shard, records):
+        directory = os.path.join(self.directory, model)
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"{shard['shardId']}.jsonl"), 'a') as f:
+            for record in records:
+                f.write(json.dumps(record, default=lambda value: value.timestamp()) + '\n')
+
+        with self._lock:
+            shards_path = os.path.join(directory, SHARDS_FILE)
+            listed = {}
+            if os.path.exists(shards_path):
+                with open(shards_path, 'r') as f:
+                    listed = {entry['shardId']: entry for entry in json.load(f)}
+            entry = {'shardId': shard['shardId'], 'parentShardId': shard.get('parentShardId'),
+                     'closed': shard.get('closed', False)}
+            if listed.get(shard['shardId']) != entry:
+                listed[shard['shardId']] = entry
+                with open(shards_path, 'w') as f:
+                    json.dump(sorted(listed.values(), key=lambda e: e['shardId']), f, indent=2)
+
+class CheckpointStore:
+    """SQLite store of the last sequence number processed in each shard."""
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                stream TEXT NOT NULL,
+                shard_id TEXT NOT NULL,
+                sequence_number TEXT,
+                finished INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (stream, shard_id)
+            )
+        """)
+
+    def get(self, stream):
+        """Return {shard id: (sequence number, finished)} for a stream."""
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT shard_id, sequence_number, finished FROM checkpoints WHERE stream = ?", (stream,)
+            ).fetchall()
+        return {shard_id: (sequence_number, bool(finished)) for shard_id, sequence_number, finished in rows}
+
+    def put(self, stream, shard_id, sequence_number, finished=False):
+        with self._lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO checkpoints (stream, shard_id, sequence_number, finished, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (stream, shard_id, sequence_number, int(finished), time.time())
+            )
+            self.connection.commit()
+
+    def reset(self, stream):
+        with self._lock:
+            self.connection.execute("DELETE FROM checkpoints WHERE stream = ?", (stream,))
+            self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+class StreamConsumer:
+    """Read stream shards in parallel and hand batches of change events to handlers.
+
+    A shard's checkpoint only moves past a batch once every handler of its
+    model returned, so a crash or a failing handler replays the batch on
+    the next run: delivery is at least once and handlers must be idempotent.
+    Child shards wait until their parent is finished, which keeps the
+    changes to one item in order.
+    """
+
+    def __init__(self, checkpoints, batch_size=100, max_workers=4, max_attempts=5, recorder=None):
+        self.checkpoints = checkpoints
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.recorder = recorder
+        self.sources = []
+        self.handlers = {}
+        self._lock = threading.Lock()
+        self.stats = {'events': {}, 'batches': 0, 'retries': 0, 'shardsFinished': 0, 'failures': []}
+
+    def add_source(self, source):
+        self.sources.append(source)
+
+    def register(self, model, handler, name=None):
+        """Call `handler(events)` with every batch of change events of `model`."""
+        self.handlers.setdefault(model, []).append((name or type(handler).__name__, handler))
+
+    def _ready_shards(self, skip=()):
+        """Return the (source, shard, checkpoint) triples whose parent shard is finished."""
+        ready = []
+        for source in self.sources:
+            shards = source.shards()
+            state = self.checkpoints.get(source.stream_id)
+            shard_ids = {shard['shardId'] for shard in shards}
+            for shard in shards:
+                sequence_number, finished = state.get(shard['shardId'], (None, False))
+                if finished or (source.stream_id, shard['shardId']) in skip:
+                    continue
+                parent = shard.get('parentShardId')
+                # A parent missing from the listing has been trimmed and cannot be read anyway
+                if parent in shard_ids and not state.get(parent, (None, False))[1]:
+                    continue
+                ready.append((source, shard, sequence_number))
+        return ready
+
+    def _dispatch(self, model, events):
+        for name, handler in self.handlers.get(model, []):
+            for attempt in range(1, self.max_attempts + 1):
+                try:
+                    handler(events)
+                    break
+                except Exception as e:
+                    if attempt == self.max_attempts:
+                        raise RuntimeError(f"{name} failed after {attempt} attempts: {e}") from e
+                    with self._lock:
+                        self.stats['retries'] += 1
+                    print(f"{name} failed on {len(events)} {model} events ({e}); retrying")
+                    time.sleep(min(0.5 * (2 ** (attempt - 1)), 10.0))
+
+    def _consume_shard(self, source, shard, sequence_number):
+        """Process one shard from its checkpoint; return the number of events handled."""
+        handled = 0
+        for records in source.read(shard, sequence_number):
+            if self.recorder:
+                self.recorder.write(source.model, shard, records)
+            events = [change_event(source.model, shard['shardId'], record) for record in records]
+            for batch in chunked(events, self.batch_size):
+                self._dispatch(source.model, batch)
+                sequence_number = batch[-1]['sequenceNumber']
+                self.checkpoints.put(source.stream_id, shard['shardId'], sequence_number)
+                handled += len(batch)
+                with self._lock:
+                    self.stats['batches'] += 1
+                    counts = self.stats['events'].setdefault(source.model, {})
+                    for event in batch:
+                        counts[event['eventName']] = counts.get(event['eventName'], 0) + 1
+
+        if shard['closed']:
+            if self.recorder:
+                self.recorder.write(source.model, shard, [])
+            self.checkpoints.put(source.stream_id, shard['shardId'], sequence_number, finished=True)
+            with self._lock:
+                self.stats['shardsFinished'] += 1
+        return handled
+
+    def run(self, follow=False, poll_interval=5.0, stop=None):
+        """Consume every source until caught up, or keep polling when `follow` is set.
+
+        A shard whose handlers keep failing is left at its last checkpoint.
+        With `follow` it is retried in the next round; otherwise it is set
+        aside for the rest of the run and reported in stats['failures'].
+        """
+        failed_shards = set()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while not (stop and stop.is_set()):
+                ready = self._ready_shards(skip=failed_shards)
+                futures = [(source, shard, executor.submit(self._consume_shard, source, shard, sequence_number))
+                           for source, shard, sequence_number in ready]
+
+                handled = 0
+                progressed = False
+                for source, shard, future in futures:
+                    try:
+                        handled += future.result()
+                        progressed = progressed or shard['closed']
+                    except Exception as e:
+                        print(f"Error consuming {source.model} shard {shard['shardId']}: {e}")
+                        if not follow:
+                            failed_shards.add((source.stream_id, shard['shardId']))
+                            self.stats['failures'].append({'model': source.model, 'shardId': shard['shardId'],
+                                                           'error': str(e)})
+
+                if not follow:
+                    # Finishing a closed shard can make its children ready
+                    if not handled and not progressed:
+                        break
+                elif not handled:
+                    if stop:
+                        stop.wait(poll_interval)
+                    else:
+                        time.sleep(poll_interval)
+        return self.stats
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+import argparse
+import gzip
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+from common.amplify import load_amplify_outputs, get_graphql_settings, get_results_path
+from common.concurrency import run_concurrently
+from common.graphql import GraphQLClient, GraphQLError, is_conditional_check_failure
+from common.profiling import phase, run
+
+SUBMISSION_FIELDS = ['id', 'cohortId', 'studentProfileId', 'week', 'status', 'passing', 'grade',
+                     'gradedAt', 'technologies', 'updatedAt']
+
+SNAPSHOT_FILE = 'cohort_stats_snapshot.json.gz'
+COUNT_COLUMNS = ['submitted', 'graded', 'passing', 'pending', 'needsRevision']
+
+def utc_now():
+    return datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+
+def stats_id(cohort_id):
+    """Deterministic CohortStats ID, so reruns update the same record."""
+    return f"cohort-stats#{cohort_id}"
+
+def load_snapshot(path):
+    """Return the projected Submission rows and student counts from the last run."""
+    if not os.path.exists(path):
+        return {'watermark': None, 'reconciledAt': None, 'submissions': {}, 'studentCounts': {}}
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_snapshot(path, snapshot):
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        json.dump(snapshot, f, separators=(',', ':'))
+
+def submissions_frame(pd, rows):
+    """Build a DataFrame of submissions with boolean flag columns for each count."""
+    df = pd.DataFrame.from_records(rows, columns=SUBMISSION_FIELDS)
+    status = df['status'].fillna('').str.lower()
+    graded = df['gradedAt'].notna() | df['grade'].notna() | (status == 'graded')
+
+    df['week'] = pd.to_numeric(df['week'], errors='coerce').fillna(0).astype(int)
+    df['submitted'] = (status != '') & (status != 'draft')
+    df['graded'] = graded
+    df['passing'] = df['passing'].eq(True)
+    df['pending'] = df['submitted'] & ~graded
+    df['needsRevision'] = status == 'needs_revision'
+    return df
+
+def compute_stats(pd, rows, student_counts, cohort_ids):
+    """Compute the CohortStats fields for the given cohorts with vectorized group-bys."""
+    df = submissions_frame(pd, rows)
+    df = df[df['cohortId'].isin(cohort_ids)]
+
+    totals = df.groupby('cohortId')[COUNT_COLUMNS].sum()
+    totals['students'] = df.groupby('cohortId')['studentProfileId'].nunique()
+
+    weekly = df.groupby(['cohortId', 'week'])[COUNT_COLUMNS].sum()
+    weekly['students'] = df.groupby(['cohortId', 'week'])['studentProfileId'].nunique()
+
+    grades = df[df['graded'] & df['grade'].notna()].groupby(['cohortId', 'grade']).size()
+
+    technologies = df[['cohortId', 'technologies']].explode('technologies').dropna()
+    technologies = technologies.groupby(['cohortId', 'technologies']).size()
+
+    def counts(row):
+        result = {column: int(row[column]) for column in COUNT_COLUMNS + ['students']}
+        result['passRate'] = round(result['passing'] / result['graded'], 4) if result['graded'] else None
+        return result
+
+    stats = {}
+    for cohort_id in cohort_ids:
+        cohort_totals = counts(totals.loc[cohort_id]) if cohort_id in totals.index else \
+            dict({column: 0 for column in COUNT_COLUMNS + ['students']}, passRate=None)
+
+        cohort_weekly = []
+        if cohort_id in weekly.index.get_level_values(0):
+            for week, row in weekly.loc[cohort_id].iterrows():
+                cohort_weekly.append(json.dumps(dict(counts(row), week=int(week))))
+
+        cohort_grades = []
+        if cohort_id in grades.index.get_level_values(0):
+            cohort_grades = [json.dumps({'grade': grade, 'count': int(count)})
+                             for grade, count in grades.loc[cohort_id].items()]
+
+        cohort_technologies = []
+        if cohort_id in technologies.index.get_level_values(0):
+            histogram = technologies.loc[cohort_id].sort_values(ascending=False)
+            cohort_technologies = [json.dumps({'technology': name, 'count': int(count)})
+                                   for name, count in histogram.items()]
+
+        stats[cohort_id] = {
+            'id': stats_id(cohort_id),
+            'cohortId': cohort_id,
+            'totals': json.dumps(cohort_totals),
+            'weekly': cohort_weekly,
+            'gradeDistribution': cohort_grades,
+            'technologies': cohort_technologies,
+            'studentCount': student_counts.get(cohort_id, cohort_totals['students'])
+        }
+    return stats
+
+def project(row):
+    return {field: row.get(field) for field in SUBMISSION_FIELDS}
+
+def full_refresh(client, snapshot):
+    """Re-read every cohort's submissions and students through the cohortId indexes."""
+    cohort_ids = [cohort['id'] for cohort in client.iter_items('Cohort', ['id'])]
+    snapshot['submissions'] = {}
+    snapshot['studentCounts'] = {}
+    latest = ''
+
+    for cohort_id in cohort_ids:
+        for row in client.iter_index('Submission', 'cohortId', cohort_id, SUBMISSION_FIELDS):
+            snapshot['submissions'][row['id']] = project(row)
+            latest = max(latest, row.get('updatedAt') or '')
+        snapshot['studentCounts'][cohort_id] = sum(
+            1 for _ in client.iter_index('StudentProfile', 'cohortId', cohort_id, ['id'])
+        )
+
+    snapshot['watermark'] = latest or None
+    snapshot['reconciledAt'] = utc_now()
+    return set(cohort_ids)
+
+def drop_deleted(client, snapshot):
+    """List every Submission id and drop the snapshot rows that no longer exist; return their cohorts.
+
+    Deletions leave no updatedAt behind, so this is the only way to notice
+    them. It reads the whole table, so it only runs every few hours.
+    """
+    affected = set()
+    existing = {row['id'] for row in client.iter_items('Submission', ['id'], page_size=1000)}
+    for submission_id in [s for s in snapshot['submissions'] if s not in existing]:
+        removed = snapshot['submissions'].pop(submission_id)
+        if removed.get('cohortId'):
+            affected.add(removed['cohortId'])
+    snapshot['reconciledAt'] = utc_now()
+    return affected
+
+def incremental_refresh(client, snapshot, reconcile=False):
+    """Merge submissions changed since the watermark; return the cohorts they touch.
+
+    The watermark is inclusive, since several rows can share its timestamp;
+    rows seen before that are unchanged do not mark their cohort. With
+    `reconcile`, deleted submissions are dropped as well.
+    """
+    affected = set()
+    latest = snapshot['watermark']
+    for row in client.iter_items('Submission', SUBMISSION_FIELDS,
+                                 filter={'updatedAt': {'ge': snapshot['watermark']}}):
+        row = project(row)
+        previous = snapshot['submissions'].get(row['id'])
+        latest = max(latest, row.get('updatedAt') or '')
+        if row == previous:
+            continue
+        if previous and previous.get('cohortId'):
+            affected.add(previous['cohortId'])
+        if row.get('cohortId'):
+            affected.add(row['cohortId'])
+        snapshot['submissions'][row['id']] = row
+
+    if reconcile:
+        affected |= drop_deleted(client, snapshot)
+
+    for cohort_id in affected:
+        snapshot['studentCounts'][cohort_id] = sum(
+            1 for _ in client.iter_index('StudentProfile', 'cohortId', cohort_id, ['id'])
+        )
+
+    snapshot['watermark'] = latest
+    return affected
+
+def reconcile_due(snapshot, hours):
+    """Return True when deleted submissions were last looked for more than `hours` ago."""
+    if hours <= 0 or not snapshot.get('reconciledAt'):
+        return True
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=hours)
+    return snapshot['reconciledAt'] < cutoff.isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+
+def write_stats(client, stats, workers, rate):
+    """Update one CohortStats record per cohort, creating the ones that do not exist yet."""
+    computed_at = utc_now()
+
+    def write(record):
+        record = dict(record, computedAt=computed_at)
+        # Updates fail their condition when the record is missing, and creates when it
+        # exists, so a record created by a concurrent run is updated on the second try
+        for action in (client.update_item, client.create_item, client.update_item):
+            try:
+                return action('CohortStats', record)
+            except GraphQLError as e:
+                if not any(is_conditional_check_failure(error) for error in e.errors):
+                    raise
+        raise GraphQLError(f"CohortStats {record['id']} kept changing between create and update")
+
+    return run_concurrently(write, list(stats.values()), max_workers=workers, rate=rate)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Precompute per-cohort and per-week submission statistics.")
+    parser.add_argument('--full', action='store_true',
+                        help="Re-read every cohort through the cohortId index instead of applying changes")
+    parser.add_argument('--reconcile-hours', type=float, default=24.0,
+                        help="Hours between the checks for deleted submissions, which list every Submission id; "
+                             "0 checks on every run (default: 24)")
+    parser.add_argument('--workers', type=int, default=8, help="Concurrent writes (default: 8)")
+    parser.add_argument('--rate', type=float, default=20.0, help="Maximum writes per second (default: 20)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    try:
+        import pandas as pd
+    except ImportError:
+        raise SystemExit("Computing cohort statistics requires pandas: pip install pandas")
+
+    # Load Amplify outputs
+    amplify_outputs = load_amplify_outputs()
+    client = GraphQLClient(*get_graphql_settings(amplify_outputs))
+
+    phase('fetch tables')
+    snapshot_path = get_results_path(SNAPSHOT_FILE)
+    snapshot = load_snapshot(snapshot_path)
+    try:
+        if args.full or not snapshot['watermark']:
+            print("Reading all cohorts through the cohortId index...")
+            affected = full_refresh(client, snapshot)
+        else:
+            reconcile = reconcile_due(snapshot, args.reconcile_hours)
+            print(f"Reading submissions updated since {snapshot['watermark']}"
+                  f"{' and looking for deleted ones' if reconcile else ''}...")
+            affected = incremental_refresh(client, snapshot, reconcile)
+    except GraphQLError as e:
+        print(f"Error reading submissions: {e}")
+        client.close()
+        return
+    print(f"{len(snapshot['submissions'])} submissions known, {len(affected)} cohorts to recompute")
+
+    if not affected:
+        save_snapshot(snapshot_path, snapshot)
+        print("Nothing changed")
+        client.close()
+        return
+
+    phase('process loop')
+    stats = compute_stats(pd, list(snapshot['submissions'].values()), snapshot['studentCounts'], sorted(affected))
+    phase('write results')
+    _, failures = write_stats(client, stats, args.workers, args.rate)
+    client.close()
+
+    # Print summary
+    print("\nCohort statistics completed!")
+    print(f"Cohorts written: {len(stats) - len(failures)}")
+    print(f"Cohorts failed: {len(failures)}")
+    for record, e in failures:
+        print(f"Error writing stats for cohort {record['cohortId']}: {e}")
+
+    # Only advance the watermark when every cohort was written
+    if not failures:
+        save_snapshot(snapshot_path, snapshot)
+
+if __name__ == '__main__':
+    run(main)
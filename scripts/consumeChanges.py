@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import threading
+from contextlib import nullcontext
+
+from common.amplify import load_amplify_outputs, get_graphql_settings, get_results_path
+from common.audit import open_audit_sink
+from common.aws import get_client
+from common.concurrency import run_concurrently
+from common.dynamodb import get_dynamodb_client, resolve_table_names
+from common.graphql import GraphQLClient
+from common.profiling import phase, run
+from common.search import (INDEX_FILE, PROFILE_FIELDS as SEARCH_PROFILE_FIELDS, SNAPSHOT_FILE,
+                           SUBMISSION_FIELDS as SEARCH_SUBMISSION_FIELDS, build_documents, load_snapshot,
+                           save_snapshot, write_index)
+from common.showcases import PROFILE_FIELDS, SUBMISSION_FIELDS, SHOWCASE_FIELDS, plan_writes, write_showcases
+from common.streams import (ChangeRecorder, CheckpointStore, DynamoDBStreamSource, ReplaySource, StreamConsumer,
+                            find_stream_arns)
+
+DEFAULT_MODELS = ['Submission', 'StudentProfile', 'Analytics']
+HANDLERS = ('log', 'showcases', 'search')
+
+CHECKPOINT_FILE = 'stream_checkpoints.sqlite3'
+
+class ChangeLog:
+    """Print one line per batch of change events."""
+
+    def __init__(self):
+        self.summary = {'batches': 0}
+
+    def __call__(self, events):
+        counts = {}
+        for event in events:
+            counts[event['eventName']] = counts.get(event['eventName'], 0) + 1
+        self.summary['batches'] += 1
+        print(f"{events[0]['model']} shard {events[0]['shardId']}: {len(events)} changes "
+              f"up to {events[-1]['sequenceNumber']} {counts}")
+
+def affected_profiles(events):
+    """Return the StudentProfile ids whose showcase content a batch of events can change."""
+    profile_ids = set()
+    for event in events:
+        if event['model'] == 'StudentProfile':
+            profile_ids.add(event['keys']['id'])
+            continue
+        # Only submissions included in a showcase, before or after the change, are shown on it
+        for image in (event['newImage'], event['oldImage']):
+            if image and image.get('showcaseIncluded') and image.get('studentProfileId'):
+                profile_ids.add(image['studentProfileId'])
+    return profile_ids
+
+class ShowcaseRefresher:
+    """Rebuild the showcases of the students touched by StudentProfile and Submission changes.
+
+    Rows are re-read through the API rather than taken from the stream
+    images, so replaying an old batch writes the current content. Edits
+    made while a batch is written raise, which retries the batch.
+    """
+
+    def __init__(self, client, audit, workers=8, rate=None, dry_run=False):
+        self.client = client
+        self.audit = audit
+        self.workers = workers
+        self.rate = rate
+        self.dry_run = dry_run
+        self._lock = threading.Lock()
+        self.summary = {'profiles': 0, 'updated': 0, 'unchanged': 0}
+
+    def load(self, profile_id):
+        profile = self.client.get_item('StudentProfile', profile_id, PROFILE_FIELDS)
+        if profile is None or profile.get('isStaff'):
+            return profile_id, None, [], None
+        submissions = list(self.client.iter_index('Submission', 'studentProfileId', profile_id, SUBMISSION_FIELDS,
+                                                  filter={'showcaseIncluded': {'eq': True}}))
+        showcase = next(iter(self.client.iter_index('Showcase', 'studentProfileId', profile_id, SHOWCASE_FIELDS)),
+                        None)
+        return profile_id, profile, submissions, showcase
+
+    def __call__(self, events):
+        profile_ids = affected_profiles(events)
+        if not profile_ids:
+            return
+        results, failed = run_concurrently(self.load, sorted(profile_ids), max_workers=self.workers, rate=self.rate)
+        if failed:
+            raise RuntimeError(f"could not read {len(failed)} profiles: {failed[0][1]}")
+
+        profiles = {profile_id: profile for profile_id, profile, _, _ in results if profile}
+        submissions = {profile_id: rows for profile_id, _, rows, _ in results}
+        showcases = {profile_id: showcase for profile_id, _, _, showcase in results if showcase}
+        # Creating a showcase stays with the app and buildShowcases.py
+        _, updates, unchanged = plan_writes(profiles, submissions, showcases, create_missing=False)
+
+        written = {'updated': 0}
+        if updates and not self.dry_run:
+            written, conflicts, failures = write_showcases(self.client, [], updates, self.audit,
+                                                           workers=self.workers, rate=self.rate)
+            if conflicts or failures:
+                raise RuntimeError(f"{len(conflicts)} showcases edited during the write, {len(failures)} failed")
+
+        with self._lock:
+            self.summary['profiles'] += len(profile_ids)
+            self.summary['updated'] += written['updated'] if not self.dry_run else len(updates)
+            self.summary['unchanged'] += unchanged
+        if updates:
+            print(f"{'Would update' if self.dry_run else 'Updated'} {len(updates)} showcases")
+
+class SearchIndexUpdater:
+    """Apply StudentProfile and Submission changes to the search snapshot and rewrite the index.
+
+    Unlike `buildSearchIndex.py build`, this also removes deleted rows.
+    """
+
+    def __init__(self, index_path, snapshot_path):
+        self.index_path = index_path
+        self.snapshot_path = snapshot_path
+        self.snapshot = load_snapshot(snapshot_path)
+        self._lock = threading.Lock()
+        self.summary = {'upserts': 0, 'removals': 0, 'writes': 0}
+
+    def __call__(self, events):
+        fields = {'StudentProfile': SEARCH_PROFILE_FIELDS, 'Submission': SEARCH_SUBMISSION_FIELDS}
+        with self._lock:
+            for event in events:
+                rows = self.snapshot[event['model']]
+                if event['eventName'] == 'REMOVE':
+                    rows.pop(event['keys']['id'], None)
+                    self.summary['removals'] += 1
+                else:
+                    image = event['newImage']
+                    rows[image['id']] = {field: image.get(field) for field in fields[event['model']]}
+                    self.summary['upserts'] += 1
+
+            # The snapshot is saved after the index, so a crash in between replays into the same state
+            write_index(self.index_path, build_documents(self.snapshot))
+            save_snapshot(self.snapshot_path, self.snapshot)
+            self.summary['writes'] += 1
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Consume DynamoDB Streams changes and update derived data incrementally.")
+    parser.add_argument('--models', default=','.join(DEFAULT_MODELS),
+                        help=f"Comma-separated models to consume (default: {','.join(DEFAULT_MODELS)})")
+    parser.add_argument('--handlers', default='log',
+                        help=f"Comma-separated handlers to run: {', '.join(HANDLERS)} (default: log)")
+    parser.add_argument('--replay', metavar='DIR', help="Read exported change files from DIR instead of AWS")
+    parser.add_argument('--record', metavar='DIR', help="Also write every record read to change files in DIR")
+    parser.add_argument('--follow', action='store_true', help="Keep polling for new changes until interrupted")
+    parser.add_argument('--poll-interval', type=float, default=5.0,
+                        help="Seconds between polls when caught up with --follow (default: 5)")
+    parser.add_argument('--reset', action='store_true', help="Forget the checkpoints and start from the oldest record")
+    parser.add_argument('--batch-size', type=int, default=100, help="Change events per handler call (default: 100)")
+    parser.add_argument('--workers', type=int, default=4, help="Shards consumed in parallel (default: 4)")
+    parser.add_argument('--max-attempts', type=int, default=5,
+                        help="Attempts per batch before a shard is left for the next run (default: 5)")
+    parser.add_argument('--table-suffix', help="Table name suffix '<apiId>-<env>' when it cannot be discovered")
+    parser.add_argument('--index', help=f"Search index updated by the search handler (default: {INDEX_FILE})")
+    parser.add_argument('--dry-run', action='store_true', help="Plan showcase updates without writing them")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    models = args.models.split(',')
+    handler_names = args.handlers.split(',')
+    unknown = [name for name in handler_names if name not in HANDLERS]
+    if unknown:
+        raise SystemExit(f"Unknown handlers: {', '.join(unknown)}; choose from {', '.join(HANDLERS)}")
+
+    amplify_outputs = None
+    if not args.replay or 'showcases' in handler_names:
+        # Load Amplify outputs
+        amplify_outputs = load_amplify_outputs()
+
+    phase('load inputs')
+    if args.replay:
+        sources = [ReplaySource(args.replay, model) for model in models]
+    else:
+        dynamodb_client = get_dynamodb_client(amplify_outputs)
+        tables = resolve_table_names(amplify_outputs, dynamodb_client, models, args.table_suffix)
+        stream_arns = find_stream_arns(dynamodb_client, tables)
+        streams_client = get_client('dynamodbstreams', amplify_outputs['data']['aws_region'])
+        sources = [DynamoDBStreamSource(streams_client, model, stream_arns[model]) for model in models]
+
+    checkpoints = CheckpointStore(get_results_path(CHECKPOINT_FILE))
+    if args.reset:
+        for source in sources:
+            checkpoints.reset(source.stream_id)
+
+    consumer = StreamConsumer(checkpoints, batch_size=args.batch_size, max_workers=args.workers,
+                              max_attempts=args.max_attempts,
+                              recorder=ChangeRecorder(args.record) if args.record else None)
+    for source in sources:
+        consumer.add_source(source)
+
+    client = GraphQLClient(*get_graphql_settings(amplify_outputs)) if 'showcases' in handler_names else None
+    handlers = {}
+    writes = client is not None and not args.dry_run
+    with open_audit_sink(client, 'consumeChanges', get_results_path('audit_spool_consumeChanges.jsonl')) \
+            if writes else nullcontext() as audit:
+        if 'log' in handler_names:
+            handlers['log'] = ChangeLog()
+            for model in models:
+                consumer.register(model, handlers['log'], 'log')
+        if 'showcases' in handler_names:
+            handlers['showcases'] = ShowcaseRefresher(client, audit, dry_run=args.dry_run)
+            for model in ('StudentProfile', 'Submission'):
+                consumer.register(model, handlers['showcases'], 'showcases')
+        if 'search' in handler_names:
+            snapshot_path = get_results_path(SNAPSHOT_FILE)
+            if not os.path.exists(snapshot_path):
+                raise SystemExit("The search handler updates an existing index: run buildSearchIndex.py build first")
+            handlers['search'] = SearchIndexUpdater(args.index or get_results_path(INDEX_FILE), snapshot_path)
+            for model in ('StudentProfile', 'Submission'):
+                consumer.register(model, handlers['search'], 'search')
+
+        phase('process loop')
+        print(f"Consuming {', '.join(models)} changes from {'change files' if args.replay else 'DynamoDB Streams'}"
+              f"{' until interrupted' if args.follow else ''}...")
+        try:
+            stats = consumer.run(follow=args.follow, poll_interval=args.poll_interval)
+        except KeyboardInterrupt:
+            print("\nStopped; the next run resumes from the last checkpoint")
+            stats = consumer.stats
+    checkpoints.close()
+    if client is not None:
+        client.close()
+
+    phase('write results')
+    # Print summary
+    print("\nChange consumption completed!")
+    for model, counts in sorted(stats['events'].items()):
+        print(f"{model}: {sum(counts.values())} changes {counts}")
+    print(f"Batches handled: {stats['batches']}")
+    print(f"Batches retried: {stats['retries']}")
+    print(f"Shards finished: {stats['shardsFinished']}")
+    print(f"Shards stopped by handler failures: {len(stats['failures'])}")
+
+    # Save results to a file
+    results_file_path = get_results_path('change_consumer_results.json')
+    with open(results_file_path, 'w') as f:
+        json.dump({
+            'source': args.replay or 'dynamodb-streams',
+            'models': models,
+            'dry_run': args.dry_run,
+            'stats': stats,
+            'handlers': {name: handler.summary for name, handler in handlers.items()}
+        }, f, indent=2)
+
+    print(f"Results saved to {results_file_path}")
+
+if __name__ == '__main__':
+    run(main)
@@ -1,19 +1,15 @@
+import argparse
+import asyncio
+import contextlib
 import json
-import boto3
 import random
 import string
-import time
 import os
-from botocore.exceptions import ClientError
 
-def load_amplify_outputs():
-    """Load the Amplify outputs from the JSON file."""
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    project_root = os.path.dirname(script_dir)
-    amplify_outputs_path = os.path.join(project_root, 'amplify_outputs.json')
-    
-    with open(amplify_outputs_path, 'r') as f:
-        return json.load(f)
+from common.amplify import load_amplify_outputs
+from common.aio import ThreadedClient, aws_client, gather_limited
+from common.aws import get_client
+from common.profiling import phase, run
 
 def generate_temporary_password():
     """Generate a secure temporary password that meets Cognito requirements."""
@@ -34,44 +30,78 @@ def generate_temporary_password():
     
     return ''.join(password)
 
-def create_cognito_user(cognito_client, user_pool_id, student):
-    """Create a basic user in Cognito user pool with just email."""
-    email = student['email']
+def new_user_request(user_pool_id, email, temp_password):
+    """Return the AdminCreateUser parameters for a user with just an email."""
+    return {
+        'UserPoolId': user_pool_id,
+        'Username': email,
+        'TemporaryPassword': temp_password,
+        'MessageAction': 'SUPPRESS',  # Don't send an email invitation
+        'UserAttributes': [
+            {'Name': 'email', 'Value': email},
+            {'Name': 'email_verified', 'Value': 'true'}
+        ]
+    }
+
+async def create_cognito_user_async(cognito_client, user_pool_id, student):
+    """Create a basic user in Cognito user pool with just email; return its temporary password or None.
     
+    `cognito_client` is an aiobotocore client, or a boto3 client wrapped in ThreadedClient.
+    """
+    from botocore.exceptions import ClientError
+
+    request = new_user_request(user_pool_id, student['email'], generate_temporary_password())
     try:
-        # Generate a temporary password
-        temp_password = generate_temporary_password()
-        
-        # Create the user in Cognito with minimal attributes
-        response = cognito_client.admin_create_user(
-            UserPoolId=user_pool_id,
-            Username=email,
-            TemporaryPassword=temp_password,
-            MessageAction='SUPPRESS',  # Don't send an email invitation
-            UserAttributes=[
-                {'Name': 'email', 'Value': email},
-                {'Name': 'email_verified', 'Value': 'true'}
-            ]
-        )
-        
-        print(f"Created user: {email}")
-        
-        # Return the temporary password
-        return temp_password
-        
+        await cognito_client.admin_create_user(**request)
     except ClientError as e:
-        print(f"Error creating user {email}: {e}")
+        print(f"Error creating user {student['email']}: {e}")
         return None
+    print(f"Created user: {student['email']}")
+    return request['TemporaryPassword']
+
+def create_cognito_user(cognito_client, user_pool_id, student):
+    """Blocking create_cognito_user_async for a boto3 Cognito client."""
+    return asyncio.run(create_cognito_user_async(ThreadedClient(cognito_client), user_pool_id, student))
+
+async def create_cognito_users_async(region, user_pool_id, students, concurrency, rate, use_async=True):
+    """Create the users concurrently on one event loop; return {email: temporary password}.
+    
+    Without `use_async` the calls are made with boto3 on worker threads instead of aiobotocore.
+    """
+    async with contextlib.AsyncExitStack() as stack:
+        if use_async:
+            cognito_client = await stack.enter_async_context(
+                aws_client('cognito-idp', region, max_pool_connections=concurrency))
+        else:
+            cognito_client = ThreadedClient(get_client('cognito-idp', region))
+        
+        async def create(student):
+            return student['email'], await create_cognito_user_async(cognito_client, user_pool_id, student)
+        
+        results, failures = await gather_limited(create, students, concurrency, rate)
+    
+    for student, e in failures:
+        print(f"Error creating user {student['email']}: {e}")
+    return dict(results)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Create Cognito users for the students in students.json.")
+    parser.add_argument('--concurrency', type=int, default=50, help="Requests in flight (default: 50)")
+    parser.add_argument('--rate', type=float, default=10.0,
+                        help="Maximum AdminCreateUser calls per second (default: 10)")
+    parser.add_argument('--sync', action='store_true',
+                        help="Create users one at a time with boto3 instead of aiobotocore")
+    return parser.parse_args()
 
 def main():
+    args = parse_args()
+    
     # Load Amplify outputs
     amplify_outputs = load_amplify_outputs()
     user_pool_id = amplify_outputs['auth']['user_pool_id']
     region = amplify_outputs['auth']['aws_region']
     
-    # Initialize Cognito client
-    cognito_client = boto3.client('cognito-idp', region_name=region)
-    
+    phase('load inputs')
     # Load students from JSON file
     script_dir = os.path.dirname(os.path.abspath(__file__))
     students_file_path = os.path.join(script_dir, 'students.json')
@@ -88,21 +118,26 @@ def main():
     print(f"Found {len(students)} total students")
     print(f"Filtered to {len(filtered_students)} students with 'student' role and @gauntletai.com email")
     
-    # Store user credentials for reference
-    user_credentials = []
+    use_async = not args.sync
+    if use_async:
+        try:
+            import aiobotocore  # noqa: F401
+        except ImportError:
+            print("Warning: aiobotocore is not installed (pip install aiobotocore); "
+                  "creating users one at a time instead")
+            use_async = False
     
-    # Process each filtered student
-    for student in filtered_students:
-        temp_password = create_cognito_user(cognito_client, user_pool_id, student)
-        if temp_password:
-            user_credentials.append({
-                'email': student['email'],
-                'temporary_password': temp_password
-            })
-        
-        # Add a small delay between API calls to avoid throttling
-        time.sleep(0.2)
+    phase('process loop')
+    # Without aiobotocore, one at a time at 5 calls per second to avoid throttling
+    concurrency, rate = (args.concurrency, args.rate) if use_async else (1, 5.0)
+    passwords = asyncio.run(create_cognito_users_async(region, user_pool_id, filtered_students,
+                                                       concurrency, rate, use_async))
+    user_credentials = [
+        {'email': student['email'], 'temporary_password': passwords[student['email']]}
+        for student in filtered_students if passwords.get(student['email'])
+    ]
     
+    phase('write results')
     # Save credentials to a file
     credentials_file_path = os.path.join(script_dir, 'user_credentials.json')
     with open(credentials_file_path, 'w') as f:
@@ -111,4 +146,4 @@ def main():
     print(f"Finished processing {len(filtered_students)} filtered students. Credentials saved to {credentials_file_path}")
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    run(main)
@@ -1,19 +1,15 @@
 #!/usr/bin/env python3
 import json
-import boto3
 import time
 import os
-import requests
-from botocore.exceptions import ClientError
 
-def load_amplify_outputs():
-    """Load the Amplify outputs from the JSON file."""
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    project_root = os.path.dirname(script_dir)
-    amplify_outputs_path = os.path.join(project_root, 'amplify_outputs.json')
-    
-    with open(amplify_outputs_path, 'r') as f:
-        return json.load(f)
+from common.amplify import load_amplify_outputs, get_results_path
+from common.audit import ACTION_CREATE, ACTION_UPDATE, open_audit_sink
+from common.graphql import GraphQLError, is_conditional_check_failure, post, shared_client
+from common.linked_profiles import LinkedProfiles, is_canonical
+from common.profiling import phase, run
+
+USER_LINK_FIELDS = ['id', 'linkedProfiles', 'updatedAt']
 
 def load_students_data():
     """Load the students data from the JSON file."""
@@ -40,6 +36,7 @@ def get_users_with_student_role(api_endpoint, api_key):
                     email
                     roles
                     linkedProfiles
+                    updatedAt
                 }
                 nextToken
             }
@@ -56,19 +53,7 @@ def get_users_with_student_role(api_endpoint, api_key):
             variables["nextToken"] = next_token
         
         # Make the GraphQL request
-        headers = {
-            'Content-Type': 'application/json',
-            'x-api-key': api_key
-        }
-        
-        response = requests.post(
-            api_endpoint,
-            headers=headers,
-            json={
-                'query': query,
-                'variables': variables
-            }
-        )
+        response = post(api_endpoint, api_key, query, variables)
         
         if response.status_code == 200:
             result = response.json()
@@ -181,19 +166,7 @@ def create_student_profile(api_endpoint, api_key, user, student_data):
     print(f"Creating student profile with variables: {json.dumps(variables)}")
     
     # Make the GraphQL request
-    headers = {
-        'Content-Type': 'application/json',
-        'x-api-key': api_key
-    }
-    
-    response = requests.post(
-        api_endpoint,
-        headers=headers,
-        json={
-            'query': mutation,
-            'variables': variables
-        }
-    )
+    response = post(api_endpoint, api_key, mutation, variables)
     
     if response.status_code == 200:
         result = response.json()
@@ -209,118 +182,39 @@ def create_student_profile(api_endpoint, api_key, user, student_data):
         print(f"Error creating student profile for {user['email']}: {response.status_code} - {response.text}")
         return None
 
-def update_user_linked_profiles(api_endpoint, api_key, user, student_profile_id):
-    """Update the User entity to include the StudentProfile in linkedProfiles."""
-    # First, get the current user to see if they have existing linkedProfiles
-    query = """
-    query GetUser($id: ID!) {
-        getUser(id: $id) {
-            id
-            linkedProfiles
-        }
-    }
-    """
+def update_user_linked_profiles(client, user, student_profile_id):
+    """Update the User entity to include the StudentProfile in linkedProfiles.
     
-    variables = {
-        "id": user['id']
-    }
-    
-    headers = {
-        'Content-Type': 'application/json',
-        'x-api-key': api_key
-    }
-    
-    response = requests.post(
-        api_endpoint,
-        headers=headers,
-        json={
-            'query': query,
-            'variables': variables
-        }
-    )
-    
-    existing_profiles = []
-    if response.status_code == 200:
-        result = response.json()
-        if 'errors' not in result and 'data' in result and result['data']['getUser']:
-            existing_linked_profiles = result['data']['getUser'].get('linkedProfiles', [])
-            
-            # Handle different formats of linkedProfiles
-            if existing_linked_profiles:
-                if isinstance(existing_linked_profiles, str):
-                    try:
-                        existing_profiles = json.loads(existing_linked_profiles)
-                    except json.JSONDecodeError:
-                        existing_profiles = []
-                else:
-                    existing_profiles = existing_linked_profiles
-    
-    # Create a new profile reference - simplified to just type and ID
-    new_profile = {
-        "type": "StudentProfile",
-        "id": student_profile_id
-    }
-    
-    # Check if this profile is already linked
-    profile_already_linked = False
-    for profile in existing_profiles:
-        if isinstance(profile, dict) and profile.get('id') == student_profile_id:
-            profile_already_linked = True
-            break
-    
-    # Only add if not already linked
-    if not profile_already_linked:
-        existing_profiles.append(new_profile)
-    
-    # GraphQL mutation to update the User
-    mutation = """
-    mutation UpdateUser($input: UpdateUserInput!) {
-        updateUser(input: $input) {
-            id
-            cognitoId
-            email
-            linkedProfiles
-        }
-    }
+    The links come from the user as listed, so there is no getUser before the
+    update. The update is conditioned on the listed updatedAt; only if the
+    user changed in the meantime is it re-read and the merge retried.
     """
-    
-    # Convert the profiles array to a JSON string
-    linked_profiles_json = json.dumps(existing_profiles)
-    
-    # Prepare the variables for the mutation
-    variables = {
-        "input": {
-            "id": user['id'],
-            "linkedProfiles": linked_profiles_json
-        }
-    }
-    
-    # Print the mutation and variables for debugging
-    print(f"Updating user with variables: {json.dumps(variables)}")
-    
-    # Make the GraphQL request
-    response = requests.post(
-        api_endpoint,
-        headers=headers,
-        json={
-            'query': mutation,
-            'variables': variables
-        }
-    )
-    
-    if response.status_code == 200:
-        result = response.json()
-        if 'errors' in result:
-            print(f"Error updating user {user['email']}: {result['errors']}")
-            # Print more details for debugging
-            print(f"Response: {json.dumps(result)}")
-            return False
-        else:
-            print(f"Updated user {user['email']} with linked profile")
+    for _ in range(3):
+        links = LinkedProfiles.decode(user.get('linkedProfiles'))
+        added = links.add('StudentProfile', student_profile_id)
+        if not added and is_canonical(user.get('linkedProfiles')):
+            print(f"User {user['email']} already links profile {student_profile_id}")
             return True
-    else:
-        print(f"Error updating user {user['email']}: {response.status_code} - {response.text}")
-        return False
+        
+        condition = {"updatedAt": {"eq": user['updatedAt']}} if user.get('updatedAt') else None
+        try:
+            updated = client.update_item('User', {"id": user['id'], "linkedProfiles": links.encode()},
+                                         condition, fields=USER_LINK_FIELDS)
+        except GraphQLError as e:
+            if condition and any(is_conditional_check_failure(error) for error in e.errors):
+                current = client.get_item('User', user['id'], USER_LINK_FIELDS)
+                if current:
+                    user.update(current)
+                    continue
+            print(f"Error updating user {user['email']}: {e}")
+            return False
+        
+        user.update(updated)
+        print(f"Updated user {user['email']} with linked profile")
+        return True
+    
+    print(f"Error updating user {user['email']}: it kept changing while being linked")
+    return False
 
 def check_existing_student_profile(api_endpoint, api_key, user_id):
     """Check if a StudentProfile already exists for the given user ID."""
@@ -350,19 +244,7 @@ def check_existing_student_profile(api_endpoint, api_key, user_id):
         if next_token:
             variables["nextToken"] = next_token
         
-        headers = {
-            'Content-Type': 'application/json',
-            'x-api-key': api_key
-        }
-        
-        response = requests.post(
-            api_endpoint,
-            headers=headers,
-            json={
-                'query': query,
-                'variables': variables
-            }
-        )
+        response = post(api_endpoint, api_key, query, variables)
         
         if response.status_code == 200:
             result = response.json()
@@ -397,10 +279,12 @@ def main():
     api_key = amplify_outputs['data']['api_key']
     
     # Load students data
+    phase('load inputs')
     students_data = load_students_data()
     print(f"Loaded {len(students_data)} students from students.json")
     
     # Get users with STUDENT role
+    phase('fetch tables')
     student_users = get_users_with_student_role(api_endpoint, api_key)
     print(f"Found {len(student_users)} users with STUDENT role")
     
@@ -409,6 +293,12 @@ def main():
     linked_existing_profiles = []
     skipped_users = []
     
+    # Record every created profile and linked user in the AuditLog, written in batches
+    client = shared_client(api_endpoint, api_key)
+    audit = open_audit_sink(client, 'createStudentProfiles',
+                            get_results_path('audit_spool_createStudentProfiles.jsonl'))
+    
+    phase('process loop')
     for user in student_users:
         # Check if a StudentProfile already exists for this user
         existing_profile = check_existing_student_profile(api_endpoint, api_key, user['cognitoId'])
@@ -417,13 +307,14 @@ def main():
             print(f"User {user['email']} already has a StudentProfile (ID: {existing_profile['id']})")
             
             # Link the existing profile to the user
-            success = update_user_linked_profiles(api_endpoint, api_key, user, existing_profile['id'])
+            success = update_user_linked_profiles(client, user, existing_profile['id'])
             
             if success:
                 linked_existing_profiles.append({
                     "email": user['email'],
                     "studentProfileId": existing_profile['id']
                 })
+                audit.record(ACTION_UPDATE, 'User', user['id'], {"linkedProfile": existing_profile['id']})
                 print(f"Linked existing profile for {user['email']}")
             else:
                 skipped_users.append(user['email'])
@@ -443,8 +334,12 @@ def main():
         student_profile = create_student_profile(api_endpoint, api_key, user, student_data)
         
         if student_profile:
+            audit.record(ACTION_CREATE, 'StudentProfile', student_profile['id'], {"userId": user['cognitoId']})
+            
             # Update User with linkedProfiles
-            success = update_user_linked_profiles(api_endpoint, api_key, user, student_profile['id'])
+            success = update_user_linked_profiles(client, user, student_profile['id'])
+            if success:
+                audit.record(ACTION_UPDATE, 'User', user['id'], {"linkedProfile": student_profile['id']})
             
             if success:
                 created_profiles.append({
@@ -457,12 +352,18 @@ def main():
         # Add a small delay to avoid throttling
         time.sleep(0.2)
     
+    phase('write results')
+    audit.close()
+    client.close()
+    
     # Print summary
     print("\nProcess completed!")
     print(f"Total users with STUDENT role: {len(student_users)}")
     print(f"StudentProfiles created and linked: {len(created_profiles)}")
     print(f"Existing profiles linked: {len(linked_existing_profiles)}")
     print(f"Users skipped: {len(skipped_users)}")
+    for line in client.metrics.summary_lines():
+        print(line)
     
     # Save results to a file
     script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -471,10 +372,11 @@ def main():
         json.dump({
             'created_profiles': created_profiles,
             'linked_existing_profiles': linked_existing_profiles,
-            'skipped_users': skipped_users
+            'skipped_users': skipped_users,
+            'request_metrics': client.metrics.snapshot()
         }, f, indent=2)
     
     print(f"Results saved to {results_file_path}")
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    run(main)
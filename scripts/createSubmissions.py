@@ -1,20 +1,15 @@
 #!/usr/bin/env python3
+import argparse
 import json
-import boto3
 import time
 import os
-import requests
-from botocore.exceptions import ClientError
 from datetime import datetime
 
-def load_amplify_outputs():
-    """Load the Amplify outputs from the JSON file."""
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    project_root = os.path.dirname(script_dir)
-    amplify_outputs_path = os.path.join(project_root, 'amplify_outputs.json')
-    
-    with open(amplify_outputs_path, 'r') as f:
-        return json.load(f)
+from common.amplify import load_amplify_outputs, get_results_path
+from common.audit import ACTION_CREATE, open_audit_sink
+from common.graphql import post, shared_client
+from common.lookup import build_string_map
+from common.profiling import phase, run
 
 def load_submissions_data():
     """Load the submissions data from the JSON file."""
@@ -33,8 +28,8 @@ def load_students_data():
         return json.load(f)
 
 def get_all_users(api_endpoint, api_key):
-    """Get all users from the database with pagination."""
-    all_users = []
+    """Yield the email and cognitoId of every user, one page at a time."""
+    fetched = 0
     next_token = None
     
     # Loop to handle pagination
@@ -44,11 +39,8 @@ def get_all_users(api_endpoint, api_key):
         query ListUsers($limit: Int, $nextToken: String) {
             listUsers(limit: $limit, nextToken: $nextToken) {
                 items {
-                    id
                     cognitoId
                     email
-                    roles
-                    linkedProfiles
                 }
                 nextToken
             }
@@ -65,34 +57,23 @@ def get_all_users(api_endpoint, api_key):
             variables["nextToken"] = next_token
         
         # Make the GraphQL request
-        headers = {
-            'Content-Type': 'application/json',
-            'x-api-key': api_key
-        }
-        
-        response = requests.post(
-            api_endpoint,
-            headers=headers,
-            json={
-                'query': query,
-                'variables': variables
-            }
-        )
+        response = post(api_endpoint, api_key, query, variables)
         
         if response.status_code == 200:
             result = response.json()
             if 'errors' in result:
                 print(f"Error fetching users: {result['errors']}")
-                return []
+                return
             
-            # Get the users from this page
+            # Yield the users from this page
             users_page = result['data']['listUsers']['items']
-            all_users.extend(users_page)
+            yield from users_page
+            fetched += len(users_page)
             
             # Get the next token for pagination
             next_token = result['data']['listUsers'].get('nextToken')
             
-            print(f"Fetched {len(users_page)} users (total so far: {len(all_users)})")
+            print(f"Fetched {len(users_page)} users (total so far: {fetched})")
             
             # If there's no next token, we've reached the end
             if not next_token:
@@ -102,13 +83,11 @@ def get_all_users(api_endpoint, api_key):
             time.sleep(0.5)
         else:
             print(f"Error fetching users: {response.status_code} - {response.text}")
-            return []
-    
-    return all_users
+            return
 
 def get_all_student_profiles(api_endpoint, api_key):
-    """Get all student profiles from the database with pagination."""
-    all_profiles = []
+    """Yield the id and userId of every student profile, one page at a time."""
+    fetched = 0
     next_token = None
     
     # Loop to handle pagination
@@ -120,9 +99,6 @@ def get_all_student_profiles(api_endpoint, api_key):
                 items {
                     id
                     userId
-                    firstName
-                    lastName
-                    contactEmail
                 }
                 nextToken
             }
@@ -139,34 +115,23 @@ def get_all_student_profiles(api_endpoint, api_key):
             variables["nextToken"] = next_token
         
         # Make the GraphQL request
-        headers = {
-            'Content-Type': 'application/json',
-            'x-api-key': api_key
-        }
-        
-        response = requests.post(
-            api_endpoint,
-            headers=headers,
-            json={
-                'query': query,
-                'variables': variables
-            }
-        )
+        response = post(api_endpoint, api_key, query, variables)
         
         if response.status_code == 200:
             result = response.json()
             if 'errors' in result:
                 print(f"Error fetching student profiles: {result['errors']}")
-                return []
+                return
             
-            # Get the profiles from this page
+            # Yield the profiles from this page
             profiles_page = result['data']['listStudentProfiles']['items']
-            all_profiles.extend(profiles_page)
+            yield from profiles_page
+            fetched += len(profiles_page)
             
             # Get the next token for pagination
             next_token = result['data']['listStudentProfiles'].get('nextToken')
             
-            print(f"Fetched {len(profiles_page)} student profiles (total so far: {len(all_profiles)})")
+            print(f"Fetched {len(profiles_page)} student profiles (total so far: {fetched})")
             
             # If there's no next token, we've reached the end
             if not next_token:
@@ -176,9 +141,7 @@ def get_all_student_profiles(api_endpoint, api_key):
             time.sleep(0.5)
         else:
             print(f"Error fetching student profiles: {response.status_code} - {response.text}")
-            return []
-    
-    return all_profiles
+            return
 
 def find_student_by_auth_id(auth_id, students_data):
     """Find student data in students.json by auth_id.
@@ -235,19 +198,7 @@ def create_submission(api_endpoint, api_key, submission_data, student_profile_id
     print(f"Creating submission with variables: {json.dumps(variables)}")
     
     # Make the GraphQL request
-    headers = {
-        'Content-Type': 'application/json',
-        'x-api-key': api_key
-    }
-    
-    response = requests.post(
-        api_endpoint,
-        headers=headers,
-        json={
-            'query': mutation,
-            'variables': variables
-        }
-    )
+    response = post(api_endpoint, api_key, mutation, variables)
     
     if response.status_code == 200:
         result = response.json()
@@ -263,7 +214,16 @@ def create_submission(api_endpoint, api_key, submission_data, student_profile_id
         print(f"Error creating submission: {response.status_code} - {response.text}")
         return None
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Create submissions from submissions.json.")
+    parser.add_argument('--lookup-dir',
+                        help="Build the user and profile lookups as memory-mapped files in this directory "
+                             "instead of in memory, for more users than fit in RAM")
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
+    
     # Load Amplify outputs
     amplify_outputs = load_amplify_outputs()
     
@@ -272,6 +232,7 @@ def main():
     api_key = amplify_outputs['data']['api_key']
     
     # Load submissions and students data
+    phase('load inputs')
     submissions_data = load_submissions_data()
     students_data = load_students_data()
     
@@ -279,19 +240,26 @@ def main():
     print(f"Loaded {len(students_data)} students from students.json")
     
     # Fetch all users and student profiles at once
+    phase('fetch tables')
     print("Fetching all users from the database...")
-    all_users = get_all_users(api_endpoint, api_key)
     
-    # Create email to user lookup dictionary for faster access
-    email_to_user = {user['email']: user for user in all_users if 'email' in user}
-    print(f"Created lookup dictionary for {len(email_to_user)} users by email")
+    # Map email to cognitoId, keeping only the two strings per user in a packed sorted index
+    email_to_cognito_id = build_string_map(
+        ((user['email'], user['cognitoId']) for user in get_all_users(api_endpoint, api_key)
+         if user.get('email') and user.get('cognitoId')),
+        path=os.path.join(args.lookup_dir, 'email_to_cognito_id.idx') if args.lookup_dir else None
+    )
+    print(f"Created lookup for {len(email_to_cognito_id)} users by email")
     
     print("Fetching all student profiles from the database...")
-    all_profiles = get_all_student_profiles(api_endpoint, api_key)
     
-    # Create userId to profile lookup dictionary for faster access
-    userid_to_profile = {profile['userId']: profile for profile in all_profiles if 'userId' in profile}
-    print(f"Created lookup dictionary for {len(userid_to_profile)} student profiles by userId")
+    # Map userId to the student profile ID
+    userid_to_profile_id = build_string_map(
+        ((profile['userId'], profile['id']) for profile in get_all_student_profiles(api_endpoint, api_key)
+         if profile.get('userId')),
+        path=os.path.join(args.lookup_dir, 'userid_to_profile_id.idx') if args.lookup_dir else None
+    )
+    print(f"Created lookup for {len(userid_to_profile_id)} student profiles by userId")
     
     # Create submissions for each entry
     created_submissions = []
@@ -300,6 +268,12 @@ def main():
     # Set a delay between submissions to avoid overloading the database
     submission_delay = 1.0  # seconds
     
+    # Record every created submission in the AuditLog, written in batches
+    client = shared_client(api_endpoint, api_key)
+    audit = open_audit_sink(client, 'createSubmissions',
+                            get_results_path('audit_spool_createSubmissions.jsonl'))
+    
+    phase('process loop')
     for submission_entry in submissions_data:
         auth_id = submission_entry.get('auth_id')
         if not auth_id:
@@ -321,21 +295,21 @@ def main():
             skipped_submissions.append(submission_entry)
             continue
         
-        user = email_to_user.get(email)
-        if not user:
+        cognito_id = email_to_cognito_id.get(email)
+        if not cognito_id:
             print(f"Skipping submission - no user found with email: {email}")
             skipped_submissions.append(submission_entry)
             continue
         
         # Get student profile by user ID from our lookup dictionary
-        student_profile = userid_to_profile.get(user['cognitoId'])
-        if not student_profile:
+        student_profile_id = userid_to_profile_id.get(cognito_id)
+        if not student_profile_id:
             print(f"Skipping submission - no student profile found for user: {email}")
             skipped_submissions.append(submission_entry)
             continue
         
         # Create submission
-        submission = create_submission(api_endpoint, api_key, submission_entry, student_profile['id'])
+        submission = create_submission(api_endpoint, api_key, submission_entry, student_profile_id)
         
         if submission:
             created_submissions.append({
@@ -343,6 +317,11 @@ def main():
                 "id": submission['id'],
                 "studentEmail": email
             })
+            audit.record(ACTION_CREATE, 'Submission', submission['id'], {
+                "studentProfileId": student_profile_id,
+                "week": submission.get('week'),
+                "studentEmail": email
+            })
         else:
             skipped_submissions.append(submission_entry)
         
@@ -350,11 +329,19 @@ def main():
         print(f"Waiting {submission_delay} seconds before processing next submission...")
         time.sleep(submission_delay)
     
+    phase('write results')
+    audit.close()
+    client.close()
+    email_to_cognito_id.close()
+    userid_to_profile_id.close()
+    
     # Print summary
     print("\nProcess completed!")
     print(f"Total submissions in file: {len(submissions_data)}")
     print(f"Submissions created: {len(created_submissions)}")
     print(f"Submissions skipped: {len(skipped_submissions)}")
+    for line in client.metrics.summary_lines():
+        print(line)
     
     # Save results to a file
     script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -362,10 +349,11 @@ def main():
     with open(results_file_path, 'w') as f:
         json.dump({
             'created_submissions': created_submissions,
-            'skipped_submissions': skipped_submissions
+            'skipped_submissions': skipped_submissions,
+            'request_metrics': client.metrics.snapshot()
         }, f, indent=2)
     
     print(f"Results saved to {results_file_path}")
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    run(main)
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+import argparse
+import hashlib
+import json
+
+from common.amplify import load_amplify_outputs, get_graphql_settings, get_results_path
+from common.audit import ACTION_DELETE, ACTION_UPDATE, open_audit_sink
+from common.concurrency import chunked, run_concurrently
+from common.graphql import GraphQLClient, GraphQLError, is_conditional_check_failure
+from common.linked_profiles import LinkedProfiles
+from common.profiling import phase, run
+
+# Fields fetched for each model; only these are kept in memory while grouping
+MODEL_FIELDS = {
+    'User': ['id', 'cognitoId', 'email', 'username', 'roles', 'status', 'linkedProfiles', 'createdAt'],
+    'StudentProfile': ['id', 'userId', 'firstName', 'lastName', 'title', 'bio', 'location',
+                       'contactEmail', 'skills', 'cohortId', 'createdAt'],
+    'Submission': ['id', 'studentProfileId', 'week', 'title', 'description', 'demoLink', 'repoLink',
+                   'deployedUrl', 'grade', 'passing', 'status', 'createdAt']
+}
+
+# Default natural keys; rows sharing the same key values are duplicates
+DEFAULT_KEYS = {
+    'User': ['cognitoId'],
+    'StudentProfile': ['userId'],
+    'Submission': ['studentProfileId', 'week']
+}
+
+def key_digest(values):
+    """Hash the natural key values into a compact, fixed-size dictionary key."""
+    return hashlib.blake2b(json.dumps(values, default=str).encode('utf-8'), digest_size=16).digest()
+
+def completeness(item):
+    """Count the populated fields of a row."""
+    return sum(1 for k, v in item.items() if k != 'id' and v not in (None, '', [], {}))
+
+def group_rows(rows, key_fields, remap=None):
+    """Group rows by the hash of their natural key.
+
+    `remap` optionally maps old values of a key field to new ones before
+    hashing, e.g. studentProfileId values of profiles about to be deleted.
+    Rows with a missing key field are never treated as duplicates.
+    """
+    groups = {}
+    for row in rows:
+        values = []
+        for field in key_fields:
+            value = row.get(field)
+            if remap and field in remap:
+                value = remap[field].get(value, value)
+            values.append(value)
+        if any(v is None or v == '' for v in values):
+            continue
+        groups.setdefault(key_digest(values), []).append(row)
+    return groups
+
+def choose_survivor(rows, strategy):
+    """Pick the row to keep: the oldest, or the most complete (oldest on ties)."""
+    def created_at(row):
+        return row.get('createdAt') or '9999'
+
+    if strategy == 'most-complete':
+        return min(rows, key=lambda row: (-completeness(row), created_at(row), row['id']))
+    return min(rows, key=lambda row: (created_at(row), row['id']))
+
+def split_groups(groups, strategy):
+    """Return (survivor, losers) pairs for every group that has duplicates."""
+    plans = []
+    for rows in groups.values():
+        if len(rows) < 2:
+            continue
+        survivor = choose_survivor(rows, strategy)
+        plans.append((survivor, [row for row in rows if row['id'] != survivor['id']]))
+    return plans
+
+def build_plan(users, profiles, submissions, keys, strategy):
+    """Work out which rows to update and delete without touching the API."""
+    # StudentProfile duplicates first, since Submissions and Users point at them
+    profile_plans = split_groups(group_rows(profiles, keys['StudentProfile']), strategy)
+    profile_remap = {}
+    for survivor, losers in profile_plans:
+        for loser in losers:
+            profile_remap[loser['id']] = survivor['id']
+
+    # Users: merge linkedProfiles of duplicates into the survivor and repoint
+    # any link to a deleted StudentProfile
+    user_plans = split_groups(group_rows(users, keys['User']), strategy)
+    losing_user_ids = set()
+    merged_links = {}
+    for survivor, losers in user_plans:
+        merged_links[survivor['id']] = [survivor] + losers
+        losing_user_ids.update(loser['id'] for loser in losers)
+
+    user_updates = []
+    for user in users:
+        if user['id'] in losing_user_ids:
+            continue
+        current = LinkedProfiles.decode(user.get('linkedProfiles'))
+        merged = LinkedProfiles()
+        for member in merged_links.get(user['id'], [user]):
+            merged.merge(LinkedProfiles.decode(member.get('linkedProfiles')).remap(profile_remap))
+        if merged != current:
+            user_updates.append({"id": user['id'], "linkedProfiles": merged.encode()})
+
+    # Submissions: group on the remapped key, then repoint the survivors that
+    # still reference a deleted profile
+    submission_plans = split_groups(
+        group_rows(submissions, keys['Submission'], remap={'studentProfileId': profile_remap}),
+        strategy
+    )
+    losing_submission_ids = {loser['id'] for _, losers in submission_plans for loser in losers}
+    submission_updates = [
+        {"id": s['id'], "studentProfileId": profile_remap[s['studentProfileId']]}
+        for s in submissions
+        if s.get('studentProfileId') in profile_remap and s['id'] not in losing_submission_ids
+    ]
+
+    return {
+        'updates': {
+            'User': user_updates,
+            'Submission': submission_updates
+        },
+        'deletes': {
+            'Submission': sorted(losing_submission_ids),
+            'StudentProfile': [loser['id'] for _, losers in profile_plans for loser in losers],
+            'User': [loser['id'] for _, losers in user_plans for loser in losers]
+        },
+        'groups': {
+            'User': [{'survivor': s['id'], 'duplicates': [l['id'] for l in ls]} for s, ls in user_plans],
+            'StudentProfile': [{'survivor': s['id'], 'duplicates': [l['id'] for l in ls]} for s, ls in profile_plans],
+            'Submission': [{'survivor': s['id'], 'duplicates': [l['id'] for l in ls]} for s, ls in submission_plans]
+        }
+    }
+
+def apply_plan(client, plan, max_workers, batch_size, rate, audit, delete_batch_size=25):
+    """Apply repoints first and deletes last, so an interrupted run leaves no dangling references."""
+    failures = []
+
+    def update(model, item):
+        result = client.update_item(model, item)
+        audit.record(ACTION_UPDATE, model, item['id'], {"dedupe": item})
+        return result
+
+    def delete(model, item_ids):
+        failed = []
+        for item_id, (item, error) in zip(item_ids, client.delete_items(model, item_ids)):
+            # A failed condition means the row is already gone
+            if item is not None or is_conditional_check_failure(error):
+                audit.record(ACTION_DELETE, model, item_id, {"dedupe": True})
+            else:
+                failed.append({'model': model, 'action': 'delete', 'id': item_id, 'error': error.get('message')})
+        return failed
+
+    for model, updates in plan['updates'].items():
+        if not updates:
+            continue
+        print(f"Updating {len(updates)} {model} rows...")
+        _, failed = run_concurrently(
+            lambda item, model=model: update(model, item),
+            updates, max_workers=max_workers, batch_size=batch_size, rate=rate
+        )
+        failures.extend({'model': model, 'action': 'update', 'id': item['id'], 'error': str(e)}
+                        for item, e in failed)
+
+    for model in ('Submission', 'StudentProfile', 'User'):
+        ids = plan['deletes'][model]
+        if not ids:
+            continue
+        print(f"Deleting {len(ids)} duplicate {model} rows...")
+        results, failed = run_concurrently(
+            lambda batch, model=model: delete(model, batch),
+            list(chunked(ids, delete_batch_size)), max_workers=max_workers, batch_size=batch_size, rate=rate
+        )
+        for batch_failures in results:
+            failures.extend(batch_failures)
+        failures.extend({'model': model, 'action': 'delete', 'id': item_id, 'error': str(e)}
+                        for batch, e in failed for item_id in batch)
+
+    return failures
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Find and remove duplicate User, StudentProfile and Submission rows.")
+    parser.add_argument('--strategy', choices=['oldest', 'most-complete'], default='oldest',
+                        help="Which row of a duplicate group survives (default: oldest)")
+    parser.add_argument('--user-key', default=','.join(DEFAULT_KEYS['User']),
+                        help="Comma-separated natural key for User (default: cognitoId)")
+    parser.add_argument('--profile-key', default=','.join(DEFAULT_KEYS['StudentProfile']),
+                        help="Comma-separated natural key for StudentProfile (default: userId)")
+    parser.add_argument('--submission-key', default=','.join(DEFAULT_KEYS['Submission']),
+                        help="Comma-separated natural key for Submission (default: studentProfileId,week)")
+    parser.add_argument('--apply', action='store_true', help="Apply the plan; without it this is a dry run")
+    parser.add_argument('--workers', type=int, default=8, help="Concurrent mutations (default: 8)")
+    parser.add_argument('--batch-size', type=int, default=100, help="Mutations submitted per batch (default: 100)")
+    parser.add_argument('--rate', type=float, default=20.0, help="Maximum requests per second (default: 20)")
+    parser.add_argument('--delete-batch-size', type=int, default=25,
+                        help="Deletes sent per GraphQL request (default: 25)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    keys = {
+        'User': args.user_key.split(','),
+        'StudentProfile': args.profile_key.split(','),
+        'Submission': args.submission_key.split(',')
+    }
+
+    # Load Amplify outputs
+    amplify_outputs = load_amplify_outputs()
+    client = GraphQLClient(*get_graphql_settings(amplify_outputs))
+
+    phase('fetch tables')
+    # Stream each table once, keeping only the projected fields
+    rows = {}
+    for model, fields in MODEL_FIELDS.items():
+        print(f"Fetching all {model} rows...")
+        try:
+            rows[model] = list(client.iter_items(model, fields))
+        except GraphQLError as e:
+            print(f"Error fetching {model} rows: {e}")
+            client.close()
+            return
+        print(f"Fetched {len(rows[model])} {model} rows")
+
+    phase('process loop')
+    plan = build_plan(rows['User'], rows['StudentProfile'], rows['Submission'], keys, args.strategy)
+
+    # Print summary
+    print("\nDuplicate scan completed!")
+    for model in ('User', 'StudentProfile', 'Submission'):
+        print(f"{model}: {len(plan['groups'][model])} duplicate groups, "
+              f"{len(plan['deletes'][model])} rows to delete")
+    print(f"User linkedProfiles to rewrite: {len(plan['updates']['User'])}")
+    print(f"Submissions to repoint: {len(plan['updates']['Submission'])}")
+
+    failures = []
+    if args.apply:
+        with open_audit_sink(client, 'dedupeRecords', get_results_path('audit_spool_dedupeRecords.jsonl')) as audit:
+            failures = apply_plan(client, plan, args.workers, args.batch_size, args.rate, audit,
+                                  args.delete_batch_size)
+        print(f"Applied plan with {len(failures)} failures")
+    else:
+        print("Dry run - pass --apply to update and delete rows")
+    client.close()
+
+    phase('write results')
+    # Save results to a file
+    results_file_path = get_results_path('dedupe_results.json')
+    with open(results_file_path, 'w') as f:
+        json.dump({
+            'applied': args.apply,
+            'strategy': args.strategy,
+            'keys': keys,
+            'plan': plan,
+            'failures': failures
+        }, f, indent=2)
+
+    print(f"Results saved to {results_file_path}")
+
+if __name__ == '__main__':
+    run(main)
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+import argparse
+import gzip
+import json
+import os
+import shutil
+import time
+from datetime import datetime
+
+from common.amplify import load_amplify_outputs, get_results_path
+from common.dynamodb import (SegmentScanError, get_dynamodb_client, get_model_names, resolve_table_names,
+                             parallel_scan)
+from common.profiling import phase, run
+
+class JsonlPartWriter:
+    """Write rows to gzip-compressed JSON Lines part files of bounded size."""
+
+    extension = 'jsonl.gz'
+
+    def __init__(self, directory, rows_per_file, schema=None):
+        self.directory = directory
+        self.rows_per_file = rows_per_file
+        self.files = []
+        self._handle = None
+        self._rows_in_file = 0
+
+    def write(self, rows):
+        for row in rows:
+            if self._handle is None:
+                path = os.path.join(self.directory, f"part-{len(self.files):05d}.{self.extension}")
+                os.makedirs(self.directory, exist_ok=True)
+                self._handle = gzip.open(path, 'wt', encoding='utf-8')
+                self.files.append(path)
+            self._handle.write(json.dumps(row, separators=(',', ':'), default=str))
+            self._handle.write('\n')
+            self._rows_in_file += 1
+            if self._rows_in_file >= self.rows_per_file:
+                self.close()
+
+    def close(self):
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+            self._rows_in_file = 0
+
+    @classmethod
+    def shared_schema(cls, fields, existing_files=()):
+        return None
+
+# Arrow types of the scalar GraphQL types; other scalars, enums and JSON are strings
+PARQUET_TYPES = {'Int': 'int64', 'Float': 'float64', 'Boolean': 'bool_', 'AWSTimestamp': 'int64'}
+
+class ParquetSchema:
+    """The schema shared by every Parquet part file of one table.
+
+    It comes from the model's fields in amplify_outputs.json when they are
+    known, otherwise from the rows of the first part written. Columns
+    outside the schema are dropped, with a warning, so all parts match.
+    """
+
+    def __init__(self, pyarrow, fields=None):
+        self._pa = pyarrow
+        self.arrow = None
+        self._dropped = set()
+        if fields:
+            self.arrow = pyarrow.schema([
+                (name, getattr(pyarrow, PARQUET_TYPES.get(field['type'], 'string'))()
+                 if isinstance(field['type'], str) and not field.get('isArray') else pyarrow.string())
+                for name, field in sorted(fields.items())
+                # Relationship fields are resolved by the API and not stored on the row
+                if not (isinstance(field['type'], dict) and 'model' in field['type'])
+            ])
+
+    def table(self, rows):
+        columns = sorted({key for row in rows for key in row})
+        if self.arrow is None:
+            inferred = self._pa.Table.from_pydict({c: [row.get(c) for row in rows] for c in columns}).schema
+            # A column with only nulls so far has no type; store it as a string
+            self.arrow = self._pa.schema([
+                (field.name, self._pa.string() if self._pa.types.is_null(field.type) else field.type)
+                for field in inferred
+            ])
+        dropped = set(columns) - set(self.arrow.names) - self._dropped
+        if dropped:
+            print(f"Warning: dropping columns missing from the Parquet schema: {', '.join(sorted(dropped))}")
+            self._dropped |= dropped
+
+        data = {}
+        for field in self.arrow:
+            values = [row.get(field.name) for row in rows]
+            if self._pa.types.is_string(field.type):
+                values = [v if v is None or isinstance(v, str) else json.dumps(v, default=str) for v in values]
+            data[field.name] = values
+        return self._pa.Table.from_pydict(data, schema=self.arrow)
+
+class ParquetPartWriter:
+    """Buffer rows and write them as Parquet part files of bounded size.
+
+    Nested values (the a.json() fields) are stored as JSON strings, and every
+    part of a table uses the same ParquetSchema.
+    """
+
+    extension = 'parquet'
+
+    def __init__(self, directory, rows_per_file, schema):
+        self._pq = schema._pa.parquet
+        self.schema = schema
+        self.directory = directory
+        self.rows_per_file = rows_per_file
+        self.files = []
+        self._buffer = []
+
+    @classmethod
+    def shared_schema(cls, fields, existing_files=()):
+        try:
+            import pyarrow
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            raise SystemExit("Parquet export requires pyarrow: pip install pyarrow")
+        schema = ParquetSchema(pyarrow, fields)
+        if schema.arrow is None and existing_files:
+            # Resuming an export: match the parts the earlier run wrote
+            schema.arrow = pyarrow.parquet.read_schema(existing_files[0])
+        return schema
+
+    def write(self, rows):
+        for row in rows:
+            self._buffer.append({
+                key: json.dumps(value, default=str) if isinstance(value, (dict, list)) else value
+                for key, value in row.items()
+            })
+            if len(self._buffer) >= self.rows_per_file:
+                self._flush()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        table = self.schema.table(self._buffer)
+        path = os.path.join(self.directory, f"part-{len(self.files):05d}.{self.extension}")
+        os.makedirs(self.directory, exist_ok=True)
+        self._pq.write_table(table, path, compression='snappy')
+        self.files.append(path)
+        self._buffer = []
+
+    def close(self):
+        self._flush()
+
+WRITERS = {
+    'jsonl': JsonlPartWriter,
+    'parquet': ParquetPartWriter
+}
+
+def model_fields(amplify_outputs, model):
+    """Return the fields of a model from the outputs' model introspection, or None."""
+    models = amplify_outputs.get('data', {}).get('model_introspection', {}).get('models', {})
+    return models.get(model, {}).get('fields')
+
+# Written into a segment's directory once all its rows are exported
+SEGMENT_MARKER = '_SUCCESS.json'
+
+def finished_segments(table_dir, total_segments):
+    """Return {segment: marker} for the segments an earlier run into `table_dir` finished."""
+    finished = {}
+    for segment in range(total_segments):
+        path = os.path.join(table_dir, f"segment={segment:03d}", SEGMENT_MARKER)
+        if not os.path.exists(path):
+            continue
+        with open(path, 'r') as f:
+            marker = json.load(f)
+        if marker['totalSegments'] != total_segments:
+            raise ValueError(f"{table_dir} was exported with {marker['totalSegments']} segments, not {total_segments}")
+        finished[segment] = marker
+    return finished
+
+def export_table(dynamodb_client, model, table_name, output_dir, file_format='jsonl',
+                 total_segments=4, rows_per_file=50000, page_size=1000, fields=None):
+    """Export one table with a segmented Scan, one part-file stream per segment.
+
+    Segments finished by an earlier export into the same `output_dir` are
+    skipped, and the part files of unfinished ones are written again. A
+    failed segment does not stop the others; it is listed in the result's
+    'failedSegments' so a rerun can finish it.
+    """
+    writer_class = WRITERS[file_format]
+    table_dir = os.path.join(output_dir, model)
+    finished = finished_segments(table_dir, total_segments)
+    resumed = len(finished)
+    pending = [segment for segment in range(total_segments) if segment not in finished]
+    for segment in pending:
+        shutil.rmtree(os.path.join(table_dir, f"segment={segment:03d}"), ignore_errors=True)
+
+    existing_files = [os.path.join(table_dir, f"segment={segment:03d}", name)
+                      for segment, marker in sorted(finished.items()) for name in marker['files']]
+    schema = writer_class.shared_schema(fields, existing_files)
+    writers = {}
+    rows = dict.fromkeys(pending, 0)
+    failed = {}
+    started = time.monotonic()
+
+    try:
+        for segment, items in parallel_scan(dynamodb_client, table_name, total_segments, page_size,
+                                            segments=pending):
+            if segment not in writers:
+                directory = os.path.join(table_dir, f"segment={segment:03d}")
+                writers[segment] = writer_class(directory, rows_per_file, schema)
+            writers[segment].write(items)
+            rows[segment] += len(items)
+    except SegmentScanError as e:
+        failed = e.failed
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    for segment in pending:
+        if segment in failed:
+            continue
+        files = writers[segment].files if segment in writers else []
+        finished[segment] = {'totalSegments': total_segments, 'rows': rows[segment],
+                             'files': [os.path.basename(path) for path in files]}
+        directory = os.path.join(table_dir, f"segment={segment:03d}")
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, SEGMENT_MARKER), 'w') as f:
+            json.dump(finished[segment], f)
+
+    elapsed = time.monotonic() - started
+    exported = sum(rows[segment] for segment in pending if segment not in failed)
+    return {
+        'model': model,
+        'table': table_name,
+        'rows': sum(marker['rows'] for marker in finished.values()),
+        'files': sorted(os.path.join(table_dir, f"segment={segment:03d}", name)
+                        for segment, marker in finished.items() for name in marker['files']),
+        'resumedSegments': resumed,
+        'failedSegments': {segment: str(e) for segment, e in sorted(failed.items())},
+        'seconds': round(elapsed, 3),
+        'rowsPerSecond': round(exported / elapsed, 1) if elapsed else None
+    }
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Export Amplify model tables with a parallel DynamoDB Scan.")
+    parser.add_argument('--models', help="Comma-separated models to export (default: all)")
+    parser.add_argument('--format', choices=sorted(WRITERS), default='jsonl', help="Output format (default: jsonl)")
+    parser.add_argument('--output-dir', help="Output directory (default: exports/<timestamp> next to the scripts); "
+                                             "an earlier export there is resumed")
+    parser.add_argument('--segments', type=int, default=4, help="Parallel Scan segments per table (default: 4)")
+    parser.add_argument('--rows-per-file', type=int, default=50000, help="Rows per part file (default: 50000)")
+    parser.add_argument('--page-size', type=int, default=1000, help="Scan page size (default: 1000)")
+    parser.add_argument('--table-suffix', help="Table name suffix '<apiId>-<env>' when it cannot be discovered")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    # Load Amplify outputs
+    amplify_outputs = load_amplify_outputs()
+    dynamodb_client = get_dynamodb_client(amplify_outputs)
+
+    models = args.models.split(',') if args.models else get_model_names(amplify_outputs)
+    tables = resolve_table_names(amplify_outputs, dynamodb_client, models, args.table_suffix)
+
+    output_dir = args.output_dir or get_results_path(
+        os.path.join('exports', datetime.now().strftime('%Y%m%dT%H%M%S'))
+    )
+
+    phase('process loop')
+    results = []
+    for model in models:
+        print(f"Exporting {model} from {tables[model]}...")
+        try:
+            result = export_table(dynamodb_client, model, tables[model], output_dir, args.format,
+                                  args.segments, args.rows_per_file, args.page_size,
+                                  model_fields(amplify_outputs, model))
+        except ValueError as e:
+            raise SystemExit(f"Cannot resume {model}: {e}")
+        print(f"Exported {result['rows']} {model} rows to {len(result['files'])} files "
+              f"in {result['seconds']}s")
+        if result['resumedSegments']:
+            print(f"{result['resumedSegments']} segments were already exported by an earlier run")
+        for segment, error in result['failedSegments'].items():
+            print(f"Error exporting {model} segment {segment}: {error}")
+        results.append(result)
+
+    phase('write results')
+    # Save the export manifest
+    manifest_path = os.path.join(output_dir, 'manifest.json')
+    os.makedirs(output_dir, exist_ok=True)
+    with open(manifest_path, 'w') as f:
+        json.dump({
+            'format': args.format,
+            'segments': args.segments,
+            'exportedAt': datetime.now().isoformat(),
+            'tables': results
+        }, f, indent=2)
+
+    failed = sum(len(result['failedSegments']) for result in results)
+    if failed:
+        print(f"\n{failed} segments failed; rerun with --output-dir {output_dir} to export only those. "
+              f"Manifest saved to {manifest_path}")
+    else:
+        print(f"\nExport completed! Manifest saved to {manifest_path}")
+
+if __name__ == '__main__':
+    run(main)
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+import argparse
+import csv
+import json
+from datetime import datetime, timezone
+
+from common.amplify import load_amplify_outputs, get_graphql_settings, get_results_path
+from common.audit import ACTION_GRADE, open_audit_sink
+from common.concurrency import chunked, run_concurrently
+from common.graphql import GraphQLClient, GraphQLError, is_conditional_check_failure
+from common.profiling import phase, run
+
+SUBMISSION_FIELDS = ['id', 'studentProfileId', 'week', 'lastStudentEdit', 'gradedAt']
+
+def load_rows(path):
+    """Read grading rows from a CSV file with a header row, or from JSON Lines."""
+    if path.endswith('.jsonl') or path.endswith('.ndjson'):
+        with open(path, 'r') as f:
+            return [json.loads(line) for line in f if line.strip()]
+    with open(path, 'r', newline='') as f:
+        return list(csv.DictReader(f))
+
+def normalize_row(row):
+    """Accept snake_case or camelCase column names and coerce types."""
+    def value(*names):
+        for name in names:
+            if row.get(name) not in (None, ''):
+                return row[name]
+        return None
+
+    passing = value('passing')
+    if isinstance(passing, str):
+        passing = passing.strip().lower() in ('true', 'yes', 'y', '1', 'pass', 'passing')
+    week = value('week')
+    invalid = None
+    if week is not None:
+        try:
+            week = int(week)
+        except (TypeError, ValueError):
+            invalid = f"invalid week {week!r}"
+            week = None
+
+    normalized = {
+        'submissionId': value('submission_id', 'submissionId', 'id'),
+        'email': (value('student_email', 'studentEmail', 'email') or '').strip().lower() or None,
+        'week': week,
+        'grade': value('grade'),
+        'passing': passing,
+        'notes': value('notes'),
+        'gradedBy': value('graded_by', 'gradedBy')
+    }
+    if invalid:
+        normalized['reason'] = invalid
+    return normalized
+
+def build_indexes(client):
+    """Index submissions by id and by (studentProfileId, week), and profiles by email.
+
+    by_profile_week maps to a list, since a student can have several
+    submissions for the same week.
+    """
+    cognito_to_email = {
+        user['cognitoId']: user['email'].lower()
+        for user in client.iter_items('User', ['cognitoId', 'email'])
+        if user.get('cognitoId') and user.get('email')
+    }
+
+    email_to_profile = {}
+    for profile in client.iter_items('StudentProfile', ['id', 'userId', 'contactEmail']):
+        for email in (cognito_to_email.get(profile.get('userId')), profile.get('contactEmail')):
+            if email:
+                email_to_profile.setdefault(email.lower(), profile['id'])
+
+    by_id = {}
+    by_profile_week = {}
+    for submission in client.iter_items('Submission', SUBMISSION_FIELDS):
+        by_id[submission['id']] = submission
+        by_profile_week.setdefault((submission['studentProfileId'], submission.get('week')), []).append(submission)
+
+    return by_id, by_profile_week, email_to_profile
+
+def resolve(row, by_id, by_profile_week, email_to_profile):
+    """Return (submission, None) for the Submission a grading row refers to, or (None, reason)."""
+    if row['submissionId']:
+        submission = by_id.get(row['submissionId'])
+        return (submission, None) if submission else (None, 'unknown submission id')
+    profile_id = email_to_profile.get(row['email'])
+    if profile_id is None:
+        return None, 'no student profile for this email'
+    if row['week'] is None:
+        return None, 'no submission id or week'
+    matches = by_profile_week.get((profile_id, row['week']), [])
+    if len(matches) > 1:
+        return None, f"ambiguous: {len(matches)} submissions for this student and week; give a submission id"
+    return (matches[0], None) if matches else (None, 'no submission for this student and week')
+
+def grading_update(row, submission, graded_at):
+    """Build the update input and the optimistic-concurrency condition for one row.
+
+    The condition fails if the student edited the submission after it was
+    read, so a late edit is reported as a conflict instead of being graded.
+    """
+    update = {'id': submission['id'], 'gradedAt': graded_at, 'status': 'graded'}
+    for field in ('grade', 'passing', 'notes', 'gradedBy'):
+        if row[field] is not None:
+            update[field] = row[field]
+
+    last_edit = submission.get('lastStudentEdit')
+    if last_edit:
+        condition = {'lastStudentEdit': {'eq': last_edit}}
+    else:
+        condition = {'lastStudentEdit': {'attributeExists': False}}
+    return update, condition
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Import grades from a CSV or JSON Lines file.")
+    parser.add_argument('file', help="CSV (with header) or .jsonl file of grading rows")
+    parser.add_argument('--graded-by', help="gradedBy value for rows that do not set one")
+    parser.add_argument('--batch-size', type=int, default=10, help="Updates sent per GraphQL request (default: 10)")
+    parser.add_argument('--workers', type=int, default=4, help="Concurrent requests (default: 4)")
+    parser.add_argument('--rate', type=float, default=10.0, help="Maximum requests per second (default: 10)")
+    parser.add_argument('--dry-run', action='store_true', help="Resolve rows and report without updating")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    phase('load inputs')
+    rows = [normalize_row(row) for row in load_rows(args.file)]
+    print(f"Loaded {len(rows)} grading rows from {args.file}")
+
+    # Load Amplify outputs
+    amplify_outputs = load_amplify_outputs()
+    client = GraphQLClient(*get_graphql_settings(amplify_outputs))
+
+    phase('fetch tables')
+    try:
+        by_id, by_profile_week, email_to_profile = build_indexes(client)
+    except GraphQLError as e:
+        print(f"Error loading submissions: {e}")
+        client.close()
+        return
+    print(f"Indexed {len(by_id)} submissions and {len(email_to_profile)} student emails")
+
+    phase('process loop')
+    graded_at = datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+    pending = []
+    unresolved = []
+    seen = set()
+    for row in rows:
+        if args.graded_by and not row['gradedBy']:
+            row['gradedBy'] = args.graded_by
+        if row.get('reason'):
+            unresolved.append(row)
+            continue
+        submission, reason = resolve(row, by_id, by_profile_week, email_to_profile)
+        if submission is None:
+            unresolved.append(dict(row, reason=reason))
+        elif submission['id'] in seen:
+            unresolved.append(dict(row, reason='duplicate row for submission'))
+        else:
+            seen.add(submission['id'])
+            pending.append((row, grading_update(row, submission, graded_at)))
+    print(f"Resolved {len(pending)} rows, {len(unresolved)} unresolved")
+
+    updated = []
+    conflicts = []
+    errors = []
+    if not args.dry_run:
+        audit = open_audit_sink(client, 'gradeSubmissions', get_results_path('audit_spool_gradeSubmissions.jsonl'))
+
+        def send(batch):
+            return batch, client.update_items('Submission', [update for _, update in batch])
+
+        results, failed = run_concurrently(send, list(chunked(pending, args.batch_size)),
+                                           max_workers=args.workers, rate=args.rate)
+        for batch, outcomes in results:
+            for (row, (update, _)), (item, error) in zip(batch, outcomes):
+                if item is not None:
+                    updated.append(update['id'])
+                    audit.record(ACTION_GRADE, 'Submission', update['id'],
+                                 {key: update.get(key) for key in ('grade', 'passing', 'gradedBy')})
+                elif is_conditional_check_failure(error):
+                    conflicts.append(dict(row, submissionId=update['id'],
+                                          reason='submission edited by the student after it was read'))
+                else:
+                    errors.append(dict(row, submissionId=update['id'], error=error.get('message')))
+        for batch, e in failed:
+            errors.extend(dict(row, submissionId=update['id'], error=str(e)) for row, (update, _) in batch)
+
+        audit.close()
+    client.close()
+
+    phase('write results')
+    # Print summary
+    print("\nGrading import completed!" if not args.dry_run else "\nDry run completed!")
+    print(f"Submissions graded: {len(updated)}")
+    print(f"Conflicts (not overwritten): {len(conflicts)}")
+    print(f"Unresolved rows: {len(unresolved)}")
+    print(f"Errors: {len(errors)}")
+
+    # Save results to a file
+    results_file_path = get_results_path('grading_results.json')
+    with open(results_file_path, 'w') as f:
+        json.dump({
+            'dry_run': args.dry_run,
+            'graded': updated,
+            'conflicts': conflicts,
+            'unresolved': unresolved,
+            'errors': errors
+        }, f, indent=2)
+
+    print(f"Results saved to {results_file_path}")
+
+if __name__ == '__main__':
+    run(main)
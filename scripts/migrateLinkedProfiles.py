@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import time
+
+from common.amplify import load_amplify_outputs, get_graphql_settings, get_results_path
+from common.audit import ACTION_UPDATE, open_audit_sink
+from common.concurrency import chunked, run_concurrently
+from common.graphql import GraphQLClient, GraphQLError, is_conditional_check_failure
+from common.linked_profiles import LinkedProfiles, is_canonical
+from common.profiling import phase, run
+
+USER_FIELDS = ['id', 'email', 'linkedProfiles', 'updatedAt']
+
+def pending_updates(users, stats):
+    """Yield an (input, condition) update for every user not stored in canonical form."""
+    for user in users:
+        stats['scanned'] += 1
+        if is_canonical(user.get('linkedProfiles')):
+            continue
+        links = LinkedProfiles.decode(user.get('linkedProfiles'))
+        condition = {"updatedAt": {"eq": user['updatedAt']}} if user.get('updatedAt') else None
+        stats['toRewrite'] += 1
+        yield {"id": user['id'], "linkedProfiles": links.encode()}, condition
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Rewrite every User.linkedProfiles into the canonical shape.")
+    parser.add_argument('--dry-run', action='store_true', help="Count the users to rewrite without updating them")
+    parser.add_argument('--batch-size', type=int, default=10, help="Updates per GraphQL request (default: 10)")
+    parser.add_argument('--workers', type=int, default=8, help="Concurrent requests (default: 8)")
+    parser.add_argument('--rate', type=float, default=10.0, help="Maximum requests per second (default: 10)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    # Load Amplify outputs
+    amplify_outputs = load_amplify_outputs()
+    client = GraphQLClient(*get_graphql_settings(amplify_outputs))
+
+    phase('process loop')
+    stats = {'scanned': 0, 'toRewrite': 0}
+    users = client.iter_items('User', USER_FIELDS)
+    batches = chunked(pending_updates(users, stats), args.batch_size)
+
+    started = time.monotonic()
+    rewritten = 0
+    conflicts = []
+    failures = []
+    try:
+        if args.dry_run:
+            for _ in batches:
+                pass
+        else:
+            with open_audit_sink(client, 'migrateLinkedProfiles',
+                                 get_results_path('audit_spool_migrateLinkedProfiles.jsonl')) as audit:
+                # Users are streamed page by page and rewritten while later pages are fetched
+                outcomes, failed = run_concurrently(
+                    lambda batch: (batch, client.update_items('User', batch)),
+                    batches, max_workers=args.workers, batch_size=args.workers * 2, rate=args.rate
+                )
+                for batch, batch_results in outcomes:
+                    for (update, _), (_, error) in zip(batch, batch_results):
+                        if error is None:
+                            rewritten += 1
+                            audit.record(ACTION_UPDATE, 'User', update['id'],
+                                         {"linkedProfiles": "normalized", "links": len(update['linkedProfiles'])})
+                        elif is_conditional_check_failure(error):
+                            conflicts.append(update['id'])
+                        else:
+                            failures.append({'id': update['id'], 'error': error.get('message')})
+                for batch, e in failed:
+                    failures.extend({'id': update['id'], 'error': str(e)} for update, _ in batch)
+    except GraphQLError as e:
+        print(f"Error listing users: {e}")
+        return
+    finally:
+        client.close()
+    elapsed = time.monotonic() - started
+
+    phase('write results')
+    # Print summary
+    print("\nMigration completed!" if not args.dry_run else "\nDry run completed!")
+    print(f"Users scanned: {stats['scanned']}")
+    print(f"Users not in canonical form: {stats['toRewrite']}")
+    if not args.dry_run:
+        print(f"Users rewritten: {rewritten}")
+        print(f"Users changed during the run (rerun to pick up): {len(conflicts)}")
+        print(f"Failures: {len(failures)}")
+    print(f"Elapsed: {elapsed:.1f}s")
+
+    # Save results to a file
+    results_file_path = get_results_path('linked_profiles_migration_results.json')
+    with open(results_file_path, 'w') as f:
+        json.dump({
+            'dry_run': args.dry_run,
+            'scanned': stats['scanned'],
+            'to_rewrite': stats['toRewrite'],
+            'rewritten': rewritten,
+            'conflicts': conflicts,
+            'failures': failures
+        }, f, indent=2)
+
+    print(f"Results saved to {results_file_path}")
+
+if __name__ == '__main__':
+    run(main)
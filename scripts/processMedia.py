@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+import argparse
+import io
+import json
+import os
+import posixpath
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from common.amplify import load_amplify_outputs, get_graphql_settings, get_bucket_name, get_results_path
+from common.aws import get_client
+from common.concurrency import run_concurrently
+from common.graphql import GraphQLClient
+from common.profiling import phase, run
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif', '.bmp', '.tiff')
+VARIANT_MARKER = '__'
+STATE_FILE = 'media_variants_state.json'
+
+# Record fields that point at uploaded media
+REFERENCE_FIELDS = {
+    'StudentProfile': 'profileImageUrl',
+    'Submission': 'featuredImageUrl'
+}
+
+FORMAT_CONTENT_TYPES = {
+    'webp': 'image/webp',
+    'avif': 'image/avif',
+    'jpeg': 'image/jpeg'
+}
+
+def is_original(key):
+    """Return True for uploaded images that are not variants produced by this script."""
+    name = posixpath.basename(key)
+    return name.lower().endswith(IMAGE_EXTENSIONS) and VARIANT_MARKER not in name
+
+def variant_key(key, etag, width, image_format):
+    """Variant keys embed the source ETag, so they can be cached as immutable."""
+    directory, name = posixpath.split(key)
+    stem = posixpath.splitext(name)[0]
+    return posixpath.join(directory, f"{stem}{VARIANT_MARKER}{etag[:8]}_w{width}.{image_format}")
+
+def make_variants(data, widths, formats, quality):
+    """Resize and re-encode one image; runs in a worker process.
+
+    Returns {(width, format): bytes}. Formats the local Pillow build cannot
+    encode (AVIF needs libavif or pillow-avif-plugin) are skipped.
+    """
+    from PIL import Image, ImageOps
+    try:
+        import pillow_avif  # noqa: F401 - registers the AVIF codec on older Pillow
+    except ImportError:
+        pass
+
+    Image.init()
+
+    image = Image.open(io.BytesIO(data))
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+    variants = {}
+    for width in widths:
+        if image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.LANCZOS)
+        else:
+            resized = image
+        for image_format in formats:
+            if image_format.upper() not in Image.SAVE:
+                continue
+            output = io.BytesIO()
+            resized.save(output, format=image_format.upper(), quality=quality)
+            variants[(width, image_format)] = output.getvalue()
+    return variants
+
+def list_originals(s3_client, bucket, prefix):
+    """Yield (key, etag, size) for every original image under a prefix."""
+    for page in s3_client.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get('Contents', []):
+            if is_original(obj['Key']):
+                yield obj['Key'], obj['ETag'].strip('"'), obj['Size']
+
+def process_object(s3_client, bucket, process_pool, key, etag, widths, formats, quality, cache_control):
+    """Download an original, build its variants in the process pool and upload them."""
+    data = s3_client.get_object(Bucket=bucket, Key=key)['Body'].read()
+    variants = process_pool.submit(make_variants, data, widths, formats, quality).result()
+
+    uploaded = {}
+    for (width, image_format), body in variants.items():
+        target = variant_key(key, etag, width, image_format)
+        s3_client.put_object(
+            Bucket=bucket,
+            Key=target,
+            Body=body,
+            ContentType=FORMAT_CONTENT_TYPES.get(image_format, f"image/{image_format}"),
+            CacheControl=cache_control,
+            Metadata={'source-key': key, 'source-etag': etag}
+        )
+        uploaded[f"w{width}.{image_format}"] = target
+
+    return {
+        'key': key,
+        'etag': etag,
+        'originalBytes': len(data),
+        'variantBytes': {f"w{width}.{image_format}": len(body)
+                         for (width, image_format), body in variants.items()},
+        'variants': uploaded
+    }
+
+def referenced_key(value, display_keys):
+    """Return the original key a bare key or URL refers to, or None.
+
+    The query string is dropped, then each '/'-separated suffix of the
+    path is looked up, so URLs with any host or path prefix match.
+    """
+    path = value.split('?')[0]
+    if path in display_keys:
+        return path
+    position = path.find('/')
+    while position != -1:
+        if path[position + 1:] in display_keys:
+            return path[position + 1:]
+        position = path.find('/', position + 1)
+    return None
+
+def update_references(client, display_keys, workers, rate):
+    """Point profileImageUrl / featuredImageUrl at the display variant of their image.
+
+    Values may be bare keys or full URLs; only the key part is replaced.
+    """
+    updates = []
+    for model, field in REFERENCE_FIELDS.items():
+        for item in client.iter_items(model, ['id', field]):
+            value = item.get(field)
+            if not value:
+                continue
+            original = referenced_key(value, display_keys)
+            if original is not None:
+                prefix = value.split('?')[0][:-len(original)]
+                updates.append((model, {'id': item['id'], field: prefix + display_keys[original]}))
+
+    _, failures = run_concurrently(
+        lambda update: client.update_item(update[0], update[1]),
+        updates, max_workers=workers, rate=rate
+    )
+    return len(updates) - len(failures), failures
+
+def load_state():
+    path = get_results_path(STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def save_state(state):
+    with open(get_results_path(STATE_FILE), 'w') as f:
+        json.dump(state, f, indent=2)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Create resized WebP/AVIF variants of images in the media bucket.")
+    parser.add_argument('--prefix', default='media/user/', help="Key prefix to walk (default: media/user/)")
+    parser.add_argument('--widths', default='320,1280', help="Comma-separated variant widths (default: 320,1280)")
+    parser.add_argument('--formats', default='webp,avif', help="Comma-separated variant formats (default: webp,avif)")
+    parser.add_argument('--quality', type=int, default=80, help="Encoder quality (default: 80)")
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 2,
+                        help="Image processing worker processes (default: CPU count)")
+    parser.add_argument('--io-workers', type=int, default=16, help="Concurrent downloads and uploads (default: 16)")
+    parser.add_argument('--cache-control', default='public, max-age=31536000, immutable',
+                        help="Cache-Control header of variants (default: one year, immutable)")
+    parser.add_argument('--update-records', action='store_true',
+                        help="Point StudentProfile and Submission image fields at the largest variant")
+    parser.add_argument('--force', action='store_true', help="Reprocess images even if their ETag was seen before")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    widths = sorted(int(w) for w in args.widths.split(','))
+    formats = args.formats.split(',')
+
+    # Load Amplify outputs
+    amplify_outputs = load_amplify_outputs()
+    bucket = get_bucket_name(amplify_outputs, 'media-bucket')
+    s3_client = get_client('s3', amplify_outputs['storage']['aws_region'])
+
+    phase('fetch tables')
+    state = {} if args.force else load_state()
+    pending = [(key, etag) for key, etag, _ in list_originals(s3_client, bucket, args.prefix)
+               if state.get(key, {}).get('etag') != etag]
+    print(f"Found {len(pending)} images to process under {args.prefix}")
+
+    phase('process loop')
+    results = []
+    failures = []
+    with ProcessPoolExecutor(max_workers=args.processes) as process_pool, \
+            ThreadPoolExecutor(max_workers=args.io_workers) as io_pool:
+        futures = {
+            io_pool.submit(process_object, s3_client, bucket, process_pool, key, etag,
+                           widths, formats, args.quality, args.cache_control): key
+            for key, etag in pending
+        }
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"Error processing {key}: {e}")
+                failures.append({'key': key, 'error': str(e)})
+                continue
+            results.append(result)
+            state[key] = {'etag': result['etag'], 'variants': result['variants']}
+            print(f"Processed {key}: {len(result['variants'])} variants")
+
+    phase('write results')
+    save_state(state)
+
+    updated = 0
+    if args.update_records:
+        display_format = formats[0]
+        display_keys = {
+            key: entry['variants'][f"w{widths[-1]}.{display_format}"]
+            for key, entry in state.items()
+            if f"w{widths[-1]}.{display_format}" in entry.get('variants', {})
+        }
+        with GraphQLClient(*get_graphql_settings(amplify_outputs)) as client:
+            updated, update_failures = update_references(client, display_keys, args.io_workers, 20.0)
+        failures.extend({'record': update, 'error': str(e)} for update, e in update_failures)
+
+    # Print summary
+    original_bytes = sum(r['originalBytes'] for r in results)
+    largest_variant_bytes = sum(max(r['variantBytes'].values() or [0]) for r in results)
+    print("\nMedia processing completed!")
+    print(f"Images processed: {len(results)}")
+    print(f"Original bytes: {original_bytes}")
+    print(f"Largest variant bytes: {largest_variant_bytes}")
+    print(f"Records updated: {updated}")
+    print(f"Failures: {len(failures)}")
+
+    # Save results to a file
+    results_file_path = get_results_path('media_results.json')
+    with open(results_file_path, 'w') as f:
+        json.dump({
+            'processed': results,
+            'failed': failures
+        }, f, indent=2)
+
+    print(f"Results saved to {results_file_path}")
+
+if __name__ == '__main__':
+    run(main)
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+import argparse
+import hashlib
+import io
+import json
+import mimetypes
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from common.amplify import load_amplify_outputs, get_graphql_settings, get_bucket_name, get_results_path
+from common.aws import get_client
+from common.graphql import GraphQLClient, GraphQLError
+from common.profiling import phase, run
+from common.showcases import is_published
+
+SHOWCASE_FIELDS = ['id', 'username', 'templateId', 'profile', 'projects', 'experience', 'career',
+                   'blogs', 'customization', 'publication']
+
+# Showcase fields passed to templates, decoded from AWSJSON
+CONTEXT_FIELDS = ['profile', 'projects', 'experience', 'career', 'blogs', 'customization']
+
+MANIFEST_NAME = '.manifest.json'
+MAIN_FILES = {
+    'index.html': ('html', 'text/html'),
+    'style.css': ('css', 'text/css'),
+    'script.js': ('js', 'application/javascript')
+}
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def parse_json(value):
+    """Decode an AWSJSON value, or each element of an a.json().array() value."""
+    if isinstance(value, list):
+        return [parse_json(v) for v in value]
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError:
+            return value
+    return value
+
+def sha256_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def load_template_dir(template_dir):
+    """Load a local template: the main files plus every file under assets/.
+
+    Asset hashes are computed once here and shared by all showcases.
+    """
+    sources = {}
+    for file_name, (kind, _) in MAIN_FILES.items():
+        path = os.path.join(template_dir, file_name)
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                sources[kind] = f.read()
+
+    assets = {}
+    assets_dir = os.path.join(template_dir, 'assets')
+    for root, _, files in os.walk(assets_dir):
+        for file_name in files:
+            path = os.path.join(root, file_name)
+            relative = os.path.relpath(path, template_dir).replace(os.sep, '/')
+            assets[relative] = {'path': path, 'sha256': sha256_file(path), 'size': os.path.getsize(path)}
+
+    return sources, assets
+
+def load_templates(client):
+    """Return template sources ({'html', 'css', 'js'}) keyed by Template ID."""
+    templates = {}
+    for template in client.iter_items('Template', ['id', 'templateFiles']):
+        files = parse_json(template.get('templateFiles'))
+        if isinstance(files, dict):
+            templates[template['id']] = files
+    return templates
+
+def render_files(environment, sources, showcase):
+    """Render the main template files for one showcase."""
+    context = {field: parse_json(showcase.get(field)) for field in CONTEXT_FIELDS}
+    context['username'] = showcase['username']
+    context['showcase_id'] = showcase['id']
+
+    rendered = {}
+    for file_name, (kind, _) in MAIN_FILES.items():
+        if sources.get(kind) is not None:
+            rendered[file_name] = environment.from_string(sources[kind]).render(**context).encode('utf-8')
+    return rendered
+
+def fetch_manifest(s3_client, bucket, prefix):
+    """Return the manifest of the last publish, or an empty one."""
+    from botocore.exceptions import ClientError
+
+    try:
+        response = s3_client.get_object(Bucket=bucket, Key=f"{prefix}{MANIFEST_NAME}")
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+            return {}
+        raise
+    return json.loads(response['Body'].read()).get('files', {})
+
+def publish_showcase(s3_client, bucket, showcase, rendered, assets, transfer_config,
+                     cache_control, prune=False, dry_run=False):
+    """Upload only the files whose content hash differs from the stored manifest."""
+    prefix = f"public/{showcase['username']}/"
+    previous = fetch_manifest(s3_client, bucket, prefix)
+
+    manifest = {}
+    uploaded = []
+    bytes_uploaded = 0
+
+    for relative, data in rendered.items():
+        manifest[relative] = {'sha256': sha256_bytes(data), 'size': len(data)}
+    for relative, asset in assets.items():
+        manifest[relative] = {'sha256': asset['sha256'], 'size': asset['size']}
+
+    for relative, entry in manifest.items():
+        if previous.get(relative, {}).get('sha256') == entry['sha256']:
+            continue
+        uploaded.append(relative)
+        bytes_uploaded += entry['size']
+        if dry_run:
+            continue
+
+        content_type = MAIN_FILES[relative][1] if relative in MAIN_FILES else \
+            mimetypes.guess_type(relative)[0] or 'application/octet-stream'
+        extra_args = {'ContentType': content_type, 'CacheControl': cache_control}
+        if relative in rendered:
+            s3_client.upload_fileobj(io.BytesIO(rendered[relative]), bucket, prefix + relative,
+                                     ExtraArgs=extra_args, Config=transfer_config)
+        else:
+            # upload_file switches to a multipart upload above the transfer threshold
+            s3_client.upload_file(assets[relative]['path'], bucket, prefix + relative,
+                                  ExtraArgs=extra_args, Config=transfer_config)
+
+    removed = [relative for relative in previous if relative not in manifest] if prune else []
+    if not dry_run:
+        for relative in removed:
+            s3_client.delete_object(Bucket=bucket, Key=prefix + relative)
+
+        # The manifest is written last, so an interrupted publish is retried in full
+        if uploaded or removed:
+            s3_client.put_object(
+                Bucket=bucket,
+                Key=f"{prefix}{MANIFEST_NAME}",
+                Body=json.dumps({'files': manifest}, indent=2).encode('utf-8'),
+                ContentType='application/json',
+                CacheControl='no-cache'
+            )
+
+    return {
+        'showcaseId': showcase['id'],
+        'username': showcase['username'],
+        'uploaded': uploaded,
+        'removed': removed,
+        'unchanged': len(manifest) - len(uploaded),
+        'bytesUploaded': bytes_uploaded
+    }
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Render and publish showcases, uploading only changed files.")
+    parser.add_argument('--template-dir',
+                        help="Local template directory (index.html, style.css, script.js, assets/) used for every showcase")
+    parser.add_argument('--template-id', help="Only publish showcases that use this template")
+    parser.add_argument('--all', action='store_true', help="Include showcases that are not published")
+    parser.add_argument('--prune', action='store_true', help="Delete files that are no longer part of a showcase")
+    parser.add_argument('--dry-run', action='store_true', help="Report what would be uploaded without uploading")
+    parser.add_argument('--workers', type=int, default=16, help="Showcases published concurrently (default: 16)")
+    parser.add_argument('--multipart-threshold-mb', type=int, default=8,
+                        help="Asset size above which multipart uploads are used (default: 8)")
+    parser.add_argument('--cache-control', default='public, max-age=300',
+                        help="Cache-Control header for uploaded files (default: 'public, max-age=300')")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    try:
+        import jinja2
+    except ImportError:
+        raise SystemExit("Rendering templates requires Jinja2: pip install jinja2")
+    environment = jinja2.Environment(autoescape=jinja2.select_autoescape(['html']))
+
+    # Load Amplify outputs
+    amplify_outputs = load_amplify_outputs()
+    client = GraphQLClient(*get_graphql_settings(amplify_outputs))
+    bucket = get_bucket_name(amplify_outputs, 'showcase-bucket')
+    s3_client = get_client('s3', amplify_outputs['storage']['aws_region'])
+
+    phase('load inputs')
+    local_sources, local_assets = load_template_dir(args.template_dir) if args.template_dir else (None, {})
+    templates = {} if args.template_dir else load_templates(client)
+
+    phase('fetch tables')
+    print("Fetching showcases...")
+    try:
+        showcases = [
+            showcase for showcase in client.iter_items('Showcase', SHOWCASE_FIELDS)
+            if showcase.get('username')
+            and (args.all or is_published(showcase))
+            and (not args.template_id or showcase.get('templateId') == args.template_id)
+        ]
+    except GraphQLError as e:
+        print(f"Error fetching showcases: {e}")
+        return
+    finally:
+        client.close()
+    print(f"Publishing {len(showcases)} showcases")
+
+    phase('process loop')
+    from boto3.s3.transfer import TransferConfig
+    transfer_config = TransferConfig(
+        multipart_threshold=args.multipart_threshold_mb * 1024 * 1024,
+        max_concurrency=4
+    )
+
+    def publish(showcase):
+        sources = local_sources or templates.get(showcase.get('templateId'))
+        if not sources:
+            raise ValueError(f"No template found for showcase {showcase['id']}")
+        rendered = render_files(environment, sources, showcase)
+        return publish_showcase(s3_client, bucket, showcase, rendered, local_assets, transfer_config,
+                                args.cache_control, args.prune, args.dry_run)
+
+    results = []
+    failures = []
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(publish, showcase): showcase for showcase in showcases}
+        for future in as_completed(futures):
+            showcase = futures[future]
+            try:
+                result = future.result()
+                results.append(result)
+                if result['uploaded'] or result['removed']:
+                    print(f"Published {showcase['username']}: {len(result['uploaded'])} uploaded, "
+                          f"{len(result['removed'])} removed")
+            except Exception as e:
+                print(f"Error publishing showcase for {showcase['username']}: {e}")
+                failures.append({'showcaseId': showcase['id'], 'username': showcase['username'], 'error': str(e)})
+
+    phase('write results')
+    # Print summary
+    print("\nPublish completed!" if not args.dry_run else "\nDry run completed!")
+    print(f"Showcases processed: {len(results)}")
+    print(f"Showcases changed: {sum(1 for r in results if r['uploaded'] or r['removed'])}")
+    print(f"Files uploaded: {sum(len(r['uploaded']) for r in results)}")
+    print(f"Bytes uploaded: {sum(r['bytesUploaded'] for r in results)}")
+    print(f"Showcases failed: {len(failures)}")
+
+    # Save results to a file
+    results_file_path = get_results_path('publish_results.json')
+    with open(results_file_path, 'w') as f:
+        json.dump({
+            'dry_run': args.dry_run,
+            'published': results,
+            'failed': failures
+        }, f, indent=2)
+
+    print(f"Results saved to {results_file_path}")
+
+if __name__ == '__main__':
+    run(main)
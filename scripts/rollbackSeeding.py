@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import threading
+
+from common.amplify import load_amplify_outputs, get_graphql_settings, get_results_path
+from common.audit import ACTION_CREATE, ACTION_DELETE, ACTION_UPDATE, RESOURCE_TYPES, open_audit_sink
+from common.aws import get_client
+from common.concurrency import chunked, run_concurrently
+from common.graphql import GraphQLClient, GraphQLError, is_conditional_check_failure
+from common.linked_profiles import LinkedProfiles
+from common.profiling import phase, run
+
+# Stages run in this order so nothing is left pointing at a deleted row:
+# submissions and user links reference student profiles, and database
+# users mirror Cognito users, so removing Cognito users also removes them.
+STAGES = ('submissions', 'links', 'profiles', 'users', 'cognito')
+
+# Scripts whose AuditLog entries describe a seeding run
+SEEDING_ACTORS = ('createSubmissions', 'createStudentProfiles', 'syncCognitoUsersToDatabase')
+
+AUDIT_FIELDS = ['actionType', 'resourceType', 'resourceId', 'timestamp']
+USER_FIELDS = ['id', 'linkedProfiles', 'updatedAt']
+JOURNAL_FILE = 'rollback_journal.jsonl'
+
+def read_results(file_name, default):
+    path = get_results_path(file_name)
+    if not os.path.exists(path):
+        print(f"No {file_name} found, skipping it")
+        return default
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def unique(ids):
+    return list(dict.fromkeys(item_id for item_id in ids if item_id))
+
+def cognito_users_from_credentials():
+    return unique(entry.get('email') for entry in read_results('user_credentials.json', []))
+
+def plan_from_results():
+    """Return the ids to roll back per stage, read from the seeding scripts' results files."""
+    submissions = read_results('submissions_results.json', {})
+    profiles = read_results('student_profiles_results.json', {})
+    users = read_results('sync_results.json', {})
+
+    # Only links to the profiles the run created are removed: a profile that
+    # already existed may have been linked before the run
+    created_profiles = unique(entry['studentProfileId'] for entry in profiles.get('created_profiles', []))
+    return {
+        'submissions': unique(entry['id'] for entry in submissions.get('created_submissions', [])),
+        'links': created_profiles,
+        'profiles': created_profiles,
+        'users': unique(entry['id'] for entry in users.get('created_users', [])),
+        'cognito': cognito_users_from_credentials()
+    }
+
+def plan_from_audit_log(client, since, until):
+    """Return the ids to roll back per stage from the AuditLog entries of the seeding scripts.
+
+    createCognitoUsers.py does not write the AuditLog, so Cognito users
+    still come from user_credentials.json. As with the results files, only
+    links to the profiles created in the window are removed.
+    """
+    plan = {stage: [] for stage in STAGES}
+    time_filter = {'timestamp': {'between': [since, until]}} if until else {'timestamp': {'ge': since}}
+    for actor in SEEDING_ACTORS:
+        for entry in client.iter_index('AuditLog', 'cognitoUserId', actor, AUDIT_FIELDS, filter=time_filter):
+            action, resource = entry['actionType'], entry['resourceType']
+            if action == ACTION_CREATE and resource == RESOURCE_TYPES['Submission']:
+                plan['submissions'].append(entry.get('resourceId'))
+            elif action == ACTION_CREATE and resource == RESOURCE_TYPES['StudentProfile']:
+                plan['profiles'].append(entry.get('resourceId'))
+                plan['links'].append(entry.get('resourceId'))
+            elif action == ACTION_CREATE and resource == RESOURCE_TYPES['User']:
+                plan['users'].append(entry.get('resourceId'))
+
+    plan = {stage: unique(ids) for stage, ids in plan.items()}
+    plan['cognito'] = cognito_users_from_credentials()
+    return plan
+
+class Journal:
+    """Append-only file of the ids each stage has finished, so a rerun resumes where the last one stopped."""
+
+    def __init__(self, path, fresh=False):
+        self.path = path
+        self._done = {stage: set() for stage in STAGES}
+        self._lock = threading.Lock()
+        if fresh and os.path.exists(path):
+            os.remove(path)
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # A partially written last line from a crash
+                    self._done.setdefault(entry['stage'], set()).add(entry['id'])
+
+    def pending(self, stage, ids):
+        return [item_id for item_id in ids if item_id not in self._done[stage]]
+
+    def record(self, stage, ids):
+        with self._lock:
+            with open(self.path, 'a') as f:
+                for item_id in ids:
+                    f.write(json.dumps({'stage': stage, 'id': item_id}) + '\n')
+            self._done[stage].update(ids)
+
+def new_report(planned, pending):
+    return {'planned': planned, 'alreadyDone': planned - pending, 'done': 0, 'missing': 0,
+            'conflicts': [], 'failures': []}
+
+def delete_rows(client, model, stage, ids, journal, audit, args):
+    """Delete rows with batched aliased mutations, journaling each batch as it completes."""
+    pending = journal.pending(stage, ids)
+    report = new_report(len(ids), len(pending))
+    ids = pending
+    if args.dry_run or not ids:
+        return report, ids
+
+    def send(batch):
+        finished = []
+        outcomes = []
+        for item_id, (item, error) in zip(batch, client.delete_items(model, batch)):
+            if item is not None or is_conditional_check_failure(error):
+                # An id that is already gone fails the delete condition; nothing left to do
+                finished.append(item_id)
+                outcomes.append((item_id, 'done' if item is not None else 'missing', None))
+                if item is not None:
+                    audit.record(ACTION_DELETE, model, item_id, {"rollback": True})
+            else:
+                outcomes.append((item_id, 'failed', error.get('message')))
+        journal.record(stage, finished)
+        return outcomes
+
+    results, failed = run_concurrently(send, chunked(ids, args.batch_size), max_workers=args.workers,
+                                       batch_size=args.workers * 2, rate=args.rate)
+    for outcomes in results:
+        for item_id, outcome, error in outcomes:
+            if outcome == 'failed':
+                report['failures'].append({'id': item_id, 'error': error})
+            else:
+                report[outcome] += 1
+    for batch, e in failed:
+        report['failures'].extend({'id': item_id, 'error': str(e)} for item_id in batch)
+    return report, ids
+
+def unlink_profiles(client, profile_ids, audit, args):
+    """Remove links to the rolled-back profiles from every User, conditioned on updatedAt.
+
+    Needs no journal: users that were already updated no longer hold the
+    links, so a rerun only finds the ones still left.
+    """
+    targets = set(profile_ids)
+    updates = []
+    for user in client.iter_items('User', USER_FIELDS):
+        links = LinkedProfiles.decode(user.get('linkedProfiles'))
+        removed = [link['id'] for link in links if link['id'] in targets]
+        if not removed:
+            continue
+        for profile_id in removed:
+            links.discard(profile_id)
+        condition = {"updatedAt": {"eq": user['updatedAt']}} if user.get('updatedAt') else None
+        updates.append(({"id": user['id'], "linkedProfiles": links.encode()}, condition, removed))
+
+    report = new_report(len(updates), len(updates))
+    if args.dry_run or not updates:
+        return report, updates
+
+    def send(batch):
+        return batch, client.update_items('User', [(input, condition) for input, condition, _ in batch])
+
+    results, failed = run_concurrently(send, chunked(updates, args.batch_size), max_workers=args.workers,
+                                       batch_size=args.workers * 2, rate=args.rate)
+    for batch, outcomes in results:
+        for (input, _, removed), (item, error) in zip(batch, outcomes):
+            if item is not None:
+                report['done'] += 1
+                audit.record(ACTION_UPDATE, 'User', input['id'], {"rollback": True, "unlinkedProfiles": removed})
+            elif is_conditional_check_failure(error):
+                report['conflicts'].append(input['id'])
+            else:
+                report['failures'].append({'id': input['id'], 'error': error.get('message')})
+    for batch, e in failed:
+        report['failures'].extend({'id': input['id'], 'error': str(e)} for input, _, _ in batch)
+    return report, updates
+
+def delete_cognito_users(cognito_client, user_pool_id, emails, journal, audit, args):
+    """Delete Cognito users with AdminDeleteUser from a thread pool, limited to --cognito-rate."""
+    from botocore.exceptions import ClientError
+
+    pending = journal.pending('cognito', emails)
+    report = new_report(len(emails), len(pending))
+    emails = pending
+    if args.dry_run or not emails:
+        return report, emails
+
+    def delete(email):
+        try:
+            cognito_client.admin_delete_user(UserPoolId=user_pool_id, Username=email)
+            outcome = 'done'
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'UserNotFoundException':
+                raise
+            outcome = 'missing'
+        journal.record('cognito', [email])
+        if outcome == 'done':
+            audit.record(ACTION_DELETE, 'User', email, {"rollback": True, "cognito": True})
+        return outcome
+
+    results, failed = run_concurrently(delete, emails, max_workers=args.workers, rate=args.cognito_rate)
+    for outcome in results:
+        report[outcome] += 1
+    report['failures'] = [{'id': email, 'error': str(e)} for email, e in failed]
+    return report, emails
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Undo a seeding run: delete the Submissions, StudentProfiles, User links and Cognito users it created.")
+    parser.add_argument('--source', choices=['results', 'audit-log'], default='results',
+                        help="Read created ids from the scripts' results files or from their AuditLog entries "
+                             "(default: results)")
+    parser.add_argument('--since', help="With --source audit-log: first timestamp of the run (ISO 8601)")
+    parser.add_argument('--until', help="With --source audit-log: last timestamp of the run (default: now)")
+    parser.add_argument('--stages', default=','.join(STAGES),
+                        help=f"Comma-separated stages to run, always in dependency order; cognito implies users "
+                             f"(default: {','.join(STAGES)})")
+    parser.add_argument('--dry-run', action='store_true', help="Report what would be removed without changing anything")
+    parser.add_argument('--fresh', action='store_true', help="Ignore the journal of an earlier rollback run")
+    parser.add_argument('--batch-size', type=int, default=10, help="Mutations per GraphQL request (default: 10)")
+    parser.add_argument('--workers', type=int, default=8, help="Concurrent requests (default: 8)")
+    parser.add_argument('--rate', type=float, default=10.0, help="Maximum GraphQL requests per second (default: 10)")
+    parser.add_argument('--cognito-rate', type=float, default=10.0,
+                        help="Maximum AdminDeleteUser calls per second (default: 10)")
+    args = parser.parse_args()
+
+    stages = args.stages.split(',')
+    if 'cognito' in stages and 'users' not in stages:
+        print("Also running the users stage: the database Users mirror the Cognito users being removed")
+        stages.append('users')
+    args.stages = [stage for stage in STAGES if stage in stages]
+    if args.source == 'audit-log' and not args.since:
+        parser.error("--source audit-log requires --since")
+    return args
+
+def main():
+    args = parse_args()
+
+    # Load Amplify outputs
+    amplify_outputs = load_amplify_outputs()
+    client = GraphQLClient(*get_graphql_settings(amplify_outputs))
+
+    phase('load inputs')
+    try:
+        plan = plan_from_results() if args.source == 'results' else plan_from_audit_log(client, args.since, args.until)
+    except GraphQLError as e:
+        print(f"Error reading the AuditLog: {e}")
+        client.close()
+        return
+    for stage in args.stages:
+        print(f"{stage}: {len(plan[stage])} to roll back")
+
+    journal = Journal(get_results_path(JOURNAL_FILE), fresh=args.fresh)
+    audit = None if args.dry_run else open_audit_sink(client, 'rollbackSeeding',
+                                                      get_results_path('audit_spool_rollbackSeeding.jsonl'))
+
+    phase('process loop')
+    reports = {}
+    stopped_at = None
+    try:
+        for stage in args.stages:
+            print(f"\n{'Checking' if args.dry_run else 'Rolling back'} {stage}...")
+            if stage == 'submissions':
+                report, pending = delete_rows(client, 'Submission', stage, plan[stage], journal, audit, args)
+            elif stage == 'links':
+                report, pending = unlink_profiles(client, plan[stage], audit, args)
+            elif stage == 'profiles':
+                report, pending = delete_rows(client, 'StudentProfile', stage, plan[stage], journal, audit, args)
+            elif stage == 'users':
+                report, pending = delete_rows(client, 'User', stage, plan[stage], journal, audit, args)
+            else:
+                cognito_client = get_client('cognito-idp', amplify_outputs['auth']['aws_region'])
+                report, pending = delete_cognito_users(cognito_client, amplify_outputs['auth']['user_pool_id'],
+                                                       plan[stage], journal, audit, args)
+            reports[stage] = report
+
+            # The links stage counts users to update, the others rows or users to delete
+            verb = 'updated' if stage == 'links' else 'removed'
+            if args.dry_run:
+                print(f"{stage}: {len(pending)} would be {verb}, {report['alreadyDone']} already done")
+                continue
+            print(f"{stage}: {report['done']} {verb}, {report['missing']} already gone, "
+                  f"{report['alreadyDone']} done in an earlier run, {len(report['conflicts'])} conflicts, "
+                  f"{len(report['failures'])} failures")
+
+            # Later stages depend on this one, so stop rather than leave dangling references
+            if report['conflicts'] or report['failures']:
+                stopped_at = stage
+                print(f"Stopping after {stage}; rerun to retry what is left, finished work is skipped")
+                break
+    except GraphQLError as e:
+        stopped_at = stage
+        print(f"Error during {stage}: {e}")
+    finally:
+        if audit is not None:
+            audit.close()
+        client.close()
+
+    phase('write results')
+    print("\nRollback completed!" if not args.dry_run and not stopped_at else
+          "\nDry run completed!" if args.dry_run else f"\nRollback stopped at {stopped_at}")
+    for line in client.metrics.summary_lines():
+        print(line)
+
+    # Save results to a file
+    results_file_path = get_results_path('rollback_results.json')
+    with open(results_file_path, 'w') as f:
+        json.dump({
+            'dry_run': args.dry_run,
+            'source': args.source,
+            'stages': reports,
+            'stopped_at': stopped_at,
+            'request_metrics': client.metrics.snapshot()
+        }, f, indent=2)
+
+    print(f"Results saved to {results_file_path}")
+
+if __name__ == '__main__':
+    run(main)
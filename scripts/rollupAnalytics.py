@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+from collections import Counter
+from datetime import date, timedelta
+
+from common.amplify import load_amplify_outputs, get_graphql_settings, get_results_path
+from common.concurrency import run_concurrently
+from common.graphql import GraphQLClient, GraphQLError
+from common.profiling import phase, run
+
+ANALYTICS_FIELDS = ['id', 'showcaseId', 'date', 'views', 'projectViews', 'referrers', 'locations', 'devices']
+ROLLUP_FIELDS = ['id', 'scope', 'scopeId', 'period', 'periodStart', 'views', 'projectViews',
+                 'referrers', 'locations', 'devices', 'sourceRows']
+
+# JSON array fields of Analytics: (identity fields, count field)
+DIMENSIONS = {
+    'projectViews': (('projectId',), 'views'),
+    'referrers': (('source',), 'count'),
+    'locations': (('country', 'region', 'city'), 'count'),
+    'devices': (('type',), 'count')
+}
+
+STATE_FILE = 'analytics_rollup_state.json'
+
+def parse_json(value):
+    """Decode an AWSJSON value, which the API returns as a JSON string."""
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError:
+            return None
+    return value
+
+def parse_json_array(value):
+    """Decode an a.json().array() value into a list of dicts."""
+    value = parse_json(value) or []
+    if isinstance(value, dict):
+        value = [value]
+    return [entry for entry in (parse_json(v) for v in value) if isinstance(entry, dict)]
+
+class Aggregate:
+    """Mergeable counters for one showcase or cohort over one period."""
+
+    def __init__(self):
+        self.views = Counter()
+        self.dimensions = {name: Counter() for name in DIMENSIONS}
+        self.project_titles = {}
+        self.source_rows = 0
+
+    def add_row(self, row):
+        """Merge one Analytics row into the counters."""
+        views = parse_json(row.get('views')) or {}
+        if isinstance(views, dict):
+            for key in ('total', 'unique'):
+                self.views[key] += views.get(key) or 0
+
+        for name, (identity, count_field) in DIMENSIONS.items():
+            for entry in parse_json_array(row.get(name)):
+                key = tuple(entry.get(field) for field in identity)
+                self.dimensions[name][key] += entry.get(count_field) or 0
+                if name == 'projectViews' and entry.get('projectTitle'):
+                    self.project_titles[key[0]] = entry['projectTitle']
+
+        self.source_rows += 1
+
+    def merge(self, other, sign=1):
+        """Add (or, with sign=-1, subtract) another aggregate into this one."""
+        for key, value in other.views.items():
+            self.views[key] += sign * value
+        for name, counter in other.dimensions.items():
+            for key, value in counter.items():
+                self.dimensions[name][key] += sign * value
+        self.project_titles.update(other.project_titles)
+        self.source_rows += sign * other.source_rows
+
+    def is_empty(self):
+        return not any(self.views.values()) and not self.source_rows and \
+            not any(any(c.values()) for c in self.dimensions.values())
+
+    def to_input(self):
+        """Return the AnalyticsRollup fields, with percentages recomputed."""
+        result = {
+            'views': json.dumps({key: self.views.get(key, 0) for key in ('total', 'unique')}),
+            'sourceRows': self.source_rows
+        }
+        for name, (identity, count_field) in DIMENSIONS.items():
+            counter = self.dimensions[name]
+            total = sum(v for v in counter.values() if v > 0)
+            entries = []
+            for key, count in counter.most_common():
+                if count <= 0:
+                    continue
+                entry = {field: value for field, value in zip(identity, key) if value is not None}
+                entry[count_field] = count
+                entry['percentage'] = round(100.0 * count / total, 1) if total else 0
+                if name == 'projectViews' and key[0] in self.project_titles:
+                    entry['projectTitle'] = self.project_titles[key[0]]
+                entries.append(json.dumps(entry))
+            result[name] = entries
+        return result
+
+    @classmethod
+    def from_record(cls, record):
+        """Rebuild an aggregate from a stored AnalyticsRollup record."""
+        aggregate = cls()
+        if record:
+            aggregate.add_row(record)
+            aggregate.source_rows = record.get('sourceRows') or 0
+        return aggregate
+
+def rollup_id(scope, scope_id, period, period_start):
+    """Deterministic AnalyticsRollup ID, so reruns update rather than duplicate."""
+    return f"{scope}#{scope_id}#{period}#{period_start or 'all'}"
+
+def week_start(day):
+    """Return the Monday of the ISO week containing a 'YYYY-MM-DD' date."""
+    d = date.fromisoformat(day)
+    return (d - timedelta(days=d.weekday())).isoformat()
+
+def rollup_targets(scope, scope_id, day):
+    """Return the (scope, scopeId, period, periodStart) keys a daily row feeds."""
+    return [
+        (scope, scope_id, 'day', day),
+        (scope, scope_id, 'week', week_start(day)),
+        (scope, scope_id, 'total', None)
+    ]
+
+def daterange(start, end):
+    d = date.fromisoformat(start)
+    while d <= date.fromisoformat(end):
+        yield d.isoformat()
+        d += timedelta(days=1)
+
+def stream_analytics(client, since, until):
+    """Yield Analytics rows, through the date index when a start date is known."""
+    if since is None:
+        yield from client.iter_items('Analytics', ANALYTICS_FIELDS)
+        return
+    for day in daterange(since, until):
+        yield from client.iter_index('Analytics', 'date', day, ANALYTICS_FIELDS, value_type='AWSDate')
+
+def load_showcase_cohorts(client):
+    """Map showcase IDs to cohort IDs through their student profiles."""
+    profile_cohorts = {
+        profile['id']: profile['cohortId']
+        for profile in client.iter_items('StudentProfile', ['id', 'cohortId'])
+        if profile.get('cohortId')
+    }
+    return {
+        showcase['id']: profile_cohorts[showcase['studentProfileId']]
+        for showcase in client.iter_items('Showcase', ['id', 'studentProfileId'])
+        if showcase.get('studentProfileId') in profile_cohorts
+    }
+
+def fetch_rollups(client, keys, workers):
+    """Fetch existing AnalyticsRollup records for the given keys concurrently."""
+    def fetch(key):
+        return key, client.get_item('AnalyticsRollup', rollup_id(*key), ROLLUP_FIELDS)
+
+    results, failures = run_concurrently(fetch, list(keys), max_workers=workers)
+    if failures:
+        raise GraphQLError(f"Failed to read {len(failures)} rollups: {failures[0][1]}")
+    return dict(results)
+
+def compute_deltas(daily, showcase_cohorts, previous_daily):
+    """Return the change each rollup target must absorb.
+
+    `daily` holds freshly merged aggregates per (showcaseId, date) and
+    `previous_daily` the daily rollups stored by an earlier run, so days that
+    are re-processed only contribute their difference to weeks and totals.
+    """
+    deltas = {}
+    for (showcase_id, day), aggregate in daily.items():
+        delta = Aggregate()
+        delta.merge(aggregate)
+        delta.merge(Aggregate.from_record(previous_daily.get(('showcase', showcase_id, 'day', day))), sign=-1)
+        if delta.is_empty():
+            continue
+
+        targets = rollup_targets('showcase', showcase_id, day)
+        cohort_id = showcase_cohorts.get(showcase_id)
+        if cohort_id:
+            targets += rollup_targets('cohort', cohort_id, day)
+        for target in targets:
+            deltas.setdefault(target, Aggregate()).merge(delta)
+    return deltas
+
+def write_rollup(client, key, aggregate, exists):
+    scope, scope_id, period, period_start = key
+    item = dict(aggregate.to_input(), id=rollup_id(*key))
+    if exists:
+        return client.update_item('AnalyticsRollup', item)
+    item.update(scope=scope, scopeId=scope_id, period=period)
+    if period_start:
+        item['periodStart'] = period_start
+    return client.create_item('AnalyticsRollup', item)
+
+def load_state():
+    path = get_results_path(STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def save_state(state):
+    with open(get_results_path(STATE_FILE), 'w') as f:
+        json.dump(state, f, indent=2)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Pre-aggregate Analytics rows into daily, weekly and total rollups.")
+    parser.add_argument('--since', help="First date to process (default: the stored high-water mark)")
+    parser.add_argument('--until', help="Last date to process (default: today)")
+    parser.add_argument('--rebuild', action='store_true',
+                        help="Recompute every rollup from all Analytics rows, overwriting stored rollups")
+    parser.add_argument('--workers', type=int, default=8, help="Concurrent reads and writes (default: 8)")
+    parser.add_argument('--rate', type=float, default=20.0, help="Maximum writes per second (default: 20)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    # Load Amplify outputs
+    amplify_outputs = load_amplify_outputs()
+    client = GraphQLClient(*get_graphql_settings(amplify_outputs))
+
+    # A rebuild always starts from the first Analytics row
+    state = {} if args.rebuild else load_state()
+    since = None if args.rebuild else (args.since or state.get('watermark'))
+    until = args.until or date.today().isoformat()
+    print(f"Processing Analytics rows from {since or 'the beginning'} to {until}")
+
+    phase('fetch tables')
+    # Merge raw rows into one aggregate per showcase and day
+    daily = {}
+    row_count = 0
+    max_date = since
+    for row in stream_analytics(client, since, until):
+        if not row.get('showcaseId') or not row.get('date'):
+            continue
+        daily.setdefault((row['showcaseId'], row['date']), Aggregate()).add_row(row)
+        row_count += 1
+        if max_date is None or row['date'] > max_date:
+            max_date = row['date']
+    print(f"Merged {row_count} Analytics rows into {len(daily)} showcase-days")
+
+    showcase_cohorts = load_showcase_cohorts(client)
+    print(f"Resolved cohorts for {len(showcase_cohorts)} showcases")
+
+    # Read back what earlier runs stored, then compute and apply the deltas
+    if args.rebuild:
+        previous_daily = {}
+    else:
+        previous_daily = fetch_rollups(
+            client, [('showcase', showcase_id, 'day', day) for showcase_id, day in daily], args.workers
+        )
+    phase('process loop')
+    deltas = compute_deltas(daily, showcase_cohorts, previous_daily)
+
+    existing = dict(previous_daily)
+    existing.update(fetch_rollups(client, [key for key in deltas if key not in existing], args.workers))
+
+    def apply(key):
+        # A rebuild overwrites stored rollups instead of adding to them
+        aggregate = Aggregate() if args.rebuild else Aggregate.from_record(existing.get(key))
+        aggregate.merge(deltas[key])
+        return write_rollup(client, key, aggregate, existing.get(key) is not None)
+
+    phase('write results')
+    print(f"Writing {len(deltas)} rollups...")
+    _, failures = run_concurrently(apply, list(deltas), max_workers=args.workers, rate=args.rate)
+    client.close()
+
+    # Print summary
+    print("\nRollup completed!")
+    print(f"Rollups written: {len(deltas) - len(failures)}")
+    print(f"Rollups failed: {len(failures)}")
+
+    # Only advance the high-water mark when every rollup was written; the last
+    # day is re-processed next time since it may still be receiving views
+    if failures:
+        print("Watermark not advanced - rerun with --rebuild to restore consistent weekly and total rollups")
+        for key, e in failures[:10]:
+            print(f"Error writing rollup {rollup_id(*key)}: {e}")
+    elif max_date:
+        state['watermark'] = max_date
+        save_state(state)
+        print(f"Watermark advanced to {max_date}")
+
+if __name__ == '__main__':
+    run(main)
@@ -1,15 +1,20 @@
 import json
-import boto3
-from botocore.exceptions import ClientError
+
+from common.aws import get_resource
+from common.profiling import phase, run
 
 def upload_students_to_dynamodb(json_file_path, table_name, region_name='us-east-1'):
     """Read an array of student JSON objects and insert them into DynamoDB."""
-    dynamodb = boto3.resource('dynamodb', region_name=region_name)
+    from botocore.exceptions import ClientError
+
+    dynamodb = get_resource('dynamodb', region_name)
     table = dynamodb.Table(table_name)
 
+    phase('load inputs')
     with open(json_file_path, 'r') as json_file:
         students = json.load(json_file)  # Assumes the file contains a JSON array
 
+    phase('process loop')
     for student in students:
         try:
             table.put_item(Item=student)
@@ -25,4 +30,4 @@ def main():
     upload_students_to_dynamodb(JSON_FILE_PATH, TABLE_NAME, AWS_REGION)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    run(main)
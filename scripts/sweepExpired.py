@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+from common.amplify import load_amplify_outputs, get_results_path
+from common.concurrency import RateLimiter, chunked, run_concurrently
+from common.dynamodb import get_dynamodb_client, resolve_table_names, parallel_scan, batch_delete
+from common.profiling import phase, run
+
+# Scan filters selecting rows that can be reclaimed. Amplify stores
+# AWSDateTime values as ISO 8601 UTC strings, which compare lexicographically.
+SWEEPS = {
+    'Session': {
+        'filter': '#expiresAt < :cutoff OR #isActive = :false',
+        'names': {'#expiresAt': 'expiresAt', '#isActive': 'isActive'},
+        'values': lambda cutoff: {':cutoff': {'S': cutoff}, ':false': {'BOOL': False}},
+        'projection': 'id, #expiresAt, #isActive'
+    },
+    'Delegation': {
+        'filter': '#expiresAt < :cutoff OR attribute_type(#revokedAt, :string)',
+        'names': {'#expiresAt': 'expiresAt', '#revokedAt': 'revokedAt'},
+        'values': lambda cutoff: {':cutoff': {'S': cutoff}, ':string': {'S': 'S'}},
+        'projection': 'id, #expiresAt, #revokedAt'
+    }
+}
+
+def iso_timestamp(moment):
+    return moment.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.') + f"{moment.microsecond // 1000:03d}Z"
+
+def mark_item(dynamodb_client, table_name, model, item, now):
+    """Deactivate an expired session or revoke an expired delegation in place.
+
+    updatedAt is set as well, like an update through the API, so writers
+    conditioned on updatedAt see the change.
+    """
+    if model == 'Session':
+        if item.get('isActive') is False:
+            return False
+        update = 'SET #field = :value, #updatedAt = :now'
+        names = {'#field': 'isActive', '#updatedAt': 'updatedAt'}
+        values = {':value': {'BOOL': False}, ':now': {'S': now}}
+    else:
+        if item.get('revokedAt'):
+            return False
+        update = 'SET #field = :now, #revokedBy = :by, #updatedAt = :now'
+        names = {'#field': 'revokedAt', '#revokedBy': 'revokedBy', '#updatedAt': 'updatedAt'}
+        values = {':now': {'S': now}, ':by': {'S': 'sweepExpired'}}
+
+    dynamodb_client.update_item(
+        TableName=table_name,
+        Key={'id': {'S': item['id']}},
+        UpdateExpression=update,
+        ConditionExpression='attribute_exists(id)',
+        ExpressionAttributeNames=names,
+        ExpressionAttributeValues=values
+    )
+    return True
+
+def sweep_table(dynamodb_client, model, table_name, cutoff, now, mark_only=False, dry_run=False,
+                segments=4, workers=4, rate=None):
+    """Find reclaimable rows with a parallel Scan and delete or mark them in batches.
+
+    `rate` limits BatchWriteItem calls (or single updates when marking) per second.
+    """
+    sweep = SWEEPS[model]
+    limiter = RateLimiter(rate)
+    started = time.monotonic()
+    matched = 0
+    reclaimed = 0
+    failures = []
+
+    def delete_batch(ids):
+        limiter.wait()
+        return batch_delete(dynamodb_client, table_name, ids)
+
+    def mark(item):
+        limiter.wait()
+        return mark_item(dynamodb_client, table_name, model, item, now)
+
+    pages = parallel_scan(
+        dynamodb_client, table_name, total_segments=segments,
+        FilterExpression=sweep['filter'],
+        ExpressionAttributeNames=sweep['names'],
+        ExpressionAttributeValues=sweep['values'](cutoff),
+        ProjectionExpression=sweep['projection']
+    )
+    for _, items in pages:
+        matched += len(items)
+        if dry_run or not items:
+            continue
+        if mark_only:
+            results, failed = run_concurrently(mark, items, max_workers=workers)
+            reclaimed += sum(1 for marked in results if marked)
+            failures.extend({'id': item['id'], 'error': str(e)} for item, e in failed)
+        else:
+            results, failed = run_concurrently(
+                delete_batch, list(chunked((item['id'] for item in items), 25)), max_workers=workers
+            )
+            reclaimed += sum(results)
+            failures.extend({'ids': ids, 'error': str(e)} for ids, e in failed)
+
+    elapsed = time.monotonic() - started
+    return {
+        'model': model,
+        'table': table_name,
+        'matched': matched,
+        'reclaimed': reclaimed,
+        'action': 'none' if dry_run else ('mark' if mark_only else 'delete'),
+        'seconds': round(elapsed, 3),
+        'rowsPerSecond': round(reclaimed / elapsed, 1) if elapsed else None,
+        'failures': failures
+    }
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Delete or deactivate expired Sessions and Delegations.")
+    parser.add_argument('--models', default='Session,Delegation', help="Models to sweep (default: Session,Delegation)")
+    parser.add_argument('--grace-hours', type=float, default=24.0,
+                        help="Keep rows that expired less than this many hours ago (default: 24)")
+    parser.add_argument('--mark-only', action='store_true',
+                        help="Set isActive=false / revokedAt instead of deleting")
+    parser.add_argument('--dry-run', action='store_true', help="Only count matching rows")
+    parser.add_argument('--segments', type=int, default=4, help="Parallel Scan segments (default: 4)")
+    parser.add_argument('--workers', type=int, default=4, help="Concurrent batch writes (default: 4)")
+    parser.add_argument('--rate', type=float, default=10.0,
+                        help="Maximum batch writes per second (default: 10)")
+    parser.add_argument('--table-suffix', help="Table name suffix '<apiId>-<env>' when it cannot be discovered")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    models = args.models.split(',')
+
+    # Load Amplify outputs
+    amplify_outputs = load_amplify_outputs()
+    dynamodb_client = get_dynamodb_client(amplify_outputs)
+    tables = resolve_table_names(amplify_outputs, dynamodb_client, models, args.table_suffix)
+
+    now = datetime.now(timezone.utc)
+    cutoff = iso_timestamp(now - timedelta(hours=args.grace_hours))
+
+    phase('process loop')
+    results = []
+    for model in models:
+        print(f"Sweeping {model} rows expired before {cutoff}...")
+        result = sweep_table(dynamodb_client, model, tables[model], cutoff, iso_timestamp(now),
+                             args.mark_only, args.dry_run, args.segments, args.workers, args.rate)
+        print(f"{model}: {result['matched']} matched, {result['reclaimed']} reclaimed "
+              f"in {result['seconds']}s ({result['rowsPerSecond']} rows/s), "
+              f"{len(result['failures'])} failures")
+        results.append(result)
+
+    phase('write results')
+    # Save results to a file
+    results_file_path = get_results_path('sweep_results.json')
+    with open(results_file_path, 'w') as f:
+        json.dump({
+            'sweptAt': iso_timestamp(now),
+            'cutoff': cutoff,
+            'results': results
+        }, f, indent=2)
+
+    print(f"Results saved to {results_file_path}")
+
+if __name__ == '__main__':
+    run(main)
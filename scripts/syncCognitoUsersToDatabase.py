@@ -1,110 +1,121 @@
 #!/usr/bin/env python3
+import argparse
+import asyncio
+import contextlib
 import json
-import boto3
-import time
 import os
-import requests
-from botocore.exceptions import ClientError
 
-def load_amplify_outputs():
-    """Load the Amplify outputs from the JSON file."""
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    project_root = os.path.dirname(script_dir)
-    amplify_outputs_path = os.path.join(project_root, 'amplify_outputs.json')
+from common.aio import AsyncGraphQLClient, ThreadedClient, aws_client, gather_limited, paginate
+from common.amplify import load_amplify_outputs, get_results_path
+from common.aws import get_client
+from common.audit import ACTION_CREATE, open_audit_sink
+from common.graphql import GraphQLError, shared_client
+from common.resilience import CircuitOpenError
+from common.profiling import phase, run
+
+USER_FIELDS = ('id', 'cognitoId', 'email')
+
+async def get_cognito_users_async(cognito_client, user_pool_id):
+    """Get all users from the Cognito user pool.
     
-    with open(amplify_outputs_path, 'r') as f:
-        return json.load(f)
+    `cognito_client` is an aiobotocore client, or a boto3 client wrapped in ThreadedClient.
+    """
+    return [user async for user in paginate(cognito_client, 'list_users', 'Users', UserPoolId=user_pool_id)]
 
 def get_cognito_users(cognito_client, user_pool_id):
-    """Get all users from the Cognito user pool."""
-    users = []
-    pagination_token = None
-    
-    while True:
-        if pagination_token:
-            response = cognito_client.list_users(
-                UserPoolId=user_pool_id,
-                PaginationToken=pagination_token
-            )
-        else:
-            response = cognito_client.list_users(
-                UserPoolId=user_pool_id
-            )
-        
-        users.extend(response['Users'])
-        
-        # Check if there are more users to fetch
-        pagination_token = response.get('PaginationToken')
-        if not pagination_token:
-            break
-        
-        # Add a small delay to avoid throttling
-        time.sleep(0.1)
-    
-    return users
+    """Blocking get_cognito_users_async for a boto3 Cognito client."""
+    return asyncio.run(get_cognito_users_async(ThreadedClient(cognito_client), user_pool_id))
 
-def create_user_in_database(api_endpoint, api_key, user):
-    """Create a user entity in the database using GraphQL."""
-    # Extract user attributes
-    email = None
+def user_email(user):
+    """Return the email attribute of a Cognito user, or None."""
     for attr in user['Attributes']:
         if attr['Name'] == 'email':
-            email = attr['Value']
-            break
-    
+            return attr['Value']
+    return None
+
+def database_user_input(user):
+    """Return the CreateUserInput for a Cognito user, or None if it has no email."""
+    email = user_email(user)
     if not email:
         print(f"Skipping user {user['Username']} - no email found")
         return None
-    
-    # Prepare the GraphQL mutation
-    mutation = """
-    mutation CreateUser($input: CreateUserInput!) {
-        createUser(input: $input) {
-            id
-            cognitoId
-            email
-        }
-    }
-    """
-    
-    # Prepare the variables for the mutation
-    variables = {
-        "input": {
-            "cognitoId": user['Username'],
-            "email": email,
-            "roles": ["student"],
-            "status": "active"
-        }
+    return {
+        "cognitoId": user['Username'],
+        "email": email,
+        "roles": ["student"],
+        "status": "active"
     }
+
+async def create_user_in_database_async(graphql_client, user):
+    """Create a user entity in the database using GraphQL; return it, or None if skipped or failed.
     
-    # Make the GraphQL request
-    headers = {
-        'Content-Type': 'application/json',
-        'x-api-key': api_key
-    }
+    `graphql_client` is an AsyncGraphQLClient, or a GraphQLClient wrapped in ThreadedClient.
+    """
+    input = database_user_input(user)
+    if input is None:
+        return None
+    try:
+        result = await graphql_client.create_item('User', input, fields=USER_FIELDS)
+    except (GraphQLError, CircuitOpenError) as e:
+        print(f"Error creating user {input['email']}: {e}")
+        return None
+    print(f"Created user in database: {input['email']}")
+    return result
+
+def create_user_in_database(client, user):
+    """Blocking create_user_in_database_async for a GraphQLClient."""
+    return asyncio.run(create_user_in_database_async(ThreadedClient(client), user))
+
+async def sync_users_async(region, user_pool_id, client, audit, concurrency, rate, use_async=True):
+    """List the Cognito users and create them in the database concurrently on one event loop.
     
-    response = requests.post(
-        api_endpoint,
-        headers=headers,
-        json={
-            'query': mutation,
-            'variables': variables
-        }
-    )
+    With `use_async` the requests go through aiobotocore and an AsyncGraphQLClient sharing the
+    metrics of `client`, otherwise through boto3 and `client` itself on worker threads.
+    Returns (cognito user count, created users, skipped usernames).
+    """
+    created_users = []
+    skipped_users = []
     
-    if response.status_code == 200:
-        result = response.json()
-        if 'errors' in result:
-            print(f"Error creating user {email}: {result['errors']}")
-            return None
+    async with contextlib.AsyncExitStack() as stack:
+        if use_async:
+            cognito_client = await stack.enter_async_context(aws_client('cognito-idp', region))
+            graphql_client = await stack.enter_async_context(AsyncGraphQLClient(
+                client.api_endpoint, client.api_key, max_connections=concurrency, metrics=client.metrics))
         else:
-            print(f"Created user in database: {email}")
-            return result['data']['createUser']
-    else:
-        print(f"Error creating user {email}: {response.status_code} - {response.text}")
-        return None
+            cognito_client = ThreadedClient(get_client('cognito-idp', region))
+            graphql_client = ThreadedClient(client)
+        
+        print("Fetching users from Cognito...")
+        cognito_users = await get_cognito_users_async(cognito_client, user_pool_id)
+        print(f"Found {len(cognito_users)} users in Cognito")
+        
+        async def create(user):
+            result = await create_user_in_database_async(graphql_client, user)
+            if result:
+                created_users.append(result)
+                await audit.record_async(ACTION_CREATE, 'User', result['id'], {"cognitoId": result['cognitoId']})
+            else:
+                skipped_users.append(user['Username'])
+        
+        print("Creating users in the database...")
+        _, failures = await gather_limited(create, cognito_users, concurrency, rate)
+    
+    for user, e in failures:
+        print(f"Error creating user {user['Username']}: {e}")
+        skipped_users.append(user['Username'])
+    return len(cognito_users), created_users, skipped_users
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Create a database User for every Cognito user.")
+    parser.add_argument('--concurrency', type=int, default=100, help="Requests in flight (default: 100)")
+    parser.add_argument('--rate', type=float, default=25.0, help="Maximum createUser calls per second (default: 25)")
+    parser.add_argument('--sync', action='store_true',
+                        help="Create users one at a time with boto3 and requests instead of aiobotocore and httpx")
+    return parser.parse_args()
 
 def main():
+    args = parse_args()
+    
     # Load Amplify outputs
     amplify_outputs = load_amplify_outputs()
     user_pool_id = amplify_outputs['auth']['user_pool_id']
@@ -114,37 +125,40 @@ def main():
     api_endpoint = amplify_outputs['data']['url']
     api_key = amplify_outputs['data']['api_key']
     
-    # Initialize Cognito client
-    cognito_client = boto3.client('cognito-idp', region_name=region)
-    
-    # Get all users from Cognito
-    print("Fetching users from Cognito...")
-    cognito_users = get_cognito_users(cognito_client, user_pool_id)
-    print(f"Found {len(cognito_users)} users in Cognito")
-    
-    # Create users in the database
-    print("Creating users in the database...")
-    created_users = []
-    skipped_users = []
-    
-    for user in cognito_users:
-        # Check if user already exists in database (in a real implementation)
-        # For now, we'll just create all users
-        
-        result = create_user_in_database(api_endpoint, api_key, user)
-        if result:
-            created_users.append(result)
-        else:
-            skipped_users.append(user['Username'])
-        
-        # Add a small delay to avoid throttling
-        time.sleep(0.2)
+    # Record every created user in the AuditLog, written in batches
+    client = shared_client(api_endpoint, api_key)
+    audit = open_audit_sink(client, 'syncCognitoUsersToDatabase',
+                            get_results_path('audit_spool_syncCognitoUsersToDatabase.jsonl'))
+    
+    use_async = not args.sync
+    if use_async:
+        try:
+            import aiobotocore  # noqa: F401
+            import h2  # noqa: F401
+            import httpx  # noqa: F401
+        except ImportError:
+            print("Warning: aiobotocore and httpx[http2] are not installed "
+                  "(pip install aiobotocore 'httpx[http2]'); creating users one at a time instead")
+            use_async = False
+    
+    phase('process loop')
+    # Without them, one at a time at 5 calls per second to avoid throttling
+    concurrency, rate = (args.concurrency, args.rate) if use_async else (1, 5.0)
+    cognito_user_count, created_users, skipped_users = asyncio.run(sync_users_async(
+        region, user_pool_id, client, audit, concurrency, rate, use_async
+    ))
+    
+    phase('write results')
+    audit.close()
+    client.close()
     
     # Print summary
     print("\nSync completed!")
-    print(f"Total Cognito users: {len(cognito_users)}")
+    print(f"Total Cognito users: {cognito_user_count}")
     print(f"Users created in database: {len(created_users)}")
     print(f"Users skipped: {len(skipped_users)}")
+    for line in client.metrics.summary_lines():
+        print(line)
     
     # Save results to a file
     script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -152,10 +166,11 @@ def main():
     with open(results_file_path, 'w') as f:
         json.dump({
             'created_users': created_users,
-            'skipped_users': skipped_users
+            'skipped_users': skipped_users,
+            'request_metrics': client.metrics.snapshot()
         }, f, indent=2)
     
     print(f"Results saved to {results_file_path}")
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    run(main)
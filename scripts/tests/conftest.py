@@ -0,0 +1,35 @@
+import os
+import sys
+
+import pytest
+
+# The scripts import `common.*` relative to the scripts directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def dynamodb(monkeypatch):
+    """A boto3 DynamoDB client backed by moto."""
+    moto = pytest.importorskip('moto')
+    import boto3
+
+    for name, value in (('AWS_ACCESS_KEY_ID', 'testing'), ('AWS_SECRET_ACCESS_KEY', 'testing'),
+                        ('AWS_SESSION_TOKEN', 'testing'), ('AWS_DEFAULT_REGION', 'us-east-1')):
+        monkeypatch.setenv(name, value)
+    with moto.mock_aws():
+        yield boto3.client('dynamodb', region_name='us-east-1')
+
+@pytest.fixture
+def create_table(dynamodb):
+    """Return a function creating an Amplify-style model table keyed by 'id' with the given plain items."""
+    from boto3.dynamodb.types import TypeSerializer
+
+    serializer = TypeSerializer()
+
+    def create(name, items=()):
+        dynamodb.create_table(TableName=name, KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
+                              AttributeDefinitions=[{'AttributeName': 'id', 'AttributeType': 'S'}],
+                              BillingMode='PAY_PER_REQUEST')
+        for item in items:
+            dynamodb.put_item(TableName=name, Item={key: serializer.serialize(value) for key, value in item.items()})
+
+    return create
@@ -0,0 +1,118 @@
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip('httpx')
+pytest.importorskip('h2')
+pytest.importorskip('requests')
+aiohttp = pytest.importorskip('aiohttp')
+from aiohttp import web  # noqa: E402
+
+from common.aio import AsyncGraphQLClient, ThreadedClient, paginate  # noqa: E402
+from common.graphql import GraphQLClient, GraphQLError  # noqa: E402
+from common.resilience import CircuitOpenError  # noqa: E402
+from syncCognitoUsersToDatabase import create_user_in_database, create_user_in_database_async  # noqa: E402
+
+class StandIn:
+    """A stand-in AppSync endpoint: answers getUser and createUser, with settable delays and status."""
+
+    def __init__(self):
+        self.requests = 0
+        self.status = 200
+        self.delays = {}
+
+    async def graphql(self, request):
+        self.requests += 1
+        await asyncio.sleep(self.delays.get(self.requests, 0))
+        if self.status != 200:
+            return web.Response(status=self.status, text='unavailable')
+        body = await request.json()
+        variables = body['variables']
+        if 'createUser' in body['query']:
+            return web.json_response({'data': {'createUser': dict(variables['input'], id='user-1')}})
+        return web.json_response({'data': {'getUser': {'id': variables['id']}}})
+
+def run_against_server(check):
+    """Start a StandIn on a free local port and run `check(url, stand_in)` against it."""
+    stand_in = StandIn()
+
+    async def main():
+        app = web.Application()
+        app.router.add_post('/graphql', stand_in.graphql)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            return await check(f"http://127.0.0.1:{port}/graphql", stand_in)
+        finally:
+            await runner.cleanup()
+    return asyncio.run(main())
+
+def test_slow_query_is_hedged():
+    async def check(url, stand_in):
+        # The 21st request stalls; by then getUser has enough samples for a p95
+        stand_in.delays[21] = 2.0
+        async with AsyncGraphQLClient(url, 'key') as client:
+            for n in range(20):
+                await client.get_item('User', f"user-{n}", ['id'])
+            started = time.monotonic()
+            item = await client.get_item('User', 'user-20', ['id'])
+            return item, time.monotonic() - started, client.metrics.snapshot()
+
+    item, seconds, metrics = run_against_server(check)
+    assert item == {'id': 'user-20'}
+    assert seconds < 1.0
+    assert metrics['operations']['GetUser']['hedges'] == 1
+    assert metrics['operations']['GetUser']['hedgeWins'] == 1
+
+def test_timeouts_and_breaker():
+    async def check(url, stand_in):
+        stand_in.delays[1] = 1.0
+        async with AsyncGraphQLClient(url, 'key', timeouts={'query': 0.2}) as client:
+            client.breaker.max_wait = 0
+            with pytest.raises(GraphQLError, match='timed out after 0.2s'):
+                await client.get_item('User', 'user-1', ['id'])
+
+            stand_in.status = 500
+            for _ in range(9):
+                with pytest.raises(GraphQLError, match='500'):
+                    await client.get_item('User', 'user-1', ['id'])
+            with pytest.raises(CircuitOpenError):
+                await client.get_item('User', 'user-1', ['id'])
+            return stand_in.requests, client.metrics.snapshot()
+
+    requests, metrics = run_against_server(check)
+    assert requests == 10
+    assert metrics['operations']['GetUser']['timeouts'] == 1
+    assert metrics['operations']['GetUser']['failures'] == 10
+    assert [t['to'] for t in metrics['breakerTransitions']] == ['open']
+
+def test_sync_wrapper_matches_async_path():
+    user = {'Username': 'cognito-1', 'Attributes': [{'Name': 'email', 'Value': 'a@example.com'}]}
+
+    async def check(url, stand_in):
+        async with AsyncGraphQLClient(url, 'key') as client:
+            created_async = await create_user_in_database_async(client, user)
+        created_sync = await asyncio.get_running_loop().run_in_executor(
+            None, create_user_in_database, GraphQLClient(url, 'key'), user)
+        return created_async, created_sync
+
+    created_async, created_sync = run_against_server(check)
+    assert created_async == created_sync
+    assert created_sync['id'] == 'user-1' and created_sync['cognitoId'] == 'cognito-1'
+
+def test_threaded_client_paginates_boto3(dynamodb, create_table):
+    for name in ('User-a', 'User-b', 'User-c'):
+        create_table(name)
+
+    async def list_tables():
+        client = ThreadedClient(dynamodb)
+        names = [name async for name in paginate(client, 'list_tables', 'TableNames',
+                                                 PaginationConfig={'PageSize': 2})]
+        described = await client.describe_table(TableName='User-a')
+        return names, described['Table']['TableName']
+
+    assert asyncio.run(list_tables()) == (['User-a', 'User-b', 'User-c'], 'User-a')
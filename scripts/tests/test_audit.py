@@ -0,0 +1,62 @@
+import json
+import os
+
+from common.audit import AuditSink, GraphQLAuditWriter
+
+class FakeClient:
+    """Answers CreateAuditLogs requests, failing the aliases of the entries listed in `fail`."""
+
+    def __init__(self):
+        self.stored = set()
+        self.fail = set()
+        self.requests = 0
+
+    def execute_partial(self, mutation, variables):
+        self.requests += 1
+        data, errors = {}, []
+        for name, entry in variables.items():
+            alias = 'a' + name[1:]
+            if entry['resourceId'] in self.fail:
+                errors.append({'path': [alias], 'errorType': 'DynamoDB:InternalServerError', 'message': 'boom'})
+            elif entry['id'] in self.stored:
+                errors.append({'path': [alias], 'errorType': 'DynamoDB:ConditionalCheckFailedException',
+                               'message': 'The conditional request failed'})
+            else:
+                self.stored.add(entry['id'])
+                data[alias] = {'id': entry['id']}
+        return data, errors
+
+def open_sink(client, tmp_path, **kwargs):
+    return AuditSink(GraphQLAuditWriter(client), str(tmp_path / 'spool.jsonl'), 'test',
+                     flush_interval=3600, **kwargs)
+
+def test_only_failed_entries_are_retried(tmp_path):
+    client = FakeClient()
+    client.fail = {'bad'}
+    sink = open_sink(client, tmp_path, max_entries=5)
+    for resource_id in ['a', 'bad', 'b', 'c', 'd']:
+        sink.record('create', 'User', resource_id)
+
+    assert len(client.stored) == 4
+    assert sink.written == 4
+
+    client.fail = set()
+    sink.close()
+    assert len(client.stored) == 5
+    assert sink.written == 5
+    assert not os.path.exists(tmp_path / 'spool.jsonl')
+
+def test_entries_written_by_an_earlier_attempt_count_as_written(tmp_path):
+    client = FakeClient()
+    spool = tmp_path / 'spool.jsonl'
+    entry = {'id': 'entry-1', 'cognitoUserId': 'test', 'actionType': 'create', 'resourceType': 'user',
+             'resourceId': 'a', 'timestamp': '2025-01-01T00:00:00.000Z'}
+    # A crash after the write but before the "written" marker leaves the entry in the spool
+    client.stored.add(entry['id'])
+    spool.write_text(json.dumps(entry) + '\n')
+
+    sink = open_sink(client, tmp_path)
+    sink.close()
+
+    assert sink.written == 1
+    assert not os.path.exists(spool)
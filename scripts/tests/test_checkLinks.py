@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+aiohttp = pytest.importorskip('aiohttp')
+from aiohttp import web  # noqa: E402
+
+from checkLinks import check_urls  # noqa: E402
+
+async def ok(request):
+    return web.Response(text='ok')
+
+async def redirect(request):
+    raise web.HTTPFound('/ok')
+
+async def missing(request):
+    raise web.HTTPNotFound()
+
+async def head_rejected(request):
+    if request.method == 'HEAD':
+        raise web.HTTPMethodNotAllowed('HEAD', ['GET'])
+    return web.Response(status=206, text='o')
+
+async def slow(request):
+    await asyncio.sleep(float(request.query.get('seconds', '0.2')))
+    return web.Response(text='slow')
+
+def run_against_server(check):
+    """Start a stand-in server on a free local port and run `check(base_url)` against it."""
+    async def main():
+        app = web.Application()
+        for path, handler in (('/ok', ok), ('/redirect', redirect), ('/missing', missing),
+                              ('/head-rejected', head_rejected), ('/slow', slow)):
+            app.router.add_route('*', path, handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            return await check(f"http://127.0.0.1:{port}")
+        finally:
+            await runner.cleanup()
+    return asyncio.run(main())
+
+def test_statuses_redirects_and_head_fallback():
+    paths = ['/ok', '/redirect', '/missing', '/head-rejected']
+    results = run_against_server(lambda base: check_urls([base + path for path in paths], timeout=5))
+
+    statuses = {url.split('/')[-1]: (r['ok'], r['status']) for url, r in results.items()}
+    assert statuses == {'ok': (True, 200), 'redirect': (True, 200), 'missing': (False, 404),
+                        'head-rejected': (True, 206)}
+
+def test_slow_link_times_out():
+    results = run_against_server(lambda base: check_urls([f"{base}/slow?seconds=2"], timeout=0.3))
+
+    (result,) = results.values()
+    assert not result['ok']
+    assert result['error'] == 'timeout after 0.3s'
+
+def test_burst_on_one_host_waits_for_a_slot_instead_of_timing_out():
+    # 24 requests of 0.2s through 2 connections take about 2.4s, far over the 0.5s timeout of each
+    results = run_against_server(lambda base: check_urls(
+        [f"{base}/slow?seconds=0.2&n={n}" for n in range(24)], per_host=2, timeout=0.5))
+
+    assert len(results) == 24
+    assert all(r['ok'] for r in results.values()), [r['error'] for r in results.values() if not r['ok']]
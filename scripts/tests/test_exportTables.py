@@ -0,0 +1,87 @@
+import gzip
+import json
+import os
+
+import pytest
+
+from exportTables import export_table
+
+ROWS = [{'id': f"sub-{n:03d}", 'title': f"Submission {n}", 'score': n, 'tags': ['a', 'b'] if n % 2 else None}
+        for n in range(60)]
+
+class FailingScans:
+    """Wraps a DynamoDB client so the first scan of some segments fails."""
+
+    def __init__(self, client, segments):
+        self.client = client
+        self.segments = set(segments)
+
+    def scan(self, **kwargs):
+        if kwargs.get('Segment') in self.segments:
+            self.segments.discard(kwargs['Segment'])
+            raise RuntimeError(f"segment {kwargs['Segment']} throttled")
+        return self.client.scan(**kwargs)
+
+def read_jsonl(files):
+    rows = []
+    for path in files:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            rows.extend(json.loads(line) for line in f)
+    return rows
+
+def test_segmented_scan_exports_every_row_once(dynamodb, create_table, tmp_path):
+    create_table('Submission-test', ROWS)
+
+    result = export_table(dynamodb, 'Submission', 'Submission-test', str(tmp_path), 'jsonl',
+                          total_segments=4, rows_per_file=10, page_size=7)
+
+    assert result['rows'] == len(ROWS)
+    assert not result['failedSegments']
+    assert sorted(row['id'] for row in read_jsonl(result['files'])) == [row['id'] for row in ROWS]
+    segments = {os.path.basename(os.path.dirname(path)) for path in result['files']}
+    assert len(segments) > 1
+
+def test_parquet_parts_share_one_schema(dynamodb, create_table, tmp_path):
+    pytest.importorskip('pyarrow')
+    import pyarrow.dataset
+
+    create_table('Submission-test', ROWS)
+
+    result = export_table(dynamodb, 'Submission', 'Submission-test', str(tmp_path), 'parquet',
+                          total_segments=4, rows_per_file=5, page_size=7)
+
+    schemas = {str(pyarrow.parquet.read_schema(path)) for path in result['files']}
+    assert len(result['files']) > 4 and len(schemas) == 1
+    table = pyarrow.dataset.dataset(result['files'], format='parquet').to_table()
+    assert table.num_rows == len(ROWS)
+    assert sorted(table.column('score').to_pylist()) == list(range(60))
+
+def test_failed_segment_is_resumed_without_rescanning_the_others(dynamodb, create_table, tmp_path):
+    pytest.importorskip('pyarrow')
+    import pyarrow.parquet
+
+    create_table('Submission-test', ROWS)
+
+    first = export_table(FailingScans(dynamodb, [2]), 'Submission', 'Submission-test', str(tmp_path), 'parquet',
+                         total_segments=4, rows_per_file=5, page_size=7)
+    assert list(first['failedSegments']) == [2]
+    assert first['rows'] < len(ROWS)
+
+    written = {path: os.path.getmtime(path) for path in first['files']}
+    second = export_table(dynamodb, 'Submission', 'Submission-test', str(tmp_path), 'parquet',
+                          total_segments=4, rows_per_file=5, page_size=7)
+
+    assert second['resumedSegments'] == 3
+    assert not second['failedSegments']
+    assert second['rows'] == len(ROWS)
+    assert all(os.path.getmtime(path) == mtime for path, mtime in written.items())
+    assert len({str(pyarrow.parquet.read_schema(path)) for path in second['files']}) == 1
+    ids = [row for path in second['files'] for row in pyarrow.parquet.read_table(path).column('id').to_pylist()]
+    assert sorted(ids) == [row['id'] for row in ROWS]
+
+def test_resume_refuses_a_different_segment_count(dynamodb, create_table, tmp_path):
+    create_table('Submission-test', ROWS)
+    export_table(dynamodb, 'Submission', 'Submission-test', str(tmp_path), 'jsonl', total_segments=4)
+
+    with pytest.raises(ValueError):
+        export_table(dynamodb, 'Submission', 'Submission-test', str(tmp_path), 'jsonl', total_segments=2)
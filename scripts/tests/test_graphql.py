@@ -0,0 +1,45 @@
+import threading
+
+import pytest
+
+pytest.importorskip('requests')
+
+from benchmarkIO import StubGraphQLServer  # noqa: E402
+from common.graphql import GraphQLClient  # noqa: E402
+from common.resilience import CircuitBreaker, RunMetrics  # noqa: E402
+
+def hedge_threads():
+    return [thread for thread in threading.enumerate() if thread.name.startswith('graphql-hedge')]
+
+def test_breaker_reports_transitions_without_printing(capsys):
+    seen = []
+    metrics = RunMetrics()
+    breaker = CircuitBreaker('api', min_calls=4, cooldown=0.0, metrics=metrics,
+                             on_transition=lambda *transition: seen.append(transition))
+    for _ in range(4):
+        breaker.record(False, breaker.before_call())
+    breaker.record(True, breaker.before_call())
+
+    assert seen == [('api', 'closed', 'open'), ('api', 'open', 'half_open'), ('api', 'half_open', 'closed')]
+    assert [line.split(' at ')[0] for line in metrics.summary_lines()] == [
+        'Circuit api closed -> open', 'Circuit api open -> half_open', 'Circuit api half_open -> closed']
+    assert capsys.readouterr().out == ''
+
+def test_close_shuts_down_hedge_pool():
+    with StubGraphQLServer(0.01) as server:
+        with GraphQLClient(server.url, 'key') as client:
+            # A p95 of 1 ms makes every 10 ms query send a hedge
+            for _ in range(20):
+                client.metrics.latency.record('GetUser', 0.001)
+            for n in range(5):
+                assert client.get_item('User', f"user-{n}", ['id']) == {'id': f"user-{n}"}
+            assert client.metrics.snapshot()['operations']['GetUser']['hedges'] > 0
+            pool = client._hedge_pool
+            assert hedge_threads()
+        assert client._hedge_pool is None
+
+    with pytest.raises(RuntimeError, match='shutdown'):
+        pool.submit(print)
+    for thread in hedge_threads():
+        thread.join(timeout=5)
+    assert not hedge_threads()
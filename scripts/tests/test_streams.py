@@ -0,0 +1,132 @@
+import json
+import os
+
+import pytest
+
+pytest.importorskip('boto3')
+from botocore.exceptions import ClientError  # noqa: E402
+
+from common.streams import CheckpointStore, DynamoDBStreamSource, ReplaySource, StreamConsumer  # noqa: E402
+
+def record(sequence_number, item_id, event_name='MODIFY'):
+    return {'eventName': event_name, 'dynamodb': {
+        'SequenceNumber': str(sequence_number),
+        'Keys': {'id': {'S': item_id}},
+        'NewImage': {'id': {'S': item_id}, 'version': {'N': str(sequence_number)}}
+    }}
+
+def write_shard(directory, shard_id, records, mode='w'):
+    with open(os.path.join(directory, f"{shard_id}.jsonl"), mode) as f:
+        for entry in records:
+            f.write(json.dumps(entry) + '\n')
+
+@pytest.fixture
+def replay_dir(tmp_path):
+    """A recorded Submission stream: closed parent shard 'a' split into open child shard 'b'."""
+    directory = tmp_path / 'Submission'
+    directory.mkdir()
+    with open(directory / 'shards.json', 'w') as f:
+        json.dump([{'shardId': 'a', 'parentShardId': None, 'closed': True},
+                   {'shardId': 'b', 'parentShardId': 'a', 'closed': False}], f)
+    write_shard(directory, 'a', [record(1, 'x'), record(2, 'y'), record(3, 'x')])
+    write_shard(directory, 'b', [record(4, 'x'), record(5, 'y')])
+    return tmp_path
+
+def consume(replay_dir, checkpoints, handler, **kwargs):
+    consumer = StreamConsumer(checkpoints, batch_size=2, **kwargs)
+    consumer.add_source(ReplaySource(str(replay_dir), 'Submission'))
+    consumer.register('Submission', handler, 'test')
+    return consumer.run()
+
+def test_parent_shard_is_consumed_before_child(replay_dir, tmp_path):
+    seen = []
+    checkpoints = CheckpointStore(str(tmp_path / 'checkpoints.sqlite3'))
+    stats = consume(replay_dir, checkpoints, lambda events: seen.extend(
+        (event['shardId'], event['newImage']['version']) for event in events))
+
+    assert seen == [('a', 1), ('a', 2), ('a', 3), ('b', 4), ('b', 5)]
+    assert stats['shardsFinished'] == 1
+    assert stats['events'] == {'Submission': {'MODIFY': 5}}
+
+def test_second_run_resumes_from_checkpoints(replay_dir, tmp_path):
+    checkpoints = CheckpointStore(str(tmp_path / 'checkpoints.sqlite3'))
+    consume(replay_dir, checkpoints, lambda events: None)
+
+    write_shard(replay_dir / 'Submission', 'b', [record(6, 'z', 'INSERT')], mode='a')
+    seen = []
+    consume(replay_dir, checkpoints, lambda events: seen.extend(event['sequenceNumber'] for event in events))
+
+    assert seen == ['6']
+    assert checkpoints.get(ReplaySource(str(replay_dir), 'Submission').stream_id) == {
+        'a': ('3', True), 'b': ('6', False)}
+
+def test_failing_handler_is_retried_then_leaves_checkpoint(replay_dir, tmp_path, monkeypatch):
+    monkeypatch.setattr('common.streams.time.sleep', lambda seconds: None)
+    calls = []
+
+    def flaky(events):
+        calls.append([event['sequenceNumber'] for event in events])
+        if len(calls) == 1:
+            raise RuntimeError('temporary')
+
+    checkpoints = CheckpointStore(str(tmp_path / 'checkpoints.sqlite3'))
+    stats = consume(replay_dir, checkpoints, flaky, max_attempts=2)
+    assert calls[:2] == [['1', '2'], ['1', '2']]
+    assert stats['retries'] == 1 and not stats['failures']
+
+    # A handler that keeps failing stops its shard at the last checkpoint
+    write_shard(replay_dir / 'Submission', 'b', [record(6, 'z')], mode='a')
+
+    def broken(events):
+        raise RuntimeError('down')
+
+    stats = consume(replay_dir, checkpoints, broken, max_attempts=2)
+    assert [failure['shardId'] for failure in stats['failures']] == ['b']
+    assert checkpoints.get(ReplaySource(str(replay_dir), 'Submission').stream_id)['b'] == ('5', False)
+
+class ThrottledStreams:
+    """A DynamoDB Streams client whose GetRecords replays scripted responses and errors."""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.reads = 0
+
+    def get_shard_iterator(self, **kwargs):
+        return {'ShardIterator': 'it-0'}
+
+    def get_records(self, ShardIterator, Limit):
+        self.reads += 1
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+def throttled():
+    return ClientError({'Error': {'Code': 'LimitExceededException', 'Message': 'Rate exceeded'}}, 'GetRecords')
+
+def test_stream_reads_back_off_and_pause_on_empty_pages(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr('common.streams.time.sleep', sleeps.append)
+    client = ThrottledStreams([
+        throttled(), throttled(),
+        {'Records': [record(1, 'x')], 'NextShardIterator': 'it-1'},
+        {'Records': [], 'NextShardIterator': 'it-2'},
+        {'Records': [record(2, 'y')], 'NextShardIterator': 'it-3'},
+        {'Records': [], 'NextShardIterator': 'it-4'},
+        {'Records': [], 'NextShardIterator': 'it-5'},
+    ])
+    source = DynamoDBStreamSource(client, 'Submission', 'arn', max_empty_reads=2, empty_read_delay=0.25)
+    pages = list(source.read({'shardId': 'a', 'closed': False}))
+
+    assert [[r['dynamodb']['SequenceNumber'] for r in page] for page in pages] == [['1'], ['2']]
+    assert sleeps == [0.4, 0.8, 0.25, 0.25]
+    assert client.reads == 7
+
+def test_stream_reads_give_up_after_repeated_throttling(monkeypatch):
+    monkeypatch.setattr('common.streams.time.sleep', lambda seconds: None)
+    client = ThrottledStreams([throttled() for _ in range(3)])
+    source = DynamoDBStreamSource(client, 'Submission', 'arn', max_throttle_retries=2)
+
+    with pytest.raises(ClientError):
+        list(source.read({'shardId': 'a', 'closed': True}))
+    assert client.reads == 3
@@ -0,0 +1,82 @@
+import time
+
+from sweepExpired import sweep_table
+
+CUTOFF = '2025-03-01T00:00:00.000Z'
+NOW = '2025-03-02T00:00:00.000Z'
+
+SESSIONS = (
+    [{'id': f"expired-{n:02d}", 'expiresAt': '2025-02-01T00:00:00.000Z', 'isActive': True,
+      'updatedAt': '2025-02-01T00:00:00.000Z'} for n in range(40)] +
+    [{'id': f"inactive-{n:02d}", 'expiresAt': '2025-04-01T00:00:00.000Z', 'isActive': False} for n in range(10)] +
+    [{'id': f"live-{n:02d}", 'expiresAt': '2025-04-01T00:00:00.000Z', 'isActive': True} for n in range(15)]
+)
+
+class TimedClient:
+    """Wraps a DynamoDB client, recording BatchWriteItem calls and leaving some unprocessed."""
+
+    def __init__(self, client, unprocessed_first=0):
+        self.client = client
+        self.unprocessed_first = unprocessed_first
+        self.batch_writes = []
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def batch_write_item(self, RequestItems):
+        self.batch_writes.append(time.monotonic())
+        if self.unprocessed_first:
+            (table, requests), = RequestItems.items()
+            held, self.unprocessed_first = requests[:self.unprocessed_first], 0
+            response = self.client.batch_write_item(RequestItems={table: requests[len(held):]})
+            response['UnprocessedItems'] = {table: held}
+            return response
+        return self.client.batch_write_item(RequestItems=RequestItems)
+
+def remaining_ids(dynamodb, table):
+    return sorted(item['id']['S'] for item in dynamodb.scan(TableName=table)['Items'])
+
+def test_selects_only_expired_or_inactive_sessions(dynamodb, create_table):
+    create_table('Session-test', SESSIONS)
+
+    result = sweep_table(dynamodb, 'Session', 'Session-test', CUTOFF, NOW, dry_run=True)
+
+    assert result['matched'] == 50
+    assert result['reclaimed'] == 0
+    assert len(remaining_ids(dynamodb, 'Session-test')) == len(SESSIONS)
+
+def test_selects_expired_or_revoked_delegations(dynamodb, create_table):
+    create_table('Delegation-test', [
+        {'id': 'expired', 'expiresAt': '2025-02-01T00:00:00.000Z'},
+        {'id': 'revoked', 'expiresAt': '2025-04-01T00:00:00.000Z', 'revokedAt': '2025-02-15T00:00:00.000Z'},
+        {'id': 'live', 'expiresAt': '2025-04-01T00:00:00.000Z'},
+    ])
+
+    result = sweep_table(dynamodb, 'Delegation', 'Delegation-test', CUTOFF, NOW)
+
+    assert result['reclaimed'] == 2
+    assert remaining_ids(dynamodb, 'Delegation-test') == ['live']
+
+def test_batch_deletes_are_rate_limited_and_retry_unprocessed_items(dynamodb, create_table):
+    create_table('Session-test', SESSIONS)
+    client = TimedClient(dynamodb, unprocessed_first=5)
+
+    result = sweep_table(client, 'Session', 'Session-test', CUTOFF, NOW, segments=1, workers=4, rate=20)
+
+    assert result['reclaimed'] == 50
+    assert not result['failures']
+    assert remaining_ids(dynamodb, 'Session-test') == sorted(f"live-{n:02d}" for n in range(15))
+    # 50 rows make two batches of 25 plus one retry of the unprocessed keys
+    assert len(client.batch_writes) == 3
+    calls = sorted(client.batch_writes)
+    assert min(b - a for a, b in zip(calls, calls[1:])) >= 1 / 20 * 0.9
+
+def test_mark_only_sets_updated_at(dynamodb, create_table):
+    create_table('Session-test', SESSIONS)
+
+    result = sweep_table(dynamodb, 'Session', 'Session-test', CUTOFF, NOW, mark_only=True)
+
+    assert result['reclaimed'] == 40  # Inactive sessions are already marked
+    item = dynamodb.get_item(TableName='Session-test', Key={'id': {'S': 'expired-00'}})['Item']
+    assert item['isActive'] == {'BOOL': False}
+    assert item['updatedAt'] == {'S': NOW}